@@ -0,0 +1,135 @@
+"""Micro-benchmark of the local ESSIE parser and validator.
+
+Times :func:`servers.ct.essie_parser.parse` and
+:func:`servers.ct.essie_parser.check_query` over a corpus of real queries: the
+worked examples in essie_gpt.md plus typical ``query.*`` and
+``filter.advanced`` arguments seen in search_studies calls, including the
+malformed ones the validator exists to catch. Reports microseconds per query.
+
+Run from the repo root::
+
+    PYTHONPATH=src python benchmarks/bench_essie.py --repeat 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, "src")
+sys.path.insert(0, SRC)
+
+from servers.ct.ct_index import PIECES  # noqa: E402
+from servers.ct.essie_guide import get_essie_guide  # noqa: E402
+from servers.ct.essie_parser import EssieError, Vocabulary, check_query, parse  # noqa: E402
+
+CALL_QUERIES: List[str] = [
+    "heart attack",
+    "type 2 diabetes",
+    '"non-small cell lung cancer"',
+    "breast cancer AND NOT metastatic",
+    "Alzheimer's disease OR dementia",
+    "AREA[OverallStatus]RECRUITING",
+    "AREA[Phase](PHASE2 OR PHASE3) AND AREA[StudyType]INTERVENTIONAL",
+    "AREA[MinimumAge]RANGE[MIN, 18 years] AND AREA[MaximumAge]RANGE[65 years, MAX]",
+    'SEARCH[Location](AREA[LocationCountry]"United States" AND AREA[LocationStatus]RECRUITING)',
+    "AREA[StartDate]RANGE[2020-01-01, MAX] AND AREA[LeadSponsorClass]INDUSTRY",
+    "EXPANSION[None]aspirin OR COVERAGE[FullMatch]AREA[Condition]asthma",
+    "AREA[Condition]melanoma AND AREA[MaximumAge]MISSING",
+    # Malformed: unitless age (fixed), wrong case (fixed), invented field, unbalanced parentheses
+    "AREA[MaximumAge]RANGE[66,MAX]",
+    "AREA[overallstatus]RECRUITING",
+    "AREA[DiseaseName]leukemia",
+    "(lung cancer OR mesothelioma",
+]
+
+
+def guide_queries() -> List[str]:
+    """Return the example queries from essie_gpt.md (``Query:`` paragraphs)."""
+    examples = get_essie_guide().sections.get("examples")
+    if examples is None:
+        return []
+    found = re.findall(r"^Query:\s*\n?(.+?)(?:\n\s*\n|\Z)", examples.text, re.MULTILINE | re.DOTALL)
+    return [" ".join(q.split()) for q in found]
+
+
+def _per_query_us(fn: Callable[[str], object], corpus: List[str], repeat: int) -> List[float]:
+    """Median microseconds of ``fn`` for each query in ``corpus``.
+
+    :param fn: Function under test; EssieError counts as a completed call
+    :type fn: Callable[[str], object]
+    :param corpus: Queries
+    :type corpus: list[str]
+    :param repeat: Calls per query
+    :type repeat: int
+    :returns: Median microseconds per call, one per query
+    :rtype: list[float]
+    """
+    results = []
+    for query in corpus:
+        samples = []
+        for _ in range(5):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                try:
+                    fn(query)
+                except EssieError:
+                    pass
+            samples.append((time.perf_counter() - start) / repeat * 1e6)
+        results.append(statistics.median(samples))
+    return results
+
+
+def main() -> None:
+    """Run the benchmark and print per-query and summary timings.
+
+    :returns: Nothing
+    :rtype: None
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2000, help="Calls per query per sample")
+    parser.add_argument("--json", dest="json_path", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    # Strict, as with a metadata snapshot: guide fields and areas plus the index's piece names
+    names = dict(Vocabulary.from_guide(get_essie_guide()).names)
+    names.update({piece.lower(): piece for piece in PIECES})
+    vocabulary = Vocabulary(names, strict=True)
+    corpus = guide_queries() + CALL_QUERIES
+    parse_us = _per_query_us(parse, corpus, args.repeat)
+    check_us = _per_query_us(lambda q: check_query(q, vocabulary), corpus, args.repeat)
+
+    rows: List[Dict[str, object]] = []
+    print(f"{'parse us':>9}{'check us':>10}  outcome / query")
+    for query, p, c in zip(corpus, parse_us, check_us):
+        try:
+            checked = check_query(query, vocabulary)
+            outcome = "fixed" if checked.fixes else "ok"
+        except EssieError as e:
+            outcome = f"rejected: {e.message}"
+        print(f"{p:>9.1f}{c:>10.1f}  {outcome} / {query[:70]}")
+        rows.append({"query": query, "parse_us": p, "check_us": c, "outcome": outcome})
+    results: Dict[str, object] = {
+        "queries": rows,
+        "parse_us_median": statistics.median(parse_us),
+        "check_us_median": statistics.median(check_us),
+        "check_us_max": max(check_us),
+    }
+    print(
+        f"\n{len(corpus)} queries: parse median {results['parse_us_median']:.1f} us, "
+        f"check median {results['check_us_median']:.1f} us, check max {results['check_us_max']:.1f} us"
+    )
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
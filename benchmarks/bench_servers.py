@@ -0,0 +1,307 @@
+"""End-to-end server benchmark against local stand-in upstreams.
+
+For each server this measures:
+
+- process startup: spawn the server over STDIO and time until ``tools/list`` answers
+- ``tools/list`` latency and serialized size
+- ``call_tool`` throughput and p50/p99 latency at several concurrency levels
+- peak RSS of the benchmark process and of the spawned servers
+
+Upstream calls go over real HTTP to :mod:`fake_upstreams`, so the connection
+pool, scheduler, batching and caches are all exercised. Results are written as
+JSON for run-to-run comparison.
+
+Run from the repo root::
+
+    PYTHONPATH=src python benchmarks/bench_servers.py --latency-ms 20 --json bench.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, "src")
+sys.path.insert(0, SRC)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fastmcp  # noqa: E402
+from fake_upstreams import CT_PREFIX, PUG_PREFIX, run_fake_upstream  # noqa: E402
+from fastmcp import Client  # noqa: E402
+from fastmcp.client.transports import StdioTransport  # noqa: E402
+
+Call = Tuple[str, Dict[str, Any]]
+
+
+@dataclass(frozen=True)
+class ServerSpec:
+    """How to build a server and which calls to drive it with."""
+
+    module: str
+    factory: str
+    prefix: str
+    workload: Callable[[int], Call]
+
+
+def _ct_call(i: int) -> Call:
+    if i % 4 == 0:
+        return "search_studies", {"query.cond": f"condition {i}", "pageSize": 10, "format": "json"}
+    return "fetchStudy", {"nctId": f"NCT{i:08d}", "format": "json"}
+
+
+def _pug_call(i: int) -> Call:
+    if i % 2 == 0:
+        return "Get_compound_synonyms", {"cids": str(i + 1), "format": "JSON"}
+    return "Get_compound_properties", {
+        "cids": str(i + 1),
+        "properties": "MolecularFormula,MolecularWeight,IUPACName",
+        "format": "JSON",
+    }
+
+
+SERVERS: Dict[str, ServerSpec] = {
+    "ct": ServerSpec("servers.ct.ct_server", "create_ct_server", CT_PREFIX, _ct_call),
+    "pubchem": ServerSpec("servers.pubchem.pug_rest_server", "create_pug_server", PUG_PREFIX, _pug_call),
+}
+
+
+def _percentile(samples: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile.
+
+    :param samples: Values
+    :type samples: Sequence[float]
+    :param q: Percentile in [0, 100]
+    :type q: float
+    :returns: Percentile value, or 0.0 for no samples
+    :rtype: float
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+
+def _peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    """Peak resident set size in MiB (``ru_maxrss`` is KiB on Linux, bytes on macOS)."""
+    rss = resource.getrusage(who).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+async def _stdio_startup(spec: ServerSpec, base: str) -> float:
+    """Spawn the server over STDIO and time until ``tools/list`` returns.
+
+    :param spec: Server to start
+    :type spec: ServerSpec
+    :param base: Fake upstream base URL
+    :type base: str
+    :returns: Milliseconds from spawn to the first ``tools/list`` response
+    :rtype: float
+    """
+    env = dict(os.environ, PYTHONPATH=SRC, API_BASE=base + spec.prefix, HTTPX_LOG_LEVEL="WARNING")
+    # Same steps as the server's main(), minus the banner on stderr
+    code = (
+        f"from irmcp.server import run_server; from {spec.module} import {spec.factory} as f; "
+        "run_server(f, show_banner=False)"
+    )
+    transport = StdioTransport(command=sys.executable, args=["-c", code], env=env, cwd=ROOT)
+    start = time.perf_counter()
+    async with Client(transport) as client:
+        await client.list_tools()
+        elapsed = (time.perf_counter() - start) * 1000
+    return elapsed
+
+
+async def _tools_list(client: Client, repeat: int) -> Dict[str, float]:
+    """Time ``tools/list`` and measure its serialized size.
+
+    :param client: Connected client
+    :type client: fastmcp.Client
+    :param repeat: Number of calls
+    :type repeat: int
+    :returns: Median latency, tool count and JSON size
+    :rtype: dict[str, float]
+    """
+    samples = []
+    tools: List[Any] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tools = await client.list_tools()
+        samples.append((time.perf_counter() - start) * 1000)
+    payload = json.dumps([t.model_dump(mode="json", exclude_none=True) for t in tools], separators=(",", ":"))
+    return {"tools": len(tools), "bytes": len(payload), "p50_ms": _percentile(samples, 50), "p99_ms": _percentile(samples, 99)}
+
+
+async def _call_tools(client: Client, spec: ServerSpec, requests: int, concurrency: int, offset: int) -> Dict[str, float]:
+    """Drive ``requests`` tool calls with at most ``concurrency`` in flight.
+
+    :param client: Connected client
+    :type client: fastmcp.Client
+    :param spec: Server whose workload to run
+    :type spec: ServerSpec
+    :param requests: Total calls
+    :type requests: int
+    :param concurrency: Maximum calls in flight
+    :type concurrency: int
+    :param offset: Start of the workload index range, so levels do not reuse IDs
+    :type offset: int
+    :returns: Throughput, latency percentiles, error count and mean result size
+    :rtype: dict[str, float]
+    """
+    latencies: List[float] = []
+    sizes: List[int] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        nonlocal errors
+        name, args = spec.workload(offset + i)
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                # Raw MCP result: Client.call_tool would also build typed objects from the output schema
+                result = await client.call_tool_mcp(name, args)
+            except Exception:
+                result = None
+            if result is None or result.isError:
+                errors += 1
+                return
+            latencies.append((time.perf_counter() - start) * 1000)
+            sizes.append(sum(len(getattr(block, "text", "")) for block in result.content))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    wall = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": (requests - errors) / wall if wall else 0.0,
+        "p50_ms": _percentile(latencies, 50),
+        "p99_ms": _percentile(latencies, 99),
+        "mean_ms": statistics.fmean(latencies) if latencies else 0.0,
+        "mean_result_bytes": statistics.fmean(sizes) if sizes else 0.0,
+    }
+
+
+async def bench_server(name: str, base: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """Run every measurement for one server.
+
+    :param name: Key into :data:`SERVERS`
+    :type name: str
+    :param base: Fake upstream base URL
+    :type base: str
+    :param args: Parsed command-line options
+    :type args: argparse.Namespace
+    :returns: Measurements for the server
+    :rtype: dict[str, Any]
+    """
+    spec = SERVERS[name]
+    startup = [await _stdio_startup(spec, base) for _ in range(args.startup_repeat)]
+
+    module = importlib.import_module(spec.module)
+    module.API_BASE = base + spec.prefix  # type: ignore[attr-defined]
+    start = time.perf_counter()
+    app = await getattr(module, spec.factory)()
+    build_ms = (time.perf_counter() - start) * 1000
+
+    levels = []
+    async with Client(app) as client:
+        tools_list = await _tools_list(client, args.list_repeat)
+        for n, concurrency in enumerate(args.concurrency):
+            levels.append(await _call_tools(client, spec, args.requests, concurrency, n * args.requests))
+    return {
+        "startup_ms": {"median": statistics.median(startup), "min": min(startup), "max": max(startup)},
+        "build_in_process_ms": build_ms,
+        "tools_list": tools_list,
+        "call_tool": levels,
+        "peak_rss_mb_after": _peak_rss_mb(),
+    }
+
+
+def _git_revision() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+        return out.stdout.strip()
+    except OSError:
+        return ""
+
+
+def main() -> None:
+    """Run the benchmark, print a summary and optionally write JSON.
+
+    :returns: Nothing
+    :rtype: None
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--servers", default=",".join(SERVERS), help="comma-separated: " + ", ".join(SERVERS))
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="calls per concurrency level")
+    parser.add_argument("--startup-repeat", type=int, default=3)
+    parser.add_argument("--list-repeat", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="fake upstream latency")
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of upstream 503s")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="API_RATE_LIMIT (0 = unlimited)")
+    parser.add_argument("--cache", action="store_true", help="keep the response cache enabled")
+    parser.add_argument("--json", dest="json_path", help="Write results to this JSON file")
+    args = parser.parse_args()
+    args.concurrency = [int(c) for c in args.concurrency.split(",")]
+
+    # The defaults would pace PubChem at 5 rps and serve repeats from cache
+    os.environ["API_RATE_LIMIT"] = str(args.rate_limit)
+    os.environ["API_RETRY_BASE_DELAY"] = "0.01"
+    os.environ.setdefault("HTTPX_LOG_LEVEL", "WARNING")
+    if not args.cache:
+        os.environ["API_CACHE_MAX_BYTES"] = "0"
+        # Persistent identifier resolutions would also outlive the run
+        os.environ["PUBCHEM_IDSTORE_PATH"] = ""
+
+    results: Dict[str, Any] = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git": _git_revision(),
+            "python": platform.python_version(),
+            "fastmcp": fastmcp.__version__,
+            "platform": platform.platform(),
+            "options": {k: v for k, v in vars(args).items() if k != "json_path"},
+        },
+        "servers": {},
+    }
+    with run_fake_upstream(args.latency_ms, args.jitter_ms, args.error_rate) as base:
+        for name in args.servers.split(","):
+            results["servers"][name] = asyncio.run(bench_server(name, base, args))
+    results["peak_rss_mb"] = _peak_rss_mb()
+    results["peak_rss_children_mb"] = _peak_rss_mb(resource.RUSAGE_CHILDREN)
+
+    for name, r in results["servers"].items():
+        tl = r["tools_list"]
+        print(
+            f"{name}: startup {r['startup_ms']['median']:.0f} ms, build {r['build_in_process_ms']:.0f} ms, "
+            f"tools/list {tl['p50_ms']:.1f} ms / {tl['bytes']} B ({tl['tools']} tools)"
+        )
+        print(f"  {'conc':>5}{'rps':>9}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}{'bytes':>9}")
+        for lvl in r["call_tool"]:
+            print(
+                f"  {lvl['concurrency']:>5}{lvl['throughput_rps']:>9.1f}{lvl['p50_ms']:>9.1f}"
+                f"{lvl['p99_ms']:>9.1f}{lvl['errors']:>8}{lvl['mean_result_bytes']:>9.0f}"
+            )
+    print(f"peak RSS: {results['peak_rss_mb']:.0f} MiB (servers over STDIO: {results['peak_rss_children_mb']:.0f} MiB)")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Startup-time benchmark: YAML OpenAPI load vs the compiled JSON artifact.
+
+Measures, for each server spec, the in-process cost of :func:`load_openapi_spec`
+with the compiled cache disabled (YAML path) and warm (JSON path), plus the
+wall-clock time of a fresh interpreter building each server both ways.
+
+Run from the repo root::
+
+    PYTHONPATH=src python benchmarks/bench_startup.py --repeat 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, "src")
+sys.path.insert(0, SRC)
+
+from irmcp.server import load_openapi_spec  # noqa: E402
+
+SPECS: Dict[str, str] = {
+    "ct": os.path.join(SRC, "servers", "ct", "ctg-oas-v2.yaml"),
+    "pubchem": os.path.join(SRC, "servers", "pubchem", "pug_rest_openapi.yaml"),
+}
+
+SERVERS: Dict[str, str] = {
+    "ct": "from servers.ct.ct_server import create_ct_server as f",
+    "pubchem": "from servers.pubchem.pug_rest_server import create_pug_server as f",
+}
+
+
+def _time(fn: Callable[[], object], repeat: int) -> List[float]:
+    """Time ``fn`` ``repeat`` times.
+
+    :param fn: Zero-argument callable to time
+    :type fn: Callable[[], object]
+    :param repeat: Number of runs
+    :type repeat: int
+    :returns: Durations in milliseconds
+    :rtype: list[float]
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def _process_startup(server: str, cache_dir: str) -> float:
+    """Time a fresh interpreter that builds ``server`` and exits.
+
+    :param server: Key into :data:`SERVERS`
+    :type server: str
+    :param cache_dir: OPENAPI_CACHE_DIR for the child; empty disables the cache
+    :type cache_dir: str
+    :returns: Wall-clock milliseconds
+    :rtype: float
+    """
+    code = f"import asyncio; {SERVERS[server]}; asyncio.run(f())"
+    env = dict(os.environ, PYTHONPATH=SRC, OPENAPI_CACHE_DIR=cache_dir, HTTPX_LOG_LEVEL="WARNING")
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], env=env, check=True, capture_output=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def main() -> None:
+    """Run the benchmark and print a table (and optionally JSON) of medians.
+
+    :returns: Nothing
+    :rtype: None
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", dest="json_path", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    results: Dict[str, Dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        os.environ["OPENAPI_CACHE_DIR"] = ""
+        for name, path in SPECS.items():
+            yaml_ms = _time(lambda: load_openapi_spec(path), args.repeat)
+            load_openapi_spec(path, cache_dir=cache_dir)  # write the artifact
+            json_ms = _time(lambda: load_openapi_spec(path, cache_dir=cache_dir), args.repeat)
+            proc_yaml = [_process_startup(name, "") for _ in range(args.repeat)]
+            proc_json = [_process_startup(name, cache_dir) for _ in range(args.repeat)]
+            results[name] = {
+                "load_yaml_ms": statistics.median(yaml_ms),
+                "load_compiled_ms": statistics.median(json_ms),
+                "process_yaml_ms": statistics.median(proc_yaml),
+                "process_compiled_ms": statistics.median(proc_json),
+            }
+
+    print(f"{'server':<10}{'load yaml':>12}{'load json':>12}{'proc yaml':>12}{'proc json':>12}  (median ms)")
+    for name, r in results.items():
+        print(
+            f"{name:<10}{r['load_yaml_ms']:>12.1f}{r['load_compiled_ms']:>12.1f}"
+            f"{r['process_yaml_ms']:>12.1f}{r['process_compiled_ms']:>12.1f}"
+        )
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+"""Local stand-ins for the ClinicalTrials.gov and PubChem PUG-REST APIs.
+
+Serves deterministic payloads shaped like the real responses (study records
+with long markdown text, paged study lists, property tables, synonym lists,
+full compound records, hit lists) under ``/ct/api/v2`` and ``/pubchem/rest/pug``,
+with configurable latency and injected 503s.
+
+Run standalone (e.g. to point the gateway at it)::
+
+    PYTHONPATH=src python benchmarks/fake_upstreams.py --port 8765 --latency-ms 50
+    API_BASE=http://127.0.0.1:8765/ct/api/v2 python -m servers.ct.ct_server
+
+or use :func:`run_fake_upstream` to start it as a subprocess from a benchmark.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Dict, Iterator, List
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+CT_PREFIX = "/ct/api/v2"
+PUG_PREFIX = "/pubchem/rest/pug"
+
+_WORDS = (
+    "patients treatment study phase randomized placebo dose safety efficacy cohort "
+    "participants trial outcome response therapy clinical disease chronic acute "
+    "inhibitor receptor administered weeks baseline primary secondary endpoint"
+).split()
+_CONDITIONS = ["Asthma", "Type 2 Diabetes", "Breast Cancer", "Hypertension", "COVID-19", "Migraine"]
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _markdown(rng: random.Random, paragraphs: int) -> str:
+    return "\n\n".join(
+        f"* {_text(rng, 12)}" if i % 3 == 2 else _text(rng, 60) for i in range(paragraphs)
+    )
+
+
+def ct_study(nct_id: str) -> Dict[str, Any]:
+    """Build a study record shaped like ``GET /studies/{nctId}``.
+
+    :param nct_id: NCT number; also seeds the generator so records are stable
+    :type nct_id: str
+    :returns: Study JSON
+    :rtype: dict[str, Any]
+    """
+    rng = random.Random(nct_id)
+    condition = rng.choice(_CONDITIONS)
+    return {
+        "protocolSection": {
+            "identificationModule": {
+                "nctId": nct_id,
+                "orgStudyIdInfo": {"id": f"ORG-{rng.randint(1000, 9999)}"},
+                "organization": {"fullName": "Example University Hospital", "class": "OTHER"},
+                "briefTitle": f"{_text(rng, 8)[:-1]} in {condition}",
+                "officialTitle": _text(rng, 25),
+            },
+            "statusModule": {
+                "statusVerifiedDate": "2024-05",
+                "overallStatus": rng.choice(["RECRUITING", "COMPLETED", "ACTIVE_NOT_RECRUITING"]),
+                "startDateStruct": {"date": "2023-01-15", "type": "ACTUAL"},
+                "primaryCompletionDateStruct": {"date": "2026-06", "type": "ESTIMATED"},
+                "lastUpdatePostDateStruct": {"date": "2024-05-02", "type": "ACTUAL"},
+            },
+            "sponsorCollaboratorsModule": {
+                "leadSponsor": {"name": "Example Pharma", "class": "INDUSTRY"},
+                "collaborators": [],
+            },
+            "descriptionModule": {
+                "briefSummary": _markdown(rng, 2),
+                "detailedDescription": _markdown(rng, 10),
+            },
+            "conditionsModule": {"conditions": [condition], "keywords": [rng.choice(_WORDS) for _ in range(4)]},
+            "designModule": {
+                "studyType": "INTERVENTIONAL",
+                "phases": [rng.choice(["PHASE2", "PHASE3"])],
+                "designInfo": {"allocation": "RANDOMIZED", "primaryPurpose": "TREATMENT"},
+                "enrollmentInfo": {"count": rng.randint(20, 2000), "type": "ESTIMATED"},
+            },
+            "armsInterventionsModule": {
+                "armGroups": [
+                    {"label": label, "type": kind, "description": _text(rng, 30)}
+                    for label, kind in (("Treatment", "EXPERIMENTAL"), ("Placebo", "PLACEBO_COMPARATOR"))
+                ],
+                "interventions": [{"type": "DRUG", "name": f"EX-{rng.randint(100, 999)}", "description": _text(rng, 20)}],
+            },
+            "outcomesModule": {
+                "primaryOutcomes": [{"measure": _text(rng, 10), "timeFrame": "12 weeks"} for _ in range(2)],
+                "secondaryOutcomes": [{"measure": _text(rng, 10), "timeFrame": "24 weeks"} for _ in range(4)],
+            },
+            "eligibilityModule": {
+                "eligibilityCriteria": "Inclusion Criteria:\n\n" + _markdown(rng, 6) + "\n\nExclusion Criteria:\n\n" + _markdown(rng, 6),
+                "healthyVolunteers": False,
+                "sex": "ALL",
+                "minimumAge": "18 Years",
+                "stdAges": ["ADULT", "OLDER_ADULT"],
+            },
+            "contactsLocationsModule": {
+                "locations": [
+                    {
+                        "facility": f"Site {i}",
+                        "status": "RECRUITING",
+                        "city": rng.choice(["Boston", "Houston", "Seattle", "Denver"]),
+                        "country": "United States",
+                        "geoPoint": {"lat": rng.uniform(25, 48), "lon": rng.uniform(-122, -71)},
+                    }
+                    for i in range(rng.randint(1, 15))
+                ],
+            },
+        },
+        "derivedSection": {
+            "conditionBrowseModule": {
+                "meshes": [{"id": f"D00{rng.randint(1000, 9999)}", "term": condition}],
+                "browseLeaves": [{"id": f"M{rng.randint(1000, 9999)}", "name": rng.choice(_WORDS), "relevance": "LOW"} for _ in range(8)],
+            },
+        },
+        "hasResults": rng.random() < 0.3,
+    }
+
+
+def pug_record(cid: int) -> Dict[str, Any]:
+    """Build one ``PC_Compounds`` entry with atoms, bonds, coordinates and props.
+
+    :param cid: PubChem CID; also seeds the generator
+    :type cid: int
+    :returns: Compound record
+    :rtype: dict[str, Any]
+    """
+    rng = random.Random(cid)
+    n = rng.randint(10, 60)
+    return {
+        "id": {"id": {"cid": cid}},
+        "atoms": {"aid": list(range(1, n + 1)), "element": [rng.choice([1, 6, 7, 8]) for _ in range(n)]},
+        "bonds": {"aid1": list(range(1, n)), "aid2": list(range(2, n + 1)), "order": [rng.choice([1, 2]) for _ in range(n - 1)]},
+        "coords": [
+            {
+                "type": [1, 5, 255],
+                "aid": list(range(1, n + 1)),
+                "conformers": [{"x": [rng.uniform(0, 10) for _ in range(n)], "y": [rng.uniform(0, 10) for _ in range(n)]}],
+            }
+        ],
+        "props": [
+            {"urn": {"label": label, "name": "Preferred", "datatype": 1}, "value": {"sval": _text(rng, 4)}}
+            for label in ("IUPAC Name", "InChI", "InChIKey", "SMILES")
+        ],
+        "count": {"heavy_atom": n, "atom_chiral": 0},
+    }
+
+
+def _pug_properties(cid: int, properties: List[str]) -> Dict[str, Any]:
+    rng = random.Random(cid)
+    row: Dict[str, Any] = {"CID": cid}
+    for prop in properties:
+        # PubChem returns weights and masses as decimal strings
+        row[prop] = f"{rng.uniform(50, 900):.2f}" if "Weight" in prop or "Mass" in prop else _text(rng, 3)
+    return row
+
+
+class FakeUpstream:
+    """Starlette app serving fake CT and PubChem endpoints.
+
+    :param latency_ms: Mean added latency per request
+    :type latency_ms: float
+    :param jitter_ms: Uniform +/- jitter around the mean
+    :type jitter_ms: float
+    :param error_rate: Fraction of requests answered with 503 and ``Retry-After: 0``
+    :type error_rate: float
+    :param search_hits: CIDs returned by structure searches
+    :type search_hits: int
+    :param seed: Seed for latency and error injection
+    :type seed: int
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        search_hits: int = 2000,
+        seed: int = 0,
+    ) -> None:
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.search_hits = search_hits
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self.app = Starlette(
+            routes=[
+                Route("/health", self.health),
+                Route(f"{CT_PREFIX}/version", self.ct_version),
+                Route(f"{CT_PREFIX}/studies", self.ct_studies),
+                Route(f"{CT_PREFIX}/studies/metadata", self.ct_metadata),
+                Route(f"{CT_PREFIX}/studies/search-areas", self.ct_search_areas),
+                Route(f"{CT_PREFIX}/studies/enums", self.ct_enums),
+                Route(f"{CT_PREFIX}/studies/{{nct_id}}", self.ct_study),
+                Route(f"{PUG_PREFIX}/compound/cid/{{cids}}/property/{{properties}}/JSON", self.pug_properties),
+                Route(f"{PUG_PREFIX}/compound/cid/{{cids}}/synonyms/JSON", self.pug_synonyms),
+                Route(f"{PUG_PREFIX}/compound/cid/{{cids}}/JSON", self.pug_records),
+                Route(f"{PUG_PREFIX}/compound/{{namespace}}/{{identifier}}/JSON", self.pug_records),
+                Route(f"{PUG_PREFIX}/compound/{{search}}/{{namespace}}/{{query}}/cids/JSON", self.pug_search),
+                Route(f"{PUG_PREFIX}/compound/fastformula/{{formula}}/cids/JSON", self.pug_search),
+                Route(f"{PUG_PREFIX}/compound/listkey/{{key}}/cids/JSON", self.pug_listkey),
+            ],
+        )
+
+    async def __call__(self, scope: Any, receive: Any, send: Any) -> None:
+        if scope["type"] == "http" and scope["path"] != "/health":
+            self.requests += 1
+            delay = self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+            if delay > 0:
+                await asyncio.sleep(delay / 1000)
+            if self._rng.random() < self.error_rate:
+                await Response(status_code=503, headers={"Retry-After": "0"})(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+    async def health(self, request: Request) -> Response:
+        return JSONResponse({"ok": True, "requests": self.requests})
+
+    async def ct_version(self, request: Request) -> Response:
+        return JSONResponse({"apiVersion": "2.0.3", "dataTimestamp": "2024-05-02T09:00:00"})
+
+    async def ct_metadata(self, request: Request) -> Response:
+        leaf = {"name": "nctId", "piece": "NCTId", "sourceType": "TEXT", "type": "nct"}
+        module = {"name": "identificationModule", "piece": "IdentificationModule", "sourceType": "STRUCT",
+                  "type": "IdentificationModule", "children": [leaf]}
+        section = {"name": "protocolSection", "piece": "ProtocolSection", "sourceType": "STRUCT",
+                   "type": "ProtocolSection", "children": [module]}
+        return JSONResponse([section])
+
+    async def ct_search_areas(self, request: Request) -> Response:
+        areas = [{"name": name, "parts": []} for name in ("BasicSearch", "ConditionSearch")]
+        return JSONResponse([{"name": "Study", "areas": areas}])
+
+    async def ct_enums(self, request: Request) -> Response:
+        values = [{"value": v, "legacyValue": v.title()} for v in ("RECRUITING", "COMPLETED")]
+        return JSONResponse([{"type": "Status", "pieces": ["OverallStatus"], "values": values}])
+
+    async def ct_studies(self, request: Request) -> Response:
+        page = int(request.query_params.get("pageToken") or 0)
+        size = int(request.query_params.get("pageSize") or 10)
+        query = request.query_params.get("query.cond") or request.query_params.get("query.term") or ""
+        base = (sum(map(ord, query)) * 1000 + page * size) % 10**8
+        body: Dict[str, Any] = {"studies": [ct_study(f"NCT{base + i:08d}") for i in range(size)]}
+        if request.query_params.get("countTotal") == "true":
+            body["totalCount"] = 5 * size
+        if page < 4:
+            body["nextPageToken"] = str(page + 1)
+        return JSONResponse(body)
+
+    async def ct_study(self, request: Request) -> Response:
+        return JSONResponse(ct_study(request.path_params["nct_id"]))
+
+    async def pug_properties(self, request: Request) -> Response:
+        cids = [int(c) for c in request.path_params["cids"].split(",")]
+        properties = request.path_params["properties"].split(",")
+        return JSONResponse({"PropertyTable": {"Properties": [_pug_properties(c, properties) for c in cids]}})
+
+    async def pug_synonyms(self, request: Request) -> Response:
+        info = []
+        for cid in (int(c) for c in request.path_params["cids"].split(",")):
+            rng = random.Random(cid)
+            info.append({"CID": cid, "Synonym": [_text(rng, 2)[:-1] for _ in range(rng.randint(5, 200))]})
+        return JSONResponse({"InformationList": {"Information": info}})
+
+    async def pug_records(self, request: Request) -> Response:
+        cids_param = request.path_params.get("cids")
+        if cids_param:
+            cids = [int(c) for c in cids_param.split(",")]
+        else:
+            cids = [sum(map(ord, request.path_params["identifier"])) % 10**6 + 1]
+        return JSONResponse({"PC_Compounds": [pug_record(c) for c in cids]})
+
+    async def pug_search(self, request: Request) -> Response:
+        limit = int(request.query_params.get("MaxRecords") or self.search_hits)
+        return JSONResponse({"IdentifierList": {"CID": list(range(1, min(limit, self.search_hits) + 1))}})
+
+    async def pug_listkey(self, request: Request) -> Response:
+        start = int(request.query_params.get("listkey_start") or 0)
+        count = int(request.query_params.get("listkey_count") or self.search_hits)
+        cids = list(range(1, self.search_hits + 1))[start:start + count]
+        return JSONResponse({"IdentifierList": {"CID": cids, "Size": self.search_hits}})
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def run_fake_upstream(
+    latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0, timeout: float = 20.0
+) -> Iterator[str]:
+    """Start the fake upstream in a subprocess and yield its base URL.
+
+    A separate process keeps the stand-in's CPU use out of the measured process.
+
+    :param latency_ms: Mean added latency per request
+    :type latency_ms: float
+    :param jitter_ms: Uniform +/- jitter around the mean
+    :type jitter_ms: float
+    :param error_rate: Fraction of requests answered with 503
+    :type error_rate: float
+    :param timeout: Seconds to wait for the server to accept requests
+    :type timeout: float
+    :returns: Base URL such as ``http://127.0.0.1:54321``
+    :rtype: Iterator[str]
+    :raises RuntimeError: If the server does not come up in time
+    """
+    import httpx
+
+    port = _free_port()
+    proc = subprocess.Popen(
+        [
+            sys.executable, os.path.abspath(__file__), "--port", str(port),
+            "--latency-ms", str(latency_ms), "--jitter-ms", str(jitter_ms), "--error-rate", str(error_rate),
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                httpx.get(f"{base}/health", timeout=1.0).raise_for_status()
+                break
+            except httpx.HTTPError:
+                if time.monotonic() > deadline or proc.poll() is not None:
+                    raise RuntimeError("fake upstream did not start")
+                time.sleep(0.1)
+        yield base
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main() -> None:
+    """Serve the fake upstreams until interrupted.
+
+    :returns: Nothing
+    :rtype: None
+    """
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--search-hits", type=int, default=2000)
+    args = parser.parse_args()
+    upstream = FakeUpstream(args.latency_ms, args.jitter_ms, args.error_rate, args.search_hits)
+    uvicorn.run(upstream, host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
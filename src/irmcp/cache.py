@@ -0,0 +1,415 @@
+"""Upstream response caching: memory LRU and disk tiers behind an httpx transport.
+
+Wrap a transport with :class:`CachingTransport` to serve repeated GET requests
+from a :class:`ResponseCache` instead of the remote API.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
+from urllib.parse import urlencode
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Request extension marking a response the caller consumes incrementally; such
+# responses are passed through unbuffered instead of being stored or shared
+STREAM_EXTENSION = "irmcp.stream"
+
+# Headers that describe the wire encoding rather than the decoded body we store
+_HOP_HEADERS = frozenset({"content-encoding", "content-length", "transfer-encoding", "connection"})
+
+
+@dataclass
+class CacheEntry:
+    """A stored upstream response.
+
+    :param status_code: HTTP status code of the response
+    :type status_code: int
+    :param headers: Response headers, minus transfer-encoding related ones
+    :type headers: list[tuple[str, str]]
+    :param content: Decoded response body
+    :type content: bytes
+    :param expires_at: Wall-clock time (``time.time()``) after which the entry is stale
+    :type expires_at: float
+    """
+
+    status_code: int
+    headers: List[Tuple[str, str]]
+    content: bytes
+    expires_at: float
+
+    @property
+    def size(self) -> int:
+        """Approximate memory footprint in bytes used for the LRU byte budget.
+
+        :returns: Body length plus header lengths
+        :rtype: int
+        """
+        return len(self.content) + sum(len(k) + len(v) for k, v in self.headers)
+
+
+@dataclass
+class CacheStats:
+    """Hit/miss counters for a :class:`ResponseCache`."""
+
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+    disk_hits: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        """Fraction of lookups served from cache.
+
+        :returns: ``hits / (hits + misses)``, or 0.0 before any lookup
+        :rtype: float
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        """Return the counters as a plain dict suitable for JSON.
+
+        :returns: Counter names mapped to values, including ``hit_ratio``
+        :rtype: dict[str, float]
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "disk_hits": self.disk_hits,
+            "hit_ratio": self.hit_ratio,
+        }
+
+
+class MemoryCache:
+    """In-memory LRU tier bounded by a total byte budget.
+
+    :param max_bytes: Maximum summed :attr:`CacheEntry.size` held in memory
+    :type max_bytes: int
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Return the entry for ``key`` and mark it most recently used.
+
+        :param key: Normalized cache key
+        :type key: str
+        :returns: Cached entry or None
+        :rtype: Optional[CacheEntry]
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        """Insert ``entry``, evicting least recently used entries over budget.
+
+        Entries larger than the whole budget are not stored.
+
+        :param key: Normalized cache key
+        :type key: str
+        :param entry: Entry to store
+        :type entry: CacheEntry
+        """
+        self.delete(key)
+        if entry.size > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self.current_bytes += entry.size
+        while self.current_bytes > self.max_bytes:
+            _, old = self._entries.popitem(last=False)
+            self.current_bytes -= old.size
+            self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        """Remove ``key`` if present.
+
+        :param key: Normalized cache key
+        :type key: str
+        """
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.current_bytes -= old.size
+
+
+class DiskCache:
+    """On-disk tier storing one file per key under ``directory``.
+
+    Each file holds a JSON header line (status, headers, expiry) followed by the
+    raw body, so a lookup is a single read.
+
+    :param directory: Directory to hold cache files; created if missing
+    :type directory: str
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Read the entry for ``key`` from disk.
+
+        :param key: Normalized cache key
+        :type key: str
+        :returns: Cached entry or None if absent or unreadable
+        :rtype: Optional[CacheEntry]
+        """
+        try:
+            with open(self._path(key), "rb") as f:
+                header = json.loads(f.readline())
+                content = f.read()
+        except (OSError, ValueError):
+            return None
+        return CacheEntry(
+            status_code=header["status"],
+            headers=[(k, v) for k, v in header["headers"]],
+            content=content,
+            expires_at=header["expires_at"],
+        )
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        """Write ``entry`` atomically (write to temp file, then rename).
+
+        :param key: Normalized cache key
+        :type key: str
+        :param entry: Entry to store
+        :type entry: CacheEntry
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        header = {"status": entry.status_code, "headers": entry.headers, "expires_at": entry.expires_at}
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(json.dumps(header).encode("utf-8") + b"\n")
+            f.write(entry.content)
+        os.replace(tmp, path)
+
+    def delete(self, key: str) -> None:
+        """Remove the file for ``key`` if present.
+
+        :param key: Normalized cache key
+        :type key: str
+        """
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+def _template_to_regex(path_template: str) -> "re.Pattern[str]":
+    """Compile an OpenAPI path template (``/studies/{nctId}``) to a suffix regex.
+
+    :param path_template: OpenAPI-style path with ``{param}`` placeholders
+    :type path_template: str
+    :returns: Pattern matching request paths that end with the template
+    :rtype: re.Pattern[str]
+    """
+    parts = re.split(r"(\{[^}]+\})", path_template)
+    body = "".join("[^/]+" if p.startswith("{") else re.escape(p) for p in parts)
+    return re.compile(body + "$")
+
+
+@dataclass
+class ResponseCache:
+    """Two-tier response cache with per-operation TTLs.
+
+    :param memory: In-memory LRU tier
+    :type memory: MemoryCache
+    :param disk: Optional persistent tier consulted on memory misses
+    :type disk: Optional[DiskCache]
+    :param ttls: OpenAPI path templates mapped to TTL seconds; first match wins
+    :type ttls: Mapping[str, float]
+    :param default_ttl: TTL for paths matching no template; 0 disables caching them
+    :type default_ttl: float
+    :param clock: Wall-clock source, overridable for tests
+    :type clock: Callable[[], float]
+    """
+
+    memory: MemoryCache
+    disk: Optional[DiskCache] = None
+    ttls: Mapping[str, float] = field(default_factory=dict)
+    default_ttl: float = 0.0
+    clock: Callable[[], float] = time.time
+    stats: CacheStats = field(default_factory=CacheStats)
+
+    def __post_init__(self) -> None:
+        self._rules = [(_template_to_regex(t), ttl) for t, ttl in self.ttls.items()]
+
+    def ttl_for(self, path: str) -> float:
+        """Return the TTL configured for a request path.
+
+        :param path: Request URL path
+        :type path: str
+        :returns: TTL in seconds (0 means do not cache)
+        :rtype: float
+        """
+        for pattern, ttl in self._rules:
+            if pattern.search(path):
+                return ttl
+        return self.default_ttl
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        """Look up ``key`` in memory, then disk, counting hits and misses.
+
+        Disk hits are promoted into the memory tier.
+
+        :param key: Normalized cache key
+        :type key: str
+        :returns: Fresh cached entry or None
+        :rtype: Optional[CacheEntry]
+        """
+        now = self.clock()
+        entry = self.memory.get(key)
+        if entry is not None and entry.expires_at <= now:
+            self.memory.delete(key)
+            entry = None
+        if entry is None and self.disk is not None:
+            entry = await asyncio.to_thread(self.disk.get, key)
+            if entry is not None and entry.expires_at <= now:
+                await asyncio.to_thread(self.disk.delete, key)
+                entry = None
+            if entry is not None:
+                self.stats.disk_hits += 1
+                self.memory.set(key, entry)
+        if entry is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return entry
+
+    async def set(self, key: str, entry: CacheEntry) -> None:
+        """Store ``entry`` in every configured tier.
+
+        :param key: Normalized cache key
+        :type key: str
+        :param entry: Entry to store
+        :type entry: CacheEntry
+        """
+        evictions = self.memory.evictions
+        self.memory.set(key, entry)
+        self.stats.evictions += self.memory.evictions - evictions
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, entry)
+        self.stats.stores += 1
+
+
+def normalize_cache_key(request: httpx.Request) -> str:
+    """Build a cache key that ignores query parameter order.
+
+    :param request: Outgoing request
+    :type request: httpx.Request
+    :returns: ``METHOD scheme://host[:port]/path?sorted-query``
+    :rtype: str
+    """
+    url = request.url
+    query = urlencode(sorted(url.params.multi_items()))
+    # netloc keeps a non-default port, so upstreams on one host stay apart
+    return f"{request.method} {url.scheme}://{url.netloc.decode('ascii')}{url.path}?{query}"
+
+
+def _stored_headers(headers: httpx.Headers) -> List[Tuple[str, str]]:
+    return [(k, v) for k, v in headers.items() if k.lower() not in _HOP_HEADERS]
+
+
+async def buffer_response(response: httpx.Response, request: httpx.Request) -> httpx.Response:
+    """Read and close a transport response, returning an in-memory copy.
+
+    The copy carries the decoded body, so transfer-encoding headers are dropped.
+    It can be handed to callers other than the one that made the request.
+
+    :param response: Streaming response from a transport
+    :type response: httpx.Response
+    :param request: Request to attach to the copy
+    :type request: httpx.Request
+    :returns: Fully buffered response
+    :rtype: httpx.Response
+    """
+    try:
+        content = await response.aread()
+    finally:
+        await response.aclose()
+    return httpx.Response(
+        response.status_code, headers=_stored_headers(response.headers), content=content, request=request
+    )
+
+
+class CachingTransport(httpx.AsyncBaseTransport):
+    """Transport that serves GET responses from a :class:`ResponseCache`.
+
+    Only successful (200) GET responses on paths with a positive TTL are stored.
+    Requests carrying :data:`STREAM_EXTENSION` are still answered from the cache
+    but their fresh responses are passed through unbuffered and not stored.
+
+    :param transport: Wrapped transport that performs real requests
+    :type transport: httpx.AsyncBaseTransport
+    :param cache: Cache to read from and write to
+    :type cache: ResponseCache
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, cache: ResponseCache) -> None:
+        self._transport = transport
+        self.cache = cache
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """Return a cached response or forward to the wrapped transport.
+
+        :param request: Outgoing request
+        :type request: httpx.Request
+        :returns: Cached or fresh response
+        :rtype: httpx.Response
+        """
+        ttl = self.cache.ttl_for(request.url.path) if request.method == "GET" else 0.0
+        if ttl <= 0:
+            return await self._transport.handle_async_request(request)
+
+        key = normalize_cache_key(request)
+        entry = await self.cache.get(key)
+        if entry is not None:
+            logger.debug("cache hit: %s", key)
+            return httpx.Response(
+                entry.status_code, headers=entry.headers, content=entry.content, request=request
+            )
+
+        response = await self._transport.handle_async_request(request)
+        if response.status_code != 200 or request.extensions.get(STREAM_EXTENSION):
+            return response
+        response = await buffer_response(response, request)
+        entry = CacheEntry(
+            status_code=response.status_code,
+            headers=list(response.headers.multi_items()),
+            content=response.content,
+            expires_at=self.cache.clock() + ttl,
+        )
+        await self.cache.set(key, entry)
+        return response
+
+    async def aclose(self) -> None:
+        """Close the wrapped transport."""
+        await self._transport.aclose()
@@ -0,0 +1,243 @@
+"""Per-tool deadline budgets propagated to upstream requests.
+
+:class:`DeadlineMiddleware` gives each tool call a time budget, taken from the
+MCP request (``_meta.timeoutSeconds``) or from configuration, and runs the
+call under :func:`deadline_scope`. The scope cancels the call when the budget
+runs out, which tears down its in-flight upstream requests, and publishes the
+deadline in a context variable. Lower layers read it with :func:`remaining`:
+the scheduler clamps each attempt's httpx timeout to it and stops retrying or
+waiting for rate-limit tokens it cannot use, and the PubChem searches pass it
+on as ``MaxSeconds``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Mapping, Optional
+
+import httpx
+from fastmcp.server.middleware import CallNext, Middleware, MiddlewareContext
+from fastmcp.tools.tool import ToolResult
+
+logger = logging.getLogger(__name__)
+
+# Key in a tools/call request's ``_meta`` holding the client's budget in seconds
+META_TIMEOUT_KEY = "timeoutSeconds"
+# Budget for tools without a configured one; empty or 0 disables deadlines
+DEFAULT_DEADLINE: Optional[float] = float(os.environ.get("API_TOOL_DEADLINE", "120") or 0) or None
+# Upper bound for budgets requested by clients
+MAX_DEADLINE: float = float(os.environ.get("API_TOOL_MAX_DEADLINE", "600"))
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a tool call cannot finish within its deadline budget."""
+
+
+@dataclass(frozen=True)
+class Deadline:
+    """Absolute deadline of the current tool call.
+
+    :param expires_at: :func:`time.monotonic` value at which the budget is used up
+    :type expires_at: float
+    :param budget: Total budget in seconds, for error messages
+    :type budget: float
+    """
+
+    expires_at: float
+    budget: float
+
+    def remaining(self) -> float:
+        """Return the seconds left, never negative."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def describe(self) -> str:
+        """Return e.g. ``"1.2s of the 30s budget left"``."""
+        return f"{self.remaining():.1f}s of the {self.budget:g}s budget left"
+
+
+_DEADLINE: ContextVar[Optional[Deadline]] = ContextVar("irmcp_deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """Return the deadline of the current tool call, if any.
+
+    :returns: Deadline, or None outside a :func:`deadline_scope`
+    :rtype: Optional[Deadline]
+    """
+    return _DEADLINE.get()
+
+
+def remaining() -> Optional[float]:
+    """Return the seconds left in the current tool call's budget.
+
+    :returns: Seconds left (0 once expired), or None without a deadline
+    :rtype: Optional[float]
+    """
+    deadline = _DEADLINE.get()
+    return deadline.remaining() if deadline is not None else None
+
+
+def clamp_timeout(timeout: Mapping[str, Optional[float]]) -> Dict[str, Optional[float]]:
+    """Limit httpx per-phase timeouts (``connect``, ``read``, ...) to the remaining budget.
+
+    :param timeout: httpx ``timeout`` request extension
+    :type timeout: Mapping[str, Optional[float]]
+    :returns: Timeouts no longer than the remaining budget (unchanged without a deadline)
+    :rtype: dict[str, Optional[float]]
+    """
+    left = remaining()
+    if left is None:
+        return dict(timeout)
+    return {phase: left if value is None else min(value, left) for phase, value in timeout.items()}
+
+
+def deadline_context(deadline: Optional[Deadline]) -> contextvars.Context:
+    """Return a copy of the current context running under ``deadline``.
+
+    :param deadline: Deadline for work started in the context; None for no deadline
+    :type deadline: Optional[Deadline]
+    :returns: Context for :func:`asyncio.create_task`
+    :rtype: contextvars.Context
+    """
+    context = contextvars.copy_context()
+    context.run(_DEADLINE.set, deadline)
+    return context
+
+
+def without_deadline() -> contextvars.Context:
+    """Return a copy of the current context with no deadline.
+
+    Work shared by callers whose deadlines are not tracked (a CID batch) runs in
+    this context so one caller's short budget does not fail the others.
+
+    :returns: Context for :func:`asyncio.create_task`
+    :rtype: contextvars.Context
+    """
+    return deadline_context(None)
+
+
+def extend_deadline(context: contextvars.Context, deadline: Optional[Deadline]) -> None:
+    """Move the deadline of a task's ``context`` out to ``deadline`` if that is later.
+
+    Work shared by several callers (a singleflight request) runs under the
+    latest of their deadlines, so it keeps the budget-aware timeouts and
+    retries without failing a caller that has more time than the one that
+    started it. Must not be called from the task running in ``context``.
+
+    :param context: Context of the shared task, from :func:`deadline_context`
+    :type context: contextvars.Context
+    :param deadline: Deadline of a caller joining the task; None for no deadline
+    :type deadline: Optional[Deadline]
+    """
+    current = context.get(_DEADLINE)
+    if current is not None and (deadline is None or deadline.expires_at > current.expires_at):
+        context.run(_DEADLINE.set, deadline)
+
+
+@asynccontextmanager
+async def deadline_scope(seconds: float, what: str = "Request") -> AsyncIterator[Deadline]:
+    """Run the body under a deadline of ``seconds``, cancelling it when the budget runs out.
+
+    A tighter enclosing deadline is kept.
+
+    :param seconds: Budget in seconds
+    :type seconds: float
+    :param what: Subject of the error message, e.g. ``"Tool search_studies"``
+    :type what: str
+    :returns: Async context manager yielding the effective deadline
+    :rtype: AsyncIterator[Deadline]
+    :raises DeadlineExceeded: If the body is still running when the budget is used up
+    """
+    deadline = Deadline(time.monotonic() + seconds, seconds)
+    outer = _DEADLINE.get()
+    if outer is not None and outer.expires_at < deadline.expires_at:
+        deadline = outer
+    token = _DEADLINE.set(deadline)
+    loop = asyncio.get_running_loop()
+    try:
+        async with asyncio.timeout_at(loop.time() + deadline.remaining()) as scope:
+            yield deadline
+    except TimeoutError as e:
+        if isinstance(e, DeadlineExceeded) or not scope.expired():
+            raise
+        raise DeadlineExceeded(f"{what} did not finish within its {deadline.budget:g}s deadline") from None
+    finally:
+        _DEADLINE.reset(token)
+
+
+def load_deadlines(defaults: Mapping[str, float]) -> Dict[str, float]:
+    """Merge per-tool budgets with ``API_TOOL_DEADLINES`` (``tool=seconds,...``).
+
+    :param defaults: The server's built-in budgets per tool name
+    :type defaults: Mapping[str, float]
+    :returns: Budgets per tool name
+    :rtype: dict[str, float]
+    :raises ValueError: If an entry's budget is not a number
+    """
+    deadlines = dict(defaults)
+    for item in os.environ.get("API_TOOL_DEADLINES", "").split(","):
+        name, sep, seconds = item.partition("=")
+        if sep and name.strip():
+            deadlines[name.strip()] = float(seconds)
+    return deadlines
+
+
+def _requested_budget(message: Any) -> Optional[float]:
+    meta = getattr(message, "meta", None)
+    value = (getattr(meta, "model_extra", None) or {}).get(META_TIMEOUT_KEY)
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+        return None
+    return min(float(value), MAX_DEADLINE)
+
+
+class DeadlineMiddleware(Middleware):
+    """FastMCP middleware running each tool call under its deadline budget.
+
+    The budget is the request's ``_meta.timeoutSeconds`` (capped at
+    ``MAX_DEADLINE``), else the tool's configured budget, else ``default``.
+    Upstream timeouts are reported with the budget left.
+
+    :param deadlines: Budgets in seconds per tool name
+    :type deadlines: Mapping[str, float]
+    :param default: Budget for other tools; None leaves them unbounded
+    :type default: Optional[float]
+    """
+
+    def __init__(self, deadlines: Mapping[str, float], default: Optional[float] = DEFAULT_DEADLINE) -> None:
+        self.deadlines = dict(deadlines)
+        self.default = default
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next: CallNext) -> ToolResult:
+        name = context.message.name
+        seconds = _requested_budget(context.message) or self.deadlines.get(name, self.default)
+        if not seconds or seconds <= 0:
+            return await call_next(context)
+        async with deadline_scope(seconds, f"Tool {name}") as deadline:
+            try:
+                return await call_next(context)
+            except httpx.TimeoutException as e:
+                raise DeadlineExceeded(
+                    f"Upstream request of tool {name} timed out ({type(e).__name__}); {deadline.describe()}"
+                ) from e
+
+
+def register_deadlines(app: Any, deadlines: Mapping[str, float]) -> DeadlineMiddleware:
+    """Install per-tool deadline budgets on a server.
+
+    :param app: FastMCP server instance
+    :type app: Any
+    :param deadlines: Budgets per tool name (see :func:`load_deadlines`)
+    :type deadlines: Mapping[str, float]
+    :returns: The installed middleware
+    :rtype: DeadlineMiddleware
+    """
+    middleware = DeadlineMiddleware(deadlines)
+    app.add_middleware(middleware)
+    return middleware
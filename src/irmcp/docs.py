@@ -0,0 +1,68 @@
+"""Helpers for serving bundled markdown guides as indexed, in-memory sections."""
+
+import re
+from dataclasses import dataclass
+from typing import Dict, List
+
+
+@dataclass(frozen=True)
+class DocSection:
+    """One top-level section of a markdown guide.
+
+    :param slug: Stable identifier used in resource URIs and lookups
+    :type slug: str
+    :param title: Heading text without the leading ``#`` marks
+    :type title: str
+    :param text: Section body including its heading line
+    :type text: str
+    """
+
+    slug: str
+    title: str
+    text: str
+
+
+def slugify_heading(title: str) -> str:
+    """Turn a heading into a lowercase, dash-separated slug.
+
+    :param title: Heading text
+    :type title: str
+    :returns: Slug such as ``104-inversion-of-names``
+    :rtype: str
+    """
+    slug = re.sub(r"[^a-z0-9]+", "-", title.lower())
+    return slug.strip("-")
+
+
+def split_markdown_sections(text: str, level: int = 2) -> List[DocSection]:
+    """Split markdown into sections at headings of exactly ``level``.
+
+    Text before the first such heading is dropped; deeper headings stay inside
+    their parent section.
+
+    :param text: Markdown document
+    :type text: str
+    :param level: Heading depth to split on (2 for ``##``)
+    :type level: int
+    :returns: Sections in document order
+    :rtype: list[DocSection]
+    """
+    heading = re.compile(rf"^{'#' * level} (?!#)(.+)$", re.MULTILINE)
+    matches = list(heading.finditer(text))
+    sections = []
+    for i, m in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        title = m.group(1).strip()
+        sections.append(DocSection(slugify_heading(title), title, text[m.start():end].rstrip() + "\n"))
+    return sections
+
+
+def section_index(sections: Dict[str, DocSection]) -> str:
+    """Render a bullet list of ``slug: title`` lines.
+
+    :param sections: Sections keyed by slug
+    :type sections: dict[str, DocSection]
+    :returns: Markdown bullet list
+    :rtype: str
+    """
+    return "\n".join(f"- {slug}: {s.title}" for slug, s in sections.items())
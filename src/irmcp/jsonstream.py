@@ -0,0 +1,145 @@
+"""Incremental decoding of large JSON response bodies.
+
+:func:`iter_json_members` reads a JSON object from an async byte stream (such
+as ``httpx.Response.aiter_bytes()``) and yields its members as they complete,
+splitting one nested array into its elements. Callers can project or discard
+each element before the next is decoded, so memory is bounded by the largest
+element rather than by the whole body.
+"""
+
+from __future__ import annotations
+
+import codecs
+import json
+import re
+from typing import Any, AsyncIterator, Sequence, Tuple
+
+# Drop consumed text from the read buffer once this many characters are behind us
+_COMPACT_AT = 1 << 16
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class _TextReader:
+    """Decoded text of a byte stream, read on demand into a sliding buffer."""
+
+    def __init__(self, chunks: AsyncIterator[bytes]) -> None:
+        self._chunks = chunks
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    async def fill(self, size: int = 1) -> bool:
+        """Read until ``size`` unconsumed characters are buffered.
+
+        :param size: Unconsumed characters wanted
+        :type size: int
+        :returns: False if the stream ended first
+        :rtype: bool
+        """
+        if self.pos >= _COMPACT_AT:
+            self.buf, self.pos = self.buf[self.pos:], 0
+        while len(self.buf) - self.pos < size and not self.eof:
+            try:
+                chunk = await self._chunks.__anext__()
+            except StopAsyncIteration:
+                self.eof, chunk = True, b""
+            self.buf += self._decoder.decode(chunk, final=self.eof)
+        return len(self.buf) - self.pos >= size
+
+    async def peek(self) -> str:
+        """Skip whitespace and return the next character ("" at the end of the stream)."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()  # type: ignore[union-attr]
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not await self.fill():
+                return ""
+
+    async def expect(self, chars: str) -> str:
+        """Consume the next character, which must be one of ``chars``."""
+        char = await self.peek()
+        if not char or char not in chars:
+            found = repr(char) if char else "end of data"
+            raise ValueError(f"malformed JSON: expected one of {chars!r}, found {found}")
+        self.pos += 1
+        return char
+
+    async def value(self, decoder: json.JSONDecoder) -> Any:
+        """Decode the next complete JSON value, reading more text as needed."""
+        await self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buf, self.pos)
+                # A number that ends the buffer may continue in the next chunk
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Double the unconsumed text before retrying so a large value is not
+            # re-scanned once per chunk
+            await self.fill(2 * (len(self.buf) - self.pos))
+
+
+async def _members(
+    reader: _TextReader, decoder: json.JSONDecoder, path: Sequence[str], prefix: Tuple[str, ...]
+) -> AsyncIterator[Tuple[Tuple[str, ...], Any]]:
+    # The reader is positioned just after the object's "{"
+    if await reader.peek() == "}":
+        reader.pos += 1
+        return
+    while True:
+        key = await reader.value(decoder)
+        if not isinstance(key, str):
+            raise ValueError(f"malformed JSON: object key {key!r} is not a string")
+        await reader.expect(":")
+        here = prefix + (key,)
+        char = await reader.peek()
+        if path and key == path[0] and len(path) > 1 and char == "{":
+            reader.pos += 1
+            async for item in _members(reader, decoder, path[1:], here):
+                yield item
+        elif path and key == path[0] and len(path) == 1 and char == "[":
+            reader.pos += 1
+            if await reader.peek() == "]":
+                reader.pos += 1
+            else:
+                while True:
+                    yield here, await reader.value(decoder)
+                    if await reader.expect(",]") == "]":
+                        break
+        else:
+            yield here, await reader.value(decoder)
+        if await reader.expect(",}") == "}":
+            return
+
+
+async def iter_json_members(
+    chunks: AsyncIterator[bytes], path: Sequence[str]
+) -> AsyncIterator[Tuple[Tuple[str, ...], Any]]:
+    """Yield the members of a JSON object as they arrive, splitting the array at ``path``.
+
+    Objects along ``path`` are descended into; elements of the array at its end
+    are yielded one at a time as ``(path, element)``. Every other member is
+    yielded whole as ``(key path, value)``. For ``path=("Record", "Section")``
+    and ``{"Record": {"RecordTitle": "x", "Section": [a, b]}}`` this yields
+    ``(("Record", "RecordTitle"), "x")``, ``(("Record", "Section"), a)`` and
+    ``(("Record", "Section"), b)``.
+
+    :param chunks: Raw body bytes, e.g. ``response.aiter_bytes()``
+    :type chunks: AsyncIterator[bytes]
+    :param path: Keys leading to the array to split
+    :type path: Sequence[str]
+    :returns: Async iterator of ``(key path, value)`` pairs
+    :rtype: AsyncIterator[tuple[tuple[str, ...], Any]]
+    :raises ValueError: If the body is not a well-formed JSON object
+    """
+    reader = _TextReader(chunks)
+    decoder = json.JSONDecoder()
+    await reader.expect("{")
+    async for item in _members(reader, decoder, tuple(path), ()):
+        yield item
+    if await reader.peek():
+        raise ValueError("malformed JSON: data after the top-level object")
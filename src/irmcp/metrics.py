@@ -0,0 +1,592 @@
+"""Lightweight in-process metrics with Prometheus text exposition.
+
+A process-wide :data:`REGISTRY` holds counter, gauge and histogram families.
+:class:`MetricsTransport` records upstream latency, status codes, response
+sizes, connection-pool waits and in-flight requests per operationId;
+:class:`MetricsMiddleware` records tool latency. :func:`render_prometheus` and
+the optional HTTP exporter (:func:`start_metrics_server`) expose the result.
+:class:`SamplingProfiler` is an opt-in stack sampler producing folded stacks
+for flame graphs.
+"""
+
+from __future__ import annotations
+
+import abc
+import bisect
+import logging
+import math
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import httpx
+from fastmcp.server.middleware import CallNext, Middleware, MiddlewareContext
+from fastmcp.tools.tool import ToolResult
+
+from irmcp.cache import _template_to_regex
+
+logger = logging.getLogger(__name__)
+
+LabelValues = Tuple[str, ...]
+Sample = Tuple[str, Mapping[str, str], float]
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Family(abc.ABC):
+    """Base for a named metric with a fixed set of label names."""
+
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str], lock: threading.Lock) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = lock
+
+    def render(self) -> List[str]:
+        """Return exposition lines for this family, including HELP and TYPE.
+
+        :returns: Lines without trailing newlines
+        :rtype: list[str]
+        """
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+    @abc.abstractmethod
+    def _samples(self) -> List[str]:
+        """Return the sample lines of every series."""
+
+
+class Counter(_Family):
+    """Monotonic counter family."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str], lock: threading.Lock) -> None:
+        super().__init__(name, help, labelnames, lock)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        """Add ``amount`` to the series identified by ``labels``.
+
+        :param labels: Label values in ``labelnames`` order
+        :type labels: str
+        :param amount: Increment
+        :type amount: float
+        """
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        """Return the current value of a series.
+
+        :param labels: Label values in ``labelnames`` order
+        :type labels: str
+        :returns: Value, or 0 if the series was never incremented
+        :rtype: float
+        """
+        return self._values.get(labels, 0.0)
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in self._values.items()]
+
+
+class Gauge(Counter):
+    """Gauge family: a counter that can also go down or be set."""
+
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        """Subtract ``amount`` from a series.
+
+        :param labels: Label values in ``labelnames`` order
+        :type labels: str
+        :param amount: Decrement
+        :type amount: float
+        """
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels: str, value: float) -> None:
+        """Set a series to ``value``.
+
+        :param labels: Label values in ``labelnames`` order
+        :type labels: str
+        :param value: New value
+        :type value: float
+        """
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Family):
+    """Cumulative histogram family with fixed upper bounds.
+
+    :param buckets: Finite, increasing bucket upper bounds; ``+Inf`` is implied
+    :type buckets: Sequence[float]
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help: str, labelnames: Sequence[str], lock: threading.Lock, buckets: Sequence[float]
+    ) -> None:
+        super().__init__(name, help, labelnames, lock)
+        self.buckets = tuple(buckets)
+        # Per series: per-bucket counts (last is +Inf), sum
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        """Record one observation.
+
+        :param value: Observed value
+        :type value: float
+        :param labels: Label values in ``labelnames`` order
+        :type labels: str
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def count(self, *labels: str) -> int:
+        """Return the number of observations in a series.
+
+        :param labels: Label values in ``labelnames`` order
+        :type labels: str
+        :returns: Observation count, 0 for an unknown series
+        :rtype: int
+        """
+        series = self._values.get(labels)
+        return sum(series[0]) if series else 0
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total[0])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metric families plus callbacks sampled at render time."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._families: Dict[str, _Family] = {}
+        self._collectors: List[Tuple[str, str, str, Callable[[], Iterable[Sample]]]] = []
+
+    def _get(self, name: str, factory: Callable[[], _Family]) -> Any:
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = factory()
+        return family
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Return (creating once) a counter family.
+
+        :param name: Metric name
+        :type name: str
+        :param help: Help text
+        :type help: str
+        :param labelnames: Label names of the family's series
+        :type labelnames: Sequence[str]
+        :returns: The family registered under ``name``
+        :rtype: Counter
+        """
+        return self._get(name, lambda: Counter(name, help, labelnames, self._lock))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """Return (creating once) a gauge family.
+
+        :param name: Metric name
+        :type name: str
+        :param help: Help text
+        :type help: str
+        :param labelnames: Label names of the family's series
+        :type labelnames: Sequence[str]
+        :returns: The family registered under ``name``
+        :rtype: Gauge
+        """
+        return self._get(name, lambda: Gauge(name, help, labelnames, self._lock))
+
+    def histogram(
+        self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = SECONDS_BUCKETS
+    ) -> Histogram:
+        """Return (creating once) a histogram family.
+
+        :param name: Metric name
+        :type name: str
+        :param help: Help text
+        :type help: str
+        :param labelnames: Label names of the family's series
+        :type labelnames: Sequence[str]
+        :param buckets: Finite, increasing bucket upper bounds
+        :type buckets: Sequence[float]
+        :returns: The family registered under ``name``
+        :rtype: Histogram
+        """
+        return self._get(name, lambda: Histogram(name, help, labelnames, self._lock, buckets))
+
+    def add_collector(self, name: str, kind: str, help: str, collect: Callable[[], Iterable[Sample]]) -> None:
+        """Register a callback whose samples are read at render time.
+
+        Use this for values another component already tracks (e.g. cache stats).
+
+        :param name: Metric name
+        :type name: str
+        :param kind: Prometheus type (``counter`` or ``gauge``)
+        :type kind: str
+        :param help: Help text
+        :type help: str
+        :param collect: Returns ``(name, labels, value)`` samples
+        :type collect: Callable[[], Iterable[tuple[str, Mapping[str, str], float]]]
+        """
+        with self._lock:
+            self._collectors.append((name, kind, help, collect))
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format.
+
+        :returns: Exposition text
+        :rtype: str
+        """
+        lines: List[str] = []
+        with self._lock:
+            for family in self._families.values():
+                lines.extend(family.render())
+            collectors = list(self._collectors)
+        seen = set()
+        for name, kind, help, collect in collectors:
+            if name not in seen:
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+                seen.add(name)
+            for sample, labels, value in collect():
+                names, values = zip(*labels.items()) if labels else ((), ())
+                lines.append(f"{sample}{_format_labels(names, values)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+TOOL_SECONDS = REGISTRY.histogram("irmcp_tool_duration_seconds", "Tool call latency", ("server", "tool"))
+TOOL_CALLS = REGISTRY.counter("irmcp_tool_calls_total", "Tool calls by outcome", ("server", "tool", "outcome"))
+TOOL_IN_FLIGHT = REGISTRY.gauge("irmcp_tool_in_flight", "Tool calls in progress", ("server",))
+UPSTREAM_SECONDS = REGISTRY.histogram(
+    "irmcp_upstream_duration_seconds", "Upstream request latency until the body is read", ("server", "operation")
+)
+UPSTREAM_RESPONSES = REGISTRY.counter(
+    "irmcp_upstream_responses_total", "Upstream responses by status code", ("server", "operation", "status")
+)
+UPSTREAM_BYTES = REGISTRY.histogram(
+    "irmcp_upstream_response_bytes", "Upstream response body size", ("server", "operation"), BYTES_BUCKETS
+)
+UPSTREAM_POOL_WAIT = REGISTRY.histogram(
+    "irmcp_upstream_pool_wait_seconds", "Time waiting for a pooled or new connection", ("server",)
+)
+UPSTREAM_IN_FLIGHT = REGISTRY.gauge("irmcp_upstream_in_flight", "Upstream requests in progress", ("server",))
+
+
+class OperationIndex:
+    """Map request paths back to OpenAPI operationIds.
+
+    Templates with fewer placeholders are tried first so ``/studies/metadata``
+    wins over ``/studies/{nctId}``. Operations without an operationId are
+    labeled ``METHOD template``.
+
+    :param spec: OpenAPI document (``paths`` is read)
+    :type spec: Mapping[str, Any]
+    """
+
+    def __init__(self, spec: Mapping[str, Any]) -> None:
+        rules = []
+        for template, item in (spec.get("paths") or {}).items():
+            for method, op in item.items():
+                if isinstance(op, dict) and method.upper() in ("GET", "POST", "PUT", "DELETE", "PATCH", "HEAD"):
+                    label = op.get("operationId") or f"{method.upper()} {template}"
+                    rules.append((template.count("{"), -len(template), method.upper(), _template_to_regex(template), label))
+        rules.sort(key=lambda r: (r[0], r[1]))
+        self._rules = [(method, pattern, label) for _, _, method, pattern, label in rules]
+
+    def __call__(self, method: str, path: str) -> str:
+        """Return the operation label for a request, or ``other``.
+
+        :param method: HTTP method
+        :type method: str
+        :param path: Request URL path
+        :type path: str
+        :returns: operationId or fallback label
+        :rtype: str
+        """
+        for rule_method, pattern, label in self._rules:
+            if rule_method == method and pattern.search(path):
+                return label
+        return "other"
+
+
+class _CountingStream(httpx.AsyncByteStream):
+    """Response stream that records size and total latency once fully read or closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, done: Callable[[int], None]) -> None:
+        self._stream = stream
+        self._done: Optional[Callable[[int], None]] = done
+        self._size = 0
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            self._size += len(chunk)
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._done is not None:
+                self._done(self._size)
+                self._done = None
+
+
+class MetricsTransport(httpx.AsyncBaseTransport):
+    """Transport recording per-operation upstream metrics.
+
+    Sits directly above the network transport, so every attempt (including
+    retries) is counted.
+
+    :param transport: Wrapped network transport
+    :type transport: httpx.AsyncBaseTransport
+    :param server: ``server`` label value
+    :type server: str
+    :param operations: Maps ``(method, path)`` to an operation label
+    :type operations: Optional[Callable[[str, str], str]]
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        server: str,
+        operations: Optional[Callable[[str, str], str]] = None,
+    ) -> None:
+        self._transport = transport
+        self.server = server
+        self.operations = operations
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """Forward ``request`` and record its metrics.
+
+        :param request: Outgoing request
+        :type request: httpx.Request
+        :returns: Response whose stream records size and latency when closed
+        :rtype: httpx.Response
+        """
+        operation = self.operations(request.method, request.url.path) if self.operations else "all"
+        start = time.perf_counter()
+        waited = False
+        outer_trace = request.extensions.get("trace")
+
+        async def trace(event: str, info: Dict[str, Any]) -> None:
+            nonlocal waited
+            if not waited and (event.endswith("connect_tcp.started") or event.endswith("send_request_headers.started")):
+                waited = True
+                UPSTREAM_POOL_WAIT.observe(time.perf_counter() - start, self.server)
+            if outer_trace is not None:
+                await outer_trace(event, info)
+
+        request.extensions["trace"] = trace
+        UPSTREAM_IN_FLIGHT.inc(self.server)
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException as e:
+            UPSTREAM_IN_FLIGHT.dec(self.server)
+            UPSTREAM_RESPONSES.inc(self.server, operation, type(e).__name__)
+            raise
+
+        UPSTREAM_RESPONSES.inc(self.server, operation, str(response.status_code))
+
+        def done(size: int) -> None:
+            UPSTREAM_IN_FLIGHT.dec(self.server)
+            UPSTREAM_SECONDS.observe(time.perf_counter() - start, self.server, operation)
+            UPSTREAM_BYTES.observe(size, self.server, operation)
+
+        if response.is_closed or not isinstance(response.stream, httpx.AsyncByteStream):
+            # Already buffered (e.g. built from bytes): nothing left to stream
+            done(len(response.content))
+        else:
+            response.stream = _CountingStream(response.stream, done)
+        return response
+
+    async def aclose(self) -> None:
+        """Close the wrapped transport."""
+        await self._transport.aclose()
+
+
+class MetricsMiddleware(Middleware):
+    """FastMCP middleware recording tool latency, outcomes and in-flight calls.
+
+    :param server: ``server`` label value
+    :type server: str
+    """
+
+    def __init__(self, server: str) -> None:
+        self.server = server
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next: CallNext) -> ToolResult:
+        tool = context.message.name
+        start = time.perf_counter()
+        outcome = "error"
+        TOOL_IN_FLIGHT.inc(self.server)
+        try:
+            result = await call_next(context)
+            outcome = "ok"
+            return result
+        finally:
+            TOOL_IN_FLIGHT.dec(self.server)
+            TOOL_SECONDS.observe(time.perf_counter() - start, self.server, tool)
+            TOOL_CALLS.inc(self.server, tool, outcome)
+
+
+class SamplingProfiler:
+    """Background thread sampling every other thread's Python stack.
+
+    Stacks are aggregated in folded format (``outer;inner count``), which
+    flame graph tools read directly.
+
+    :param interval: Seconds between samples
+    :type interval: float
+    :param max_stacks: Distinct stacks kept; further new stacks are counted as ``[other]``
+    :type max_stacks: int
+    """
+
+    def __init__(self, interval: float = 0.01, max_stacks: int = 10_000) -> None:
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self.samples = 0
+        self._stacks: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start sampling (no-op if already running)."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="irmcp-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling and wait for the thread to exit."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                names = []
+                f: Any = frame
+                while f is not None:
+                    code = f.f_code
+                    names.append(f"{f.f_globals.get('__name__', '?')}:{code.co_name}")
+                    f = f.f_back
+                stack = ";".join(reversed(names))
+                if stack not in self._stacks and len(self._stacks) >= self.max_stacks:
+                    stack = "[other]"
+                self._stacks[stack] = self._stacks.get(stack, 0) + 1
+            self.samples += 1
+
+    def folded(self) -> str:
+        """Return aggregated stacks in folded format, most frequent first.
+
+        :returns: One ``stack count`` line per distinct stack
+        :rtype: str
+        """
+        stacks = sorted(dict(self._stacks).items(), key=lambda kv: -kv[1])
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+
+def _handler(registry: MetricsRegistry, profiler: Optional[SamplingProfiler]) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?")[0] == "/metrics":
+                body = registry.render().encode("utf-8")
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            elif self.path.split("?")[0] == "/profile" and profiler is not None:
+                body = profiler.folded().encode("utf-8")
+                content_type = "text/plain; charset=utf-8"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            logger.debug("metrics exporter: " + format, *args)
+
+    return Handler
+
+
+def start_metrics_server(
+    port: int, host: str = "127.0.0.1", registry: MetricsRegistry = REGISTRY, profiler: Optional[SamplingProfiler] = None
+) -> ThreadingHTTPServer:
+    """Serve ``/metrics`` (and ``/profile`` when profiling) from a daemon thread.
+
+    Works alongside STDIO servers, which have no HTTP app of their own.
+
+    :param port: TCP port; 0 picks a free one
+    :type port: int
+    :param host: Bind address
+    :type host: str
+    :param registry: Registry to expose
+    :type registry: MetricsRegistry
+    :param profiler: Profiler whose folded stacks ``/profile`` returns
+    :type profiler: Optional[SamplingProfiler]
+    :returns: The running server (``server_address`` holds the bound port)
+    :rtype: http.server.ThreadingHTTPServer
+    """
+    server = ThreadingHTTPServer((host, port), _handler(registry, profiler))
+    threading.Thread(target=server.serve_forever, name="irmcp-metrics", daemon=True).start()
+    return server
@@ -0,0 +1,435 @@
+"""Tool result slimming: projection, exclusion, text truncation and empty-value dropping.
+
+:class:`SlimmingMiddleware` post-processes the structured content of tool
+results according to a :class:`ProjectionRule` per tool name (the operationId
+for generated OpenAPI tools). Long strings are cut and kept in a
+:class:`TextStore`; the ``read_truncated`` tool returns the rest.
+
+Paths use a small JSONPath subset: dot-separated keys, ``*`` for every key or
+item, ``[n]``/``[*]`` for list items, and an optional leading ``$``. A key step
+applied to a list maps over its items, so ``studies.protocolSection`` and
+``studies[*].protocolSection`` are equivalent.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Union
+
+from fastmcp.exceptions import NotFoundError
+from fastmcp.server.middleware import CallNext, Middleware, MiddlewareContext
+from fastmcp.tools.tool import ToolResult
+
+logger = logging.getLogger(__name__)
+
+Token = Union[str, int]
+# Path trie: token -> sub-trie; an empty sub-trie selects the whole value
+Trie = Dict[Token, "Trie"]
+
+_MISSING = object()
+_STEP = re.compile(r"([^.\[\]]+)|\[(\*|\d+)\]")
+
+DEFAULT_READ_LENGTH = 20_000
+
+
+def parse_path(path: str) -> List[Token]:
+    """Split a JSONPath-style path into key, index and wildcard tokens.
+
+    :param path: Path such as ``$.studies[*].protocolSection``
+    :type path: str
+    :returns: Tokens; ints for list indexes, ``"*"`` for wildcards
+    :rtype: list[str | int]
+    :raises ValueError: If the path contains no steps
+    """
+    tokens: List[Token] = []
+    for key, index in _STEP.findall(path):
+        if key == "$" and not tokens:
+            continue
+        if index:
+            tokens.append("*" if index == "*" else int(index))
+        else:
+            tokens.append(key)
+    if not tokens:
+        raise ValueError(f"Empty projection path: {path!r}")
+    return tokens
+
+
+def build_trie(paths: Sequence[str]) -> Trie:
+    """Combine paths into a trie so shared prefixes are walked once.
+
+    :param paths: JSONPath-style paths
+    :type paths: Sequence[str]
+    :returns: Path trie
+    :rtype: dict
+    """
+    trie: Trie = {}
+    for path in paths:
+        node = trie
+        tokens = parse_path(path)
+        for i, token in enumerate(tokens):
+            if token in node and not node[token]:
+                break  # a shorter path already selects this whole subtree
+            if i == len(tokens) - 1:
+                node[token] = {}
+            else:
+                node = node.setdefault(token, {})
+    return trie
+
+
+def _union(a: Trie, b: Trie) -> Trie:
+    if not a or not b:
+        return {}
+    merged: Trie = dict(a)
+    for token, sub in b.items():
+        merged[token] = _union(merged[token], sub) if token in merged else sub
+    return merged
+
+
+def _merge(a: Optional[Trie], b: Optional[Trie]) -> Optional[Trie]:
+    if a is None or b is None:
+        return a if b is None else b
+    return _union(a, b)
+
+
+def _is_index_trie(trie: Trie) -> bool:
+    return any(isinstance(t, int) or t == "*" for t in trie)
+
+
+def project(data: Any, trie: Trie) -> Any:
+    """Keep only the parts of ``data`` selected by ``trie``.
+
+    :param data: JSON-compatible value
+    :type data: Any
+    :param trie: Trie from :func:`build_trie`
+    :type trie: dict
+    :returns: Projected value, or a sentinel when nothing matched
+    :rtype: Any
+    """
+    if not trie:
+        return data
+    if isinstance(data, dict):
+        out: Dict[str, Any] = {}
+        for key, value in data.items():
+            sub = _merge(trie.get("*"), trie.get(key))
+            if sub is not None:
+                projected = project(value, sub)
+                if projected is not _MISSING:
+                    out[key] = projected
+        return out if out else _MISSING
+    if isinstance(data, list):
+        items: List[Any] = []
+        for i, item in enumerate(data):
+            sub = _merge(trie.get("*"), trie.get(i)) if _is_index_trie(trie) else trie
+            if sub is not None:
+                projected = project(item, sub)
+                if projected is not _MISSING:
+                    items.append(projected)
+        return items if items else _MISSING
+    return _MISSING
+
+
+def exclude(data: Any, trie: Trie) -> Any:
+    """Return ``data`` without the parts selected by ``trie``.
+
+    :param data: JSON-compatible value
+    :type data: Any
+    :param trie: Trie from :func:`build_trie`
+    :type trie: dict
+    :returns: Copy of ``data`` with the selected values removed
+    :rtype: Any
+    """
+    if isinstance(data, dict):
+        out: Dict[str, Any] = {}
+        for key, value in data.items():
+            sub = _merge(trie.get("*"), trie.get(key))
+            if sub is None:
+                out[key] = value
+            elif sub:
+                out[key] = exclude(value, sub)
+        return out
+    if isinstance(data, list):
+        if not _is_index_trie(trie):
+            return [exclude(item, trie) for item in data]
+        items: List[Any] = []
+        for i, item in enumerate(data):
+            sub = _merge(trie.get("*"), trie.get(i))
+            if sub is None:
+                items.append(item)
+            elif sub:
+                items.append(exclude(item, sub))
+        return items
+    return data
+
+
+def drop_empty(data: Any, keep: frozenset = frozenset()) -> Any:
+    """Recursively remove None values, empty lists and empty objects.
+
+    :param data: JSON-compatible value
+    :type data: Any
+    :param keep: Top-level keys to keep even when empty (e.g. schema-required keys)
+    :type keep: frozenset
+    :returns: Cleaned copy of ``data``
+    :rtype: Any
+    """
+    if isinstance(data, dict):
+        out = {}
+        for key, value in data.items():
+            value = drop_empty(value)
+            if key in keep or value not in (None, [], {}):
+                out[key] = value
+        return out
+    if isinstance(data, list):
+        return [v for v in (drop_empty(item) for item in data) if v not in (None, [], {})]
+    return data
+
+
+class TextStore:
+    """LRU store for the full text of truncated strings, bounded by total characters.
+
+    Handles are content hashes, so truncating the same text twice reuses one entry.
+
+    :param max_chars: Total characters kept before the oldest texts are dropped
+    :type max_chars: int
+    """
+
+    def __init__(self, max_chars: int = 16 * 1024 * 1024) -> None:
+        self.max_chars = max_chars
+        self.current_chars = 0
+        self._texts: "OrderedDict[str, str]" = OrderedDict()
+
+    def put(self, text: str) -> str:
+        """Store ``text`` and return its handle.
+
+        :param text: Full text
+        :type text: str
+        :returns: Handle for :meth:`read`
+        :rtype: str
+        """
+        handle = hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+        if handle in self._texts:
+            self._texts.move_to_end(handle)
+            return handle
+        self._texts[handle] = text
+        self.current_chars += len(text)
+        while self.current_chars > self.max_chars and len(self._texts) > 1:
+            _, old = self._texts.popitem(last=False)
+            self.current_chars -= len(old)
+        return handle
+
+    def read(self, handle: str, offset: int = 0, length: int = DEFAULT_READ_LENGTH) -> Dict[str, Any]:
+        """Return a slice of a stored text.
+
+        :param handle: Handle from a truncation marker
+        :type handle: str
+        :param offset: Character offset to start at
+        :type offset: int
+        :param length: Maximum characters to return
+        :type length: int
+        :returns: ``handle``, ``offset``, ``total_chars``, ``text`` and ``next_offset`` when more remain
+        :rtype: dict[str, Any]
+        :raises ValueError: If the handle is unknown or has been evicted
+        """
+        text = self._texts.get(handle)
+        if text is None:
+            raise ValueError(f"Unknown or expired text handle '{handle}'; call the original tool again")
+        self._texts.move_to_end(handle)
+        offset = max(0, offset)
+        end = min(len(text), offset + max(1, length))
+        result: Dict[str, Any] = {"handle": handle, "offset": offset, "total_chars": len(text), "text": text[offset:end]}
+        if end < len(text):
+            result["next_offset"] = end
+        return result
+
+
+def truncate_text(data: Any, max_chars: int, store: TextStore) -> Any:
+    """Cut strings longer than ``max_chars`` and append a continuation marker.
+
+    :param data: JSON-compatible value
+    :type data: Any
+    :param max_chars: Longest string kept intact
+    :type max_chars: int
+    :param store: Store receiving the full text of cut strings
+    :type store: TextStore
+    :returns: Copy of ``data`` with long strings truncated
+    :rtype: Any
+    """
+    if isinstance(data, str):
+        if len(data) <= max_chars:
+            return data
+        handle = store.put(data)
+        return (
+            f"{data[:max_chars]}… [truncated {len(data) - max_chars} chars; "
+            f"read_truncated(handle=\"{handle}\", offset={max_chars})]"
+        )
+    if isinstance(data, dict):
+        return {k: truncate_text(v, max_chars, store) for k, v in data.items()}
+    if isinstance(data, list):
+        return [truncate_text(v, max_chars, store) for v in data]
+    return data
+
+
+@dataclass
+class ProjectionRule:
+    """Slimming settings for one tool.
+
+    :param fields: Paths to keep; empty keeps everything
+    :type fields: Sequence[str]
+    :param exclude: Paths to remove after projection
+    :type exclude: Sequence[str]
+    :param max_text: Truncate strings longer than this many characters; 0 disables
+    :type max_text: int
+    :param drop_empty: Remove nulls, empty lists and empty objects
+    :type drop_empty: bool
+    """
+
+    fields: Sequence[str] = ()
+    exclude: Sequence[str] = ()
+    max_text: int = 0
+    drop_empty: bool = True
+    _fields: Trie = field(init=False, repr=False)
+    _exclude: Trie = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._fields = build_trie(self.fields)
+        self._exclude = build_trie(self.exclude)
+
+    def apply(self, data: Any, store: TextStore, keep: frozenset = frozenset()) -> Any:
+        """Apply projection, exclusion, empty dropping and truncation in that order.
+
+        :param data: Structured tool result
+        :type data: Any
+        :param store: Store for truncated text
+        :type store: TextStore
+        :param keep: Top-level keys never dropped as empty
+        :type keep: frozenset
+        :returns: Slimmed result
+        :rtype: Any
+        """
+        if self._fields:
+            projected = project(data, self._fields)
+            data = {} if projected is _MISSING else projected
+        if self._exclude:
+            data = exclude(data, self._exclude)
+        if self.drop_empty:
+            data = drop_empty(data, keep)
+        if self.max_text > 0:
+            data = truncate_text(data, self.max_text, store)
+        return data
+
+
+def load_projection_rules(
+    defaults: Mapping[str, ProjectionRule], path: Optional[str] = None
+) -> Dict[str, ProjectionRule]:
+    """Overlay rules from a JSON file on a server's defaults.
+
+    The file maps tool names to ``{"fields": [...], "exclude": [...], "max_text": n,
+    "drop_empty": bool}`` or to null to disable slimming for that tool. Honors
+    RESPONSE_PROJECTION_FILE when ``path`` is not given.
+
+    :param defaults: Server default rules
+    :type defaults: Mapping[str, ProjectionRule]
+    :param path: JSON file path
+    :type path: Optional[str]
+    :returns: Effective rules
+    :rtype: dict[str, ProjectionRule]
+    :raises ValueError: If the file is not a JSON object of rules
+    """
+    rules = dict(defaults)
+    path = path or os.environ.get("RESPONSE_PROJECTION_FILE")
+    if not path:
+        return rules
+    with open(path, "r", encoding="utf-8") as f:
+        overrides = json.load(f)
+    if not isinstance(overrides, dict):
+        raise ValueError(f"{path}: expected an object mapping tool names to rules")
+    for name, spec in overrides.items():
+        if spec is None:
+            rules.pop(name, None)
+        else:
+            rules[name] = ProjectionRule(**spec)
+    return rules
+
+
+def _compact_size(data: Any) -> int:
+    return len(json.dumps(data, separators=(",", ":"), ensure_ascii=False))
+
+
+class SlimmingMiddleware(Middleware):
+    """FastMCP middleware applying a :class:`ProjectionRule` to matching tool results.
+
+    If slimming removes a key the tool's output schema requires, the original
+    result is returned instead so clients never see schema violations.
+
+    :param rules: Tool names mapped to rules
+    :type rules: Mapping[str, ProjectionRule]
+    :param store: Store for truncated text
+    :type store: TextStore
+    :param server: Server the middleware is installed on, used to look up output
+        schemas (the request context points at the outermost server when mounted)
+    :type server: Any
+    """
+
+    def __init__(self, rules: Mapping[str, ProjectionRule], store: TextStore, server: Any = None) -> None:
+        self.rules = dict(rules)
+        self.store = store
+        self.server = server
+        self.raw_bytes = 0
+        self.slim_bytes = 0
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next: CallNext) -> ToolResult:
+        result = await call_next(context)
+        name = context.message.name
+        rule = self.rules.get(name)
+        if rule is None or not isinstance(result.structured_content, dict):
+            return result
+
+        required: frozenset = frozenset()
+        if self.server is not None:
+            try:
+                tool = await self.server.get_tool(name)
+                required = frozenset((tool.output_schema or {}).get("required", ()))
+            except NotFoundError:
+                pass
+        slim = rule.apply(result.structured_content, self.store, required)
+        if not isinstance(slim, dict) or not required <= slim.keys():
+            logger.warning("slimming %s dropped required keys; returning full result", name)
+            return result
+
+        raw_size, slim_size = _compact_size(result.structured_content), _compact_size(slim)
+        self.raw_bytes += raw_size
+        self.slim_bytes += slim_size
+        logger.info("slimmed %s result: %d -> %d bytes", name, raw_size, slim_size)
+        return ToolResult(structured_content=slim)
+
+
+def register_slimming(app: Any, rules: Mapping[str, ProjectionRule]) -> SlimmingMiddleware:
+    """Install result slimming and the ``read_truncated`` tool on a server.
+
+    :param app: FastMCP server instance
+    :type app: Any
+    :param rules: Tool names mapped to rules (see :func:`load_projection_rules`)
+    :type rules: Mapping[str, ProjectionRule]
+    :returns: The installed middleware
+    :rtype: SlimmingMiddleware
+    """
+    middleware = SlimmingMiddleware(rules, TextStore(), app)
+    app.add_middleware(middleware)
+
+    @app.tool(
+        name="read_truncated",
+        description=(
+            "Read the rest of a string that a tool result truncated. Pass the `handle` and "
+            "`offset` from the truncation marker; `next_offset` is returned while text remains."
+        ),
+    )
+    def read_truncated(handle: str, offset: int = 0, length: int = DEFAULT_READ_LENGTH) -> Dict[str, Any]:
+        return middleware.store.read(handle, offset, length)
+
+    return middleware
+
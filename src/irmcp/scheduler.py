@@ -0,0 +1,363 @@
+"""Upstream request scheduling: rate limiting, retries and adaptive concurrency.
+
+:class:`SchedulingTransport` sits between FastMCPOpenAPI's client and the
+network transport. Per upstream host it applies a token-bucket rate limit, an
+AIMD concurrency limit driven by observed latency and errors, and jittered
+exponential backoff on 429/503/504 that honors ``Retry-After``.
+
+Within a tool call's deadline (:mod:`irmcp.deadline`) each attempt's httpx
+timeout is clamped to the budget left, and waits for rate-limit tokens or
+retry backoff that would outlast the budget are not started.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import email.utils
+import logging
+import os
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, Optional
+
+import httpx
+
+from irmcp.deadline import DeadlineExceeded, clamp_timeout, current_deadline, remaining
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = frozenset({429, 503, 504})
+RETRY_METHODS = frozenset({"GET", "HEAD"})
+# Request extension marking a request of another method (e.g. a read-only POST
+# query) as safe to retry
+IDEMPOTENT_EXTENSION = "irmcp.idempotent"
+
+
+@dataclass(frozen=True)
+class SchedulerConfig:
+    """Scheduler settings for one upstream.
+
+    :param rate: Sustained requests per second; 0 disables rate limiting
+    :type rate: float
+    :param burst: Token-bucket capacity (requests allowed back to back)
+    :type burst: int
+    :param max_retries: Retries after the first attempt for retryable failures
+    :type max_retries: int
+    :param retry_base_delay: First backoff step in seconds
+    :type retry_base_delay: float
+    :param retry_max_delay: Upper bound for any single backoff or Retry-After wait
+    :type retry_max_delay: float
+    :param min_concurrency: Floor for the adaptive concurrency limit
+    :type min_concurrency: int
+    :param max_concurrency: Ceiling for the adaptive limit and the connection pool size
+    :type max_concurrency: int
+    :param latency_target: Responses slower than this (seconds) shrink the limit
+    :type latency_target: float
+    """
+
+    rate: float = 0.0
+    burst: int = 1
+    max_retries: int = 3
+    retry_base_delay: float = 0.5
+    retry_max_delay: float = 30.0
+    min_concurrency: int = 1
+    max_concurrency: int = 10
+    latency_target: float = 5.0
+
+    @classmethod
+    def from_env(cls, default_rate: float = 0.0) -> "SchedulerConfig":
+        """Build a config from ``API_*`` environment variables.
+
+        Reads API_RATE_LIMIT, API_RATE_BURST, API_MAX_RETRIES, API_RETRY_BASE_DELAY,
+        API_RETRY_MAX_DELAY, API_MIN_CONCURRENCY, API_MAX_CONCURRENCY and
+        API_LATENCY_TARGET, falling back to the class defaults.
+
+        :param default_rate: Rate limit used when API_RATE_LIMIT is unset
+        :type default_rate: float
+        :returns: Scheduler configuration
+        :rtype: SchedulerConfig
+        """
+        env = os.environ.get
+        return cls(
+            rate=float(env("API_RATE_LIMIT", str(default_rate))),
+            burst=int(env("API_RATE_BURST", str(cls.burst))),
+            max_retries=int(env("API_MAX_RETRIES", str(cls.max_retries))),
+            retry_base_delay=float(env("API_RETRY_BASE_DELAY", str(cls.retry_base_delay))),
+            retry_max_delay=float(env("API_RETRY_MAX_DELAY", str(cls.retry_max_delay))),
+            min_concurrency=int(env("API_MIN_CONCURRENCY", str(cls.min_concurrency))),
+            max_concurrency=int(env("API_MAX_CONCURRENCY", str(cls.max_concurrency))),
+            latency_target=float(env("API_LATENCY_TARGET", str(cls.latency_target))),
+        )
+
+
+class TokenBucket:
+    """Token-bucket rate limiter.
+
+    :param rate: Tokens added per second; 0 or less means unlimited
+    :type rate: float
+    :param burst: Maximum stored tokens
+    :type burst: int
+    :param clock: Monotonic clock, overridable for tests
+    :type clock: Callable[[], float]
+    """
+
+    def __init__(self, rate: float, burst: int = 1, clock: Callable[[], float] = time.monotonic) -> None:
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self._clock = clock
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """Wait until a token is available and take it.
+
+        :raises DeadlineExceeded: If the wait would outlast the current deadline
+        """
+        if self.rate <= 0:
+            return
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            wait = (1 - self.tokens) / self.rate
+            left = remaining()
+            if left is not None and wait > left:
+                raise DeadlineExceeded(f"Rate limit wait of {wait:.1f}s exceeds the {left:.1f}s left of the deadline")
+            await asyncio.sleep(wait)
+
+    def refund(self) -> None:
+        """Return a token taken for a request that was never sent."""
+        self.tokens = min(self.burst, self.tokens + 1)
+
+
+class AdaptiveConcurrency:
+    """AIMD concurrency limiter.
+
+    Each fast, successful response grows the limit by ``1 / limit`` (about +1 per
+    window of requests); each error or slow response multiplies it by ``decrease``.
+
+    :param minimum: Lowest allowed limit
+    :type minimum: int
+    :param maximum: Highest allowed limit (also the starting value)
+    :type maximum: int
+    :param latency_target: Latency in seconds above which a response counts as congestion
+    :type latency_target: float
+    :param decrease: Multiplicative decrease factor
+    :type decrease: float
+    """
+
+    def __init__(self, minimum: int, maximum: int, latency_target: float, decrease: float = 0.5) -> None:
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.latency_target = latency_target
+        self.decrease = decrease
+        self.limit = float(self.maximum)
+        self.in_flight = 0
+        self._waiters: Deque["asyncio.Future[None]"] = deque()
+
+    async def acquire(self) -> None:
+        """Wait for a free slot under the current limit and take it."""
+        while self.in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                # A slot handed to us must be passed on, not lost
+                if waiter.done() and not waiter.cancelled():
+                    self._wake()
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.in_flight += 1
+
+    def release(self, latency: float, ok: bool) -> None:
+        """Return a slot and adjust the limit from the request outcome.
+
+        :param latency: Seconds the request took
+        :type latency: float
+        :param ok: False for errors and throttling responses
+        :type ok: bool
+        """
+        self.in_flight -= 1
+        if not ok or latency > self.latency_target:
+            self.limit = max(self.minimum, self.limit * self.decrease)
+        else:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        self._wake()
+
+    def _wake(self) -> None:
+        """Wake as many waiters as there are free slots.
+
+        Waiters already woken but not yet running hold a slot too; cancelled
+        ones do not.
+        """
+        free = int(self.limit) - self.in_flight
+        for waiter in self._waiters:
+            if free <= 0:
+                break
+            if waiter.cancelled():
+                continue
+            if not waiter.done():
+                waiter.set_result(None)
+            free -= 1
+
+
+def parse_retry_after(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """Parse a ``Retry-After`` header (delay seconds or HTTP date).
+
+    :param value: Header value
+    :type value: Optional[str]
+    :param now: Current wall-clock time, defaults to ``time.time()``
+    :type now: Optional[float]
+    :returns: Seconds to wait, or None if absent or unparseable
+    :rtype: Optional[float]
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - (time.time() if now is None else now))
+
+
+def backoff_delay(attempt: int, config: SchedulerConfig, retry_after: Optional[float] = None) -> float:
+    """Full-jitter exponential backoff, never shorter than ``Retry-After``.
+
+    :param attempt: Zero-based retry number
+    :type attempt: int
+    :param config: Scheduler settings
+    :type config: SchedulerConfig
+    :param retry_after: Server-requested delay, if any
+    :type retry_after: Optional[float]
+    :returns: Seconds to sleep, capped at ``retry_max_delay``
+    :rtype: float
+    """
+    delay = random.uniform(0, min(config.retry_max_delay, config.retry_base_delay * 2**attempt))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return min(delay, config.retry_max_delay)
+
+
+@dataclass
+class _Upstream:
+    bucket: TokenBucket
+    concurrency: AdaptiveConcurrency
+
+
+class SchedulingTransport(httpx.AsyncBaseTransport):
+    """Transport applying rate limits, AIMD concurrency and retries per upstream host.
+
+    :param transport: Wrapped network transport
+    :type transport: httpx.AsyncBaseTransport
+    :param config: Scheduler settings applied to every upstream host
+    :type config: SchedulerConfig
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, config: SchedulerConfig) -> None:
+        self._transport = transport
+        self.config = config
+        self.retries = 0
+        self._upstreams: Dict[str, _Upstream] = {}
+
+    def upstream(self, host: str) -> _Upstream:
+        """Return (creating on first use) the limiter state for ``host``.
+
+        :param host: Upstream host name
+        :type host: str
+        :returns: Token bucket and concurrency limiter for the host
+        :rtype: _Upstream
+        """
+        upstream = self._upstreams.get(host)
+        if upstream is None:
+            c = self.config
+            upstream = self._upstreams[host] = _Upstream(
+                TokenBucket(c.rate, c.burst),
+                AdaptiveConcurrency(c.min_concurrency, c.max_concurrency, c.latency_target),
+            )
+        return upstream
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """Send ``request`` under the host's limits, retrying retryable failures.
+
+        :param request: Outgoing request
+        :type request: httpx.Request
+        :returns: Final response (possibly a 429/503/504 once retries or the
+            deadline are exhausted)
+        :rtype: httpx.Response
+        :raises httpx.TransportError: When the last attempt fails at the transport level
+        :raises DeadlineExceeded: If the deadline is used up before an attempt is sent
+        """
+        upstream = self.upstream(request.url.host)
+        retryable = request.method in RETRY_METHODS or bool(request.extensions.get(IDEMPOTENT_EXTENSION))
+        attempt = 0
+        while True:
+            deadline = current_deadline()
+            if deadline is not None and deadline.remaining() <= 0:
+                raise DeadlineExceeded(f"No time left to send {request.method} {request.url.path}")
+            await upstream.bucket.acquire()
+            try:
+                await upstream.concurrency.acquire()
+            except BaseException:
+                # Cancelled while queued: the request was never sent
+                upstream.bucket.refund()
+                raise
+            if deadline is not None:
+                request.extensions["timeout"] = clamp_timeout(request.extensions.get("timeout", {}))
+            start = time.monotonic()
+            response: Optional[httpx.Response] = None
+            failure: Optional[httpx.TransportError] = None
+            try:
+                response = await self._transport.handle_async_request(request)
+            except httpx.TransportError as e:
+                failure = e
+            finally:
+                # Cancellation (no response, no failure) is not a congestion signal
+                ok = failure is None and (response is None or response.status_code not in RETRY_STATUSES)
+                upstream.concurrency.release(time.monotonic() - start, ok)
+
+            can_retry = retryable and attempt < self.config.max_retries
+            if failure is not None:
+                if not can_retry:
+                    raise failure
+                delay = backoff_delay(attempt, self.config)
+                reason = type(failure).__name__
+            else:
+                assert response is not None
+                if response.status_code not in RETRY_STATUSES or not can_retry:
+                    return response
+                delay = backoff_delay(attempt, self.config, parse_retry_after(response.headers.get("Retry-After")))
+                reason = f"HTTP {response.status_code}"
+            # Re-read: a shared request's deadline moves out as callers join it
+            deadline = current_deadline()
+            if deadline is not None and delay >= deadline.remaining():
+                logger.debug("not retrying %s after %s: %s", request.url, reason, deadline.describe())
+                if failure is not None:
+                    raise failure
+                assert response is not None
+                return response
+            if response is not None:
+                await response.aclose()
+            logger.debug("retrying %s after %s in %.2fs", request.url, reason, delay)
+            attempt += 1
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    async def aclose(self) -> None:
+        """Close the wrapped transport."""
+        await self._transport.aclose()
@@ -1,33 +1,119 @@
-"""Server utilities: environment setup and HTTPX logging configuration."""
+"""Server utilities: environment setup, HTTP client construction and HTTPX logging configuration."""
 
+import asyncio
+import glob
+import hashlib
+import importlib.util
+import json
 import logging
 import os
-from typing import Any, Dict, Optional
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Mapping, Optional, Sequence
 
+import fastmcp
+import httpx
 import yaml
 from fastmcp.experimental.utilities.openapi import convert_openapi_schema_to_json_schema
+from fastmcp.server.dependencies import get_context
+
+from irmcp.cache import CachingTransport, DiskCache, MemoryCache, ResponseCache
+from irmcp.metrics import (
+    REGISTRY,
+    MetricsMiddleware,
+    MetricsTransport,
+    OperationIndex,
+    SamplingProfiler,
+    start_metrics_server,
+)
+from irmcp.scheduler import SchedulerConfig, SchedulingTransport
+from irmcp.singleflight import SingleflightTransport
 
 
 class UnexpectedBehavior(Exception):
     """Raised when code encounters an unexpected but non-fatal condition."""
     pass
 
-def load_openapi_spec(schema_path: str) -> Dict[str, Any]:
+def _openapi_cache_dir() -> Optional[str]:
+    """Return the directory for compiled OpenAPI specs, or None when disabled.
+
+    Honors OPENAPI_CACHE_DIR; an empty value disables the compiled cache.
+
+    :returns: Cache directory path or None
+    :rtype: Optional[str]
+    """
+    default = os.path.join(os.path.expanduser("~"), ".cache", "irmcp", "openapi")
+    cache_dir = os.environ.get("OPENAPI_CACHE_DIR", default)
+    return cache_dir or None
+
+
+def openapi_spec_key(raw: bytes) -> str:
+    """Return the compiled-spec cache key for raw YAML content.
+
+    The key covers the YAML bytes and the installed fastmcp version, since the
+    converted schema depends on both.
+
+    :param raw: Raw OpenAPI YAML file content
+    :type raw: bytes
+    :returns: Hex digest identifying the compiled artifact
+    :rtype: str
+    """
+    digest = hashlib.sha256(raw)
+    digest.update(fastmcp.__version__.encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+def load_openapi_spec(schema_path: str, cache_dir: Optional[str] = None) -> Dict[str, Any]:
     """Load and convert OpenAPI YAML schema to JSON schema for FastMCP.
-    
+
+    The converted schema is stored as a JSON artifact named after
+    :func:`openapi_spec_key`. Later loads read that artifact instead of parsing
+    the YAML; a changed YAML file or fastmcp version produces a new key and
+    falls back to the YAML path.
+
     :param schema_path: Absolute path to the OpenAPI YAML file
+    :type schema_path: str
+    :param cache_dir: Directory for compiled artifacts; defaults to OPENAPI_CACHE_DIR
+    :type cache_dir: Optional[str]
     :returns: Converted JSON schema ready for FastMCPOpenAPI
+    :rtype: dict[str, Any]
     """
-    with open(schema_path, "r", encoding="utf-8") as f:
-        schema = yaml.safe_load(f)
-    return convert_openapi_schema_to_json_schema(schema=schema)
+    with open(schema_path, "rb") as f:
+        raw = f.read()
+    cache_dir = cache_dir or _openapi_cache_dir()
+    if cache_dir is None:
+        return convert_openapi_schema_to_json_schema(schema=yaml.safe_load(raw))
+
+    stem = os.path.splitext(os.path.basename(schema_path))[0]
+    compiled_path = os.path.join(cache_dir, f"{stem}.{openapi_spec_key(raw)}.json")
+    try:
+        with open(compiled_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
 
+    spec = convert_openapi_schema_to_json_schema(schema=yaml.safe_load(raw))
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        for stale in glob.glob(os.path.join(cache_dir, f"{stem}.*.json")):
+            os.remove(stale)
+        tmp = f"{compiled_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(spec, f, separators=(",", ":"))
+        os.replace(tmp, compiled_path)
+    except OSError as e:
+        logging.getLogger(__name__).debug("Could not write compiled spec %s: %s", compiled_path, e)
+    return spec
 
-def setup_httpx_logging(default_level: Optional[int] = logging.DEBUG) -> None:
+
+def setup_httpx_logging(default_level: Optional[int] = logging.WARNING) -> None:
     """Configure HTTPX/HTTPCORE logging once for the process.
 
     Honors HTTPX_LOG_LEVEL env var (numeric or name). If set, uses that; otherwise
-    uses default_level if provided. No-op if neither is provided.
+    uses default_level if provided. No-op if neither is provided. Per-request
+    DEBUG logging is costly on the hot path; use the metrics from
+    :func:`register_metrics` for aggregate views.
     
     :param default_level: Default log level to use if HTTPX_LOG_LEVEL is not set
     :type default_level: Optional[int]
@@ -50,3 +136,400 @@ def setup_httpx_logging(default_level: Optional[int] = logging.DEBUG) -> None:
     for name in ("httpx", "httpcore"):
         lg = logging.getLogger(name)
         lg.setLevel(level)
+
+
+def create_response_cache(ttls: Mapping[str, float], default_ttl: float = 0.0) -> Optional[ResponseCache]:
+    """Build a response cache configured from the environment.
+
+    Honors API_CACHE_MAX_BYTES (memory budget, default 64 MiB; 0 disables caching)
+    and API_CACHE_DIR (enables the on-disk tier when set).
+
+    :param ttls: OpenAPI path templates mapped to TTL seconds
+    :type ttls: Mapping[str, float]
+    :param default_ttl: TTL for paths not listed in ``ttls``
+    :type default_ttl: float
+    :returns: Configured cache, or None when caching is disabled
+    :rtype: Optional[ResponseCache]
+    """
+    max_bytes = int(os.environ.get("API_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    if max_bytes <= 0:
+        return None
+    cache_dir = os.environ.get("API_CACHE_DIR")
+    return ResponseCache(
+        memory=MemoryCache(max_bytes),
+        disk=DiskCache(cache_dir) if cache_dir else None,
+        ttls=ttls,
+        default_ttl=default_ttl,
+    )
+
+
+TransportWrapper = Callable[[httpx.AsyncBaseTransport], httpx.AsyncBaseTransport]
+
+
+@dataclass
+class ManagedClient:
+    """An HTTP client built by :func:`create_http_client` inside :func:`managed_http_clients`.
+
+    :param client: The client handed to the server
+    :type client: httpx.AsyncClient
+    :param network: Innermost connection-pool transport, used for pre-warming
+    :type network: httpx.AsyncBaseTransport
+    :param connections: Keep-alive connections to open at startup
+    :type connections: int
+    """
+
+    client: httpx.AsyncClient
+    network: httpx.AsyncBaseTransport
+    connections: int
+
+
+StartupHook = Callable[[], Awaitable[Any]]
+
+_MANAGED_CLIENTS: ContextVar[Optional[List[ManagedClient]]] = ContextVar("irmcp_managed_clients", default=None)
+_STARTUP_HOOKS: ContextVar[Optional[List[StartupHook]]] = ContextVar("irmcp_startup_hooks", default=None)
+
+
+def http2_enabled() -> bool:
+    """Return whether upstream clients should negotiate HTTP/2.
+
+    Honors API_HTTP2: ``auto`` (default) uses HTTP/2 when the optional ``h2``
+    package is installed, ``0`` disables it, ``1`` asks for it and warns when
+    ``h2`` is missing.
+
+    :returns: True to enable HTTP/2
+    :rtype: bool
+    """
+    setting = os.environ.get("API_HTTP2", "auto").lower()
+    if setting in ("0", "false", "no"):
+        return False
+    available = importlib.util.find_spec("h2") is not None
+    if not available and setting != "auto":
+        logging.getLogger(__name__).warning("API_HTTP2 is set but h2 is not installed; using HTTP/1.1")
+    return available
+
+
+def create_http_client(
+    base_url: str,
+    user_agent: str,
+    timeout: float,
+    cache: Optional[ResponseCache] = None,
+    wrappers: Sequence[TransportWrapper] = (),
+    scheduler: Optional[SchedulerConfig] = None,
+    instrument: Optional[TransportWrapper] = None,
+) -> httpx.AsyncClient:
+    """Create the async HTTP client a FastMCPOpenAPI server uses for upstream calls.
+
+    Transports are layered as cache -> singleflight -> ``wrappers`` (last one
+    outermost) -> scheduler -> ``instrument`` -> network, so cache hits never
+    reach server-specific wrappers, identical concurrent cache misses share one
+    request, every request that does reach the network is rate limited and
+    retried, and each network attempt is measured. API_SINGLEFLIGHT=0 disables
+    the request sharing.
+
+    The network transport negotiates HTTP/2 per :func:`http2_enabled`; httpx
+    advertises every compression it can decode in Accept-Encoding (gzip and
+    deflate, plus br and zstd with the ``compression`` extra). Inside
+    :func:`managed_http_clients` the client is also recorded for pre-warming
+    and closing.
+
+    :param base_url: Upstream API base URL
+    :type base_url: str
+    :param user_agent: User-Agent header value
+    :type user_agent: str
+    :param timeout: Read/write/pool timeout in seconds
+    :type timeout: float
+    :param cache: Optional response cache wrapped around the network transport
+    :type cache: Optional[ResponseCache]
+    :param wrappers: Server-specific transport wrappers applied below the cache
+    :type wrappers: Sequence[Callable[[httpx.AsyncBaseTransport], httpx.AsyncBaseTransport]]
+    :param scheduler: Rate limit, retry and concurrency settings; defaults to
+        :meth:`SchedulerConfig.from_env`
+    :type scheduler: Optional[SchedulerConfig]
+    :param instrument: Wrapper applied directly around the network transport,
+        typically :func:`upstream_metrics`
+    :type instrument: Optional[Callable[[httpx.AsyncBaseTransport], httpx.AsyncBaseTransport]]
+    :returns: Configured client
+    :rtype: httpx.AsyncClient
+    """
+    scheduler = scheduler or SchedulerConfig.from_env()
+    keepalive = min(5, scheduler.max_concurrency)
+    network = httpx.AsyncHTTPTransport(
+        limits=httpx.Limits(
+            max_keepalive_connections=keepalive,
+            max_connections=scheduler.max_concurrency,
+        ),
+        http2=http2_enabled(),
+    )
+    transport: httpx.AsyncBaseTransport = network
+    if instrument is not None:
+        transport = instrument(transport)
+    transport = SchedulingTransport(transport, scheduler)
+    for wrap in wrappers:
+        transport = wrap(transport)
+    if os.environ.get("API_SINGLEFLIGHT", "1").lower() not in ("0", "false", "no"):
+        transport = SingleflightTransport(transport)
+    if cache is not None:
+        transport = CachingTransport(transport, cache)
+    client = httpx.AsyncClient(
+        base_url=base_url,
+        timeout=httpx.Timeout(timeout, connect=10.0),
+        transport=transport,
+        headers={
+            "User-Agent": user_agent,
+            "Accept": "application/json",
+        },
+    )
+    managed = _MANAGED_CLIENTS.get()
+    if managed is not None:
+        prewarm = int(os.environ.get("API_PREWARM_CONNECTIONS", "2"))
+        managed.append(ManagedClient(client, network, max(0, min(prewarm, keepalive))))
+    return client
+
+
+@asynccontextmanager
+async def managed_http_clients() -> AsyncIterator[List[ManagedClient]]:
+    """Collect the clients :func:`create_http_client` builds in this block and close them on exit.
+
+    Enter it on the loop that serves requests, so connection pools are created
+    and closed on the same loop.
+
+    :returns: Async context manager yielding the list of managed clients
+    :rtype: AsyncContextManager[list[ManagedClient]]
+    """
+    clients: List[ManagedClient] = []
+    token = _MANAGED_CLIENTS.set(clients)
+    hooks_token = _STARTUP_HOOKS.set([])
+    try:
+        yield clients
+    finally:
+        _STARTUP_HOOKS.reset(hooks_token)
+        _MANAGED_CLIENTS.reset(token)
+        await asyncio.gather(*(m.client.aclose() for m in clients), return_exceptions=True)
+
+
+async def prewarm_clients(clients: Sequence[ManagedClient]) -> None:
+    """Open keep-alive connections to each client's base URL.
+
+    Sends ``HEAD`` requests straight to the connection pool, so DNS, TCP and TLS
+    setup happen before the first tool call. The requests bypass the cache,
+    scheduler and metrics; their status does not matter and failures are only
+    logged.
+
+    :param clients: Clients from :func:`managed_http_clients`
+    :type clients: Sequence[ManagedClient]
+    """
+
+    async def connect(managed: ManagedClient) -> None:
+        request = httpx.Request(
+            "HEAD",
+            managed.client.base_url,
+            headers=managed.client.headers,
+            extensions={"timeout": managed.client.timeout.as_dict()},
+        )
+        try:
+            response = await managed.network.handle_async_request(request)
+            await response.aclose()
+        except httpx.HTTPError as e:
+            logging.getLogger(__name__).info("pre-warming %s failed: %s", request.url, e)
+
+    await asyncio.gather(*(connect(m) for m in clients for _ in range(m.connections)))
+
+
+def on_startup(hook: StartupHook) -> bool:
+    """Run ``hook`` in the background once the server is being served.
+
+    Server factories use this to load data before the first request. Outside
+    :func:`managed_http_clients` (e.g. when a factory is called directly) the
+    hook is not run and the caller falls back to loading on demand.
+
+    :param hook: Coroutine function; its errors are logged
+    :type hook: Callable[[], Awaitable[Any]]
+    :returns: Whether the hook was registered
+    :rtype: bool
+    """
+    hooks = _STARTUP_HOOKS.get()
+    if hooks is None:
+        return False
+    hooks.append(hook)
+    return True
+
+
+async def warm_up(clients: Sequence[ManagedClient]) -> None:
+    """Pre-warm ``clients`` and run the :func:`on_startup` hooks, concurrently.
+
+    Call within :func:`managed_http_clients` after the server was built.
+
+    :param clients: Clients from :func:`managed_http_clients`
+    :type clients: Sequence[ManagedClient]
+    """
+
+    async def run(hook: StartupHook) -> None:
+        try:
+            await hook()
+        except Exception:
+            logging.getLogger(__name__).exception("startup hook %r failed", hook)
+
+    hooks = _STARTUP_HOOKS.get() or []
+    await asyncio.gather(prewarm_clients(clients), *(run(hook) for hook in hooks))
+
+
+async def serve(factory: Callable[[], Awaitable[Any]], **run_kwargs: Any) -> None:
+    """Build a server with ``factory`` and run it, all on the current event loop.
+
+    HTTP clients created by the factory are pre-warmed and :func:`on_startup`
+    hooks run in the background while the server starts; the clients are
+    closed when it stops.
+
+    :param factory: Coroutine function returning a FastMCP server, e.g.
+        :func:`servers.ct.ct_server.create_ct_server`
+    :type factory: Callable[[], Awaitable[fastmcp.FastMCP]]
+    :param run_kwargs: Passed to ``run_async`` (transport, host, port, ...)
+    :type run_kwargs: Any
+    """
+    async with managed_http_clients() as clients:
+        app = await factory()
+        warming = asyncio.create_task(warm_up(clients))
+        try:
+            await app.run_async(**run_kwargs)
+        finally:
+            warming.cancel()
+
+
+def run_server(factory: Callable[[], Awaitable[Any]], **run_kwargs: Any) -> None:
+    """Blocking entry point: :func:`serve` under a single ``asyncio.run``.
+
+    :param factory: Coroutine function returning a FastMCP server
+    :type factory: Callable[[], Awaitable[fastmcp.FastMCP]]
+    :param run_kwargs: Passed to ``run_async``
+    :type run_kwargs: Any
+    """
+    asyncio.run(serve(factory, **run_kwargs))
+
+
+def register_cache_stats(app: Any, cache: Optional[ResponseCache]) -> None:
+    """Expose cache hit/miss counters as the ``cache://stats`` MCP resource.
+
+    :param app: FastMCP server instance
+    :type app: Any
+    :param cache: Cache whose counters are reported; no-op when None
+    :type cache: Optional[ResponseCache]
+    """
+    if cache is None:
+        return
+
+    @app.resource("cache://stats", name="cache_stats", mime_type="application/json")
+    def cache_stats() -> str:
+        return json.dumps(cache.stats.as_dict())
+
+
+def upstream_metrics(server: str, openapi_spec: Mapping[str, Any]) -> TransportWrapper:
+    """Return an ``instrument`` wrapper recording upstream metrics per operationId.
+
+    :param server: ``server`` label value (the app name)
+    :type server: str
+    :param openapi_spec: Spec whose paths map requests to operationIds
+    :type openapi_spec: Mapping[str, Any]
+    :returns: Wrapper for :func:`create_http_client`
+    :rtype: Callable[[httpx.AsyncBaseTransport], httpx.AsyncBaseTransport]
+    """
+    operations = OperationIndex(openapi_spec)
+    return lambda transport: MetricsTransport(transport, server, operations)
+
+
+# Caches reported by the cache collectors, keyed by server name
+_METRIC_CACHES: Dict[str, ResponseCache] = {}
+REGISTRY.add_collector(
+    "irmcp_cache_hits_total",
+    "counter",
+    "Response cache hits",
+    lambda: [("irmcp_cache_hits_total", {"server": s}, c.stats.hits) for s, c in _METRIC_CACHES.items()],
+)
+REGISTRY.add_collector(
+    "irmcp_cache_misses_total",
+    "counter",
+    "Response cache misses",
+    lambda: [("irmcp_cache_misses_total", {"server": s}, c.stats.misses) for s, c in _METRIC_CACHES.items()],
+)
+REGISTRY.add_collector(
+    "irmcp_cache_hit_ratio",
+    "gauge",
+    "Fraction of cache lookups served from cache",
+    lambda: [("irmcp_cache_hit_ratio", {"server": s}, c.stats.hit_ratio) for s, c in _METRIC_CACHES.items()],
+)
+
+_exporter_started = False
+_profiler: Optional[SamplingProfiler] = None
+
+
+def _start_exporters() -> None:
+    """Start the HTTP exporter and profiler once per process, as configured.
+
+    Honors METRICS_PORT (serve ``/metrics`` and ``/profile`` on this port; unset
+    disables), METRICS_HOST (default 127.0.0.1) and METRICS_PROFILE_INTERVAL_MS
+    (sample stacks at this interval; unset or 0 disables).
+    """
+    global _exporter_started, _profiler
+    if _exporter_started:
+        return
+    _exporter_started = True
+    interval_ms = float(os.environ.get("METRICS_PROFILE_INTERVAL_MS", "0"))
+    if interval_ms > 0:
+        _profiler = SamplingProfiler(interval_ms / 1000)
+        _profiler.start()
+    port = os.environ.get("METRICS_PORT")
+    if port:
+        try:
+            start_metrics_server(int(port), os.environ.get("METRICS_HOST", "127.0.0.1"), REGISTRY, _profiler)
+        except OSError as e:
+            logging.getLogger(__name__).warning("Metrics exporter not started on port %s: %s", port, e)
+
+
+def register_metrics(app: Any, cache: Optional[ResponseCache] = None) -> None:
+    """Record tool metrics for ``app`` and expose all metrics as MCP resources.
+
+    Adds :class:`irmcp.metrics.MetricsMiddleware`, reports ``cache`` hit ratios,
+    and registers ``metrics://prometheus`` (Prometheus text) plus
+    ``metrics://profile`` (folded stacks, when the profiler is enabled). Also
+    starts the HTTP exporter and profiler configured by the environment.
+
+    :param app: FastMCP server instance
+    :type app: Any
+    :param cache: Response cache to report; skipped when None
+    :type cache: Optional[ResponseCache]
+    """
+    _start_exporters()
+    app.add_middleware(MetricsMiddleware(app.name))
+    if cache is not None:
+        _METRIC_CACHES[app.name] = cache
+
+    @app.resource("metrics://prometheus", name="metrics", mime_type="text/plain")
+    def metrics() -> str:
+        return REGISTRY.render()
+
+    if _profiler is not None:
+        profiler = _profiler
+
+        @app.resource("metrics://profile", name="profile", mime_type="text/plain")
+        def profile() -> str:
+            return profiler.folded()
+
+
+ProgressReporter = Callable[[float, Optional[float], str], Awaitable[None]]
+
+
+def progress_reporter() -> Optional[ProgressReporter]:
+    """Return a callback sending MCP progress notifications for the current request.
+
+    :returns: Callback ``(progress, total, message)``, or None outside an MCP request
+    :rtype: Optional[Callable[[float, Optional[float], str], Awaitable[None]]]
+    """
+    try:
+        ctx = get_context()
+        ctx.request_context
+    except (RuntimeError, ValueError):
+        return None
+
+    async def report(progress: float, total: Optional[float], message: str) -> None:
+        await ctx.report_progress(progress, total, message)
+
+    return report
@@ -0,0 +1,120 @@
+"""In-flight deduplication of identical upstream GET requests.
+
+Wrap a transport with :class:`SingleflightTransport` so concurrent callers
+asking for the same resource share one upstream request. Unlike the response
+cache this holds nothing once the request completes; it only collapses
+thundering herds on cold keys.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import logging
+from typing import Dict
+
+import httpx
+
+from irmcp.cache import STREAM_EXTENSION, buffer_response, normalize_cache_key
+from irmcp.deadline import current_deadline, deadline_context, extend_deadline
+
+logger = logging.getLogger(__name__)
+
+SHARED_METHODS = frozenset({"GET", "HEAD"})
+
+
+def singleflight_key(request: httpx.Request) -> str:
+    """Return the key under which identical requests are collapsed.
+
+    Extends :func:`irmcp.cache.normalize_cache_key` with the Accept header, since
+    one URL may be requested in several representations.
+
+    :param request: Outgoing request
+    :type request: httpx.Request
+    :returns: Deduplication key
+    :rtype: str
+    """
+    return f"{normalize_cache_key(request)} accept={request.headers.get('accept', '')}"
+
+
+class _Call:
+    """One upstream request, the context it runs in and the number of callers waiting on it."""
+
+    def __init__(self, task: "asyncio.Task[httpx.Response]", context: contextvars.Context) -> None:
+        self.task = task
+        self.context = context
+        self.waiters = 0
+
+
+class SingleflightTransport(httpx.AsyncBaseTransport):
+    """Transport that shares one upstream request among identical concurrent GETs.
+
+    The first caller starts the request in a separate task; later callers with
+    the same :func:`singleflight_key` wait on that task. The task runs under
+    the latest deadline of the callers waiting on it (:mod:`irmcp.deadline`).
+    The body is buffered once and each caller gets its own response copy. A caller that is cancelled
+    only stops waiting; the upstream request is cancelled when no caller is
+    left.
+
+    :param transport: Wrapped transport that performs real requests
+    :type transport: httpx.AsyncBaseTransport
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport) -> None:
+        self._transport = transport
+        self._calls: Dict[str, _Call] = {}
+        #: Requests served by joining another caller's in-flight request
+        self.shared = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """Forward ``request``, or join an identical request already in flight.
+
+        :param request: Outgoing request
+        :type request: httpx.Request
+        :returns: Response (buffered when the request was eligible for sharing)
+        :rtype: httpx.Response
+        """
+        # A shared response is buffered, which a streaming caller must avoid
+        if request.method not in SHARED_METHODS or request.extensions.get(STREAM_EXTENSION):
+            return await self._transport.handle_async_request(request)
+
+        key = singleflight_key(request)
+        call = self._calls.get(key)
+        if call is None:
+            # The shared request runs under the latest deadline of its callers
+            context = deadline_context(current_deadline())
+            task = asyncio.create_task(self._fetch(request), context=context)
+            call = self._calls[key] = _Call(task, context)
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+        else:
+            extend_deadline(call.context, current_deadline())
+            self.shared += 1
+            logger.debug("singleflight join: %s", key)
+
+        call.waiters += 1
+        try:
+            # shield: cancelling this caller must not cancel the shared request
+            shared = await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                self._forget(key, call)
+                call.task.cancel()
+        return httpx.Response(
+            shared.status_code, headers=shared.headers, content=shared.content, request=request
+        )
+
+    async def _fetch(self, request: httpx.Request) -> httpx.Response:
+        response = await self._transport.handle_async_request(request)
+        return await buffer_response(response, request)
+
+    def _forget(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    async def aclose(self) -> None:
+        """Cancel outstanding shared requests and close the wrapped transport."""
+        for call in list(self._calls.values()):
+            call.task.cancel()
+        self._calls.clear()
+        await self._transport.aclose()
@@ -0,0 +1,976 @@
+"""Local ClinicalTrials.gov study index backed by SQLite FTS5.
+
+Load a bulk dump of study JSON records (the shape ``fetchStudy`` returns) with::
+
+    python -m servers.ct.ct_index --db studies.sqlite AllAPIJSON.zip
+
+and point the CT server at it with ``CT_INDEX_PATH``. :class:`LocalIndexTransport`
+then answers ``GET /studies`` searches whose parameters translate to the
+supported ESSIE subset (terms, phrases, AND/OR/NOT, AREA[...], RANGE[...] and
+MISSING) from the index, and forwards everything else to the live API. Once
+the index is older than ``CT_INDEX_MAX_AGE`` seconds (default a week; empty or
+0 for no limit) every search goes to the live API until it is re-ingested, so
+status filters such as ``RECRUITING`` are not answered from stale data.
+
+Local answers cover only the studies in the dump and use SQLite's stemming
+instead of ESSIE's synonym expansion. Relevance (``@relevance``, and the
+default when the search has text terms) is ranked with FTS5's BM25 over the
+text terms; searches with only non-text criteria are ordered by NCT ID.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import zipfile
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import httpx
+
+from irmcp.projection import build_trie, project
+from servers.ct.essie_parser import (
+    All,
+    Area,
+    Bool,
+    EssieError,
+    Missing,
+    Node,
+    Range,
+    Search,
+    Unary,
+    parse,
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_PAGE_SIZE = 1000
+DEFAULT_PAGE_SIZE = 10
+PAGE_TOKEN_PREFIX = "local:"
+INGEST_BATCH = 500
+# Age in seconds after which the index stops answering; empty or 0 disables the limit
+MAX_AGE: Optional[float] = float(os.environ.get("CT_INDEX_MAX_AGE", str(7 * 24 * 3600)) or 0) or None
+
+# FTS5 columns, one per search area (``other`` holds remaining BasicSearch text)
+TEXT_COLUMNS = ("cond", "intr", "outc", "titles", "spons", "lead", "ids", "locn", "other")
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS studies (
+    rowid INTEGER PRIMARY KEY,
+    nct_id TEXT NOT NULL UNIQUE,
+    overall_status TEXT,
+    study_type TEXT,
+    phases TEXT,
+    sex TEXT,
+    healthy_volunteers INTEGER,
+    min_age_days REAL,
+    max_age_days REAL,
+    enrollment INTEGER,
+    start_date TEXT,
+    primary_completion_date TEXT,
+    completion_date TEXT,
+    first_post_date TEXT,
+    last_update_date TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS studies_status ON studies(overall_status);
+CREATE INDEX IF NOT EXISTS studies_sex ON studies(sex);
+CREATE INDEX IF NOT EXISTS studies_min_age ON studies(min_age_days);
+CREATE INDEX IF NOT EXISTS studies_max_age ON studies(max_age_days);
+CREATE INDEX IF NOT EXISTS studies_start ON studies(start_date);
+CREATE INDEX IF NOT EXISTS studies_updated ON studies(last_update_date);
+CREATE TABLE IF NOT EXISTS locations (
+    study INTEGER NOT NULL REFERENCES studies(rowid),
+    facility TEXT,
+    status TEXT,
+    city TEXT COLLATE NOCASE,
+    state TEXT COLLATE NOCASE,
+    zip TEXT,
+    country TEXT COLLATE NOCASE
+);
+CREATE INDEX IF NOT EXISTS locations_study ON locations(study);
+CREATE INDEX IF NOT EXISTS locations_country ON locations(country, city);
+CREATE INDEX IF NOT EXISTS locations_state ON locations(state);
+CREATE VIRTUAL TABLE IF NOT EXISTS study_text USING fts5(
+    {", ".join(TEXT_COLUMNS)}, tokenize='porter unicode61'
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+class Untranslatable(ValueError):
+    """Raised when a search cannot be answered from the local index."""
+
+
+# ---------------------------------------------------------------------------
+# Field extraction
+# ---------------------------------------------------------------------------
+
+_AGE_UNITS = {"year": 365.25, "month": 30.4375, "week": 7.0, "day": 1.0, "hour": 1 / 24, "minute": 1 / 1440}
+_AGE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([a-zA-Z]+?)s?\s*$")
+_US_DATE = re.compile(r"^(\d{1,2})/(\d{1,2})/(\d{4})$")
+_ISO_DATE = re.compile(r"^(\d{4})(?:-(\d{2}))?(?:-(\d{2}))?$")
+
+
+def parse_age(text: Optional[str]) -> Optional[float]:
+    """Convert an age such as ``18 Years`` to days.
+
+    :param text: Age with a unit (year, month, week, day, hour or minute)
+    :type text: Optional[str]
+    :returns: Age in days, or None when ``text`` is empty or has no known unit
+    :rtype: Optional[float]
+    """
+    if not text:
+        return None
+    m = _AGE.match(text)
+    if not m or m.group(2).lower() not in _AGE_UNITS:
+        return None
+    return float(m.group(1)) * _AGE_UNITS[m.group(2).lower()]
+
+
+def normalize_date(text: Optional[str]) -> Optional[str]:
+    """Normalize ``YYYY``, ``YYYY-MM``, ``YYYY-MM-DD`` or ``MM/DD/YYYY`` to ``YYYY-MM-DD``.
+
+    Partial dates map to the first day of the period, matching how the API
+    compares them.
+
+    :param text: Date string
+    :type text: Optional[str]
+    :returns: ISO date, or None when ``text`` is not a recognized date
+    :rtype: Optional[str]
+    """
+    if not text:
+        return None
+    text = text.strip()
+    m = _US_DATE.match(text)
+    if m:
+        return f"{m.group(3)}-{int(m.group(1)):02d}-{int(m.group(2)):02d}"
+    m = _ISO_DATE.match(text)
+    if m:
+        return f"{m.group(1)}-{m.group(2) or '01'}-{m.group(3) or '01'}"
+    return None
+
+
+def _get(data: Any, *keys: str) -> Any:
+    for key in keys:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def _texts(items: Any, *keys: str) -> List[str]:
+    """Collect string values at ``keys`` from each dict in ``items``."""
+    out: List[str] = []
+    for item in items or []:
+        for key in keys:
+            value = item.get(key) if isinstance(item, dict) else None
+            if isinstance(value, str):
+                out.append(value)
+            elif isinstance(value, list):
+                out.extend(v for v in value if isinstance(v, str))
+    return out
+
+
+def extract_study(study: Mapping[str, Any]) -> Tuple[Dict[str, Any], Dict[str, str], List[Tuple[Any, ...]]]:
+    """Split a study record into indexed columns, search-area text and locations.
+
+    :param study: Study JSON as returned by ``fetchStudy``
+    :type study: Mapping[str, Any]
+    :returns: ``(columns, text, locations)``; ``text`` is keyed by :data:`TEXT_COLUMNS`
+        and ``locations`` holds ``(facility, status, city, state, zip, country)`` tuples
+    :rtype: tuple[dict[str, Any], dict[str, str], list[tuple]]
+    :raises ValueError: If the record has no NCT ID
+    """
+    ps = study.get("protocolSection") or {}
+    ident = ps.get("identificationModule") or {}
+    nct_id = ident.get("nctId")
+    if not nct_id:
+        raise ValueError("study record without protocolSection.identificationModule.nctId")
+    status = ps.get("statusModule") or {}
+    design = ps.get("designModule") or {}
+    elig = ps.get("eligibilityModule") or {}
+    sponsors = ps.get("sponsorCollaboratorsModule") or {}
+    arms = ps.get("armsInterventionsModule") or {}
+    outcomes = ps.get("outcomesModule") or {}
+    conditions = ps.get("conditionsModule") or {}
+    description = ps.get("descriptionModule") or {}
+    sites = _get(ps, "contactsLocationsModule", "locations") or []
+    derived = study.get("derivedSection") or {}
+    hv = elig.get("healthyVolunteers")
+
+    columns = {
+        "nct_id": nct_id.upper(),
+        "overall_status": status.get("overallStatus"),
+        "study_type": design.get("studyType"),
+        "phases": " " + " ".join(design.get("phases") or []) + " ",
+        "sex": elig.get("sex"),
+        "healthy_volunteers": None if hv is None else int(bool(hv)),
+        "min_age_days": parse_age(elig.get("minimumAge")),
+        "max_age_days": parse_age(elig.get("maximumAge")),
+        "enrollment": _get(design, "enrollmentInfo", "count"),
+        "start_date": normalize_date(_get(status, "startDateStruct", "date")),
+        "primary_completion_date": normalize_date(_get(status, "primaryCompletionDateStruct", "date")),
+        "completion_date": normalize_date(_get(status, "completionDateStruct", "date")),
+        "first_post_date": normalize_date(_get(status, "studyFirstPostDateStruct", "date")),
+        "last_update_date": normalize_date(_get(status, "lastUpdatePostDateStruct", "date")),
+    }
+    interventions = arms.get("interventions") or []
+    all_outcomes = [*(outcomes.get("primaryOutcomes") or []), *(outcomes.get("secondaryOutcomes") or []),
+                    *(outcomes.get("otherOutcomes") or [])]
+    text = {
+        "cond": [*(conditions.get("conditions") or []), *(conditions.get("keywords") or []),
+                 *_texts(_get(derived, "conditionBrowseModule", "meshes"), "term")],
+        "intr": [*_texts(interventions, "name", "otherNames", "description"),
+                 *_texts(_get(derived, "interventionBrowseModule", "meshes"), "term")],
+        "outc": _texts(all_outcomes, "measure", "description"),
+        "titles": [ident.get("briefTitle"), ident.get("officialTitle"), ident.get("acronym")],
+        "spons": _texts(sponsors.get("collaborators"), "name"),
+        "lead": [_get(sponsors, "leadSponsor", "name")],
+        "ids": [nct_id, _get(ident, "orgStudyIdInfo", "id"), *_texts(ident.get("secondaryIdInfos"), "id"),
+                *(ident.get("nctIdAliases") or [])],
+        "locn": _texts(sites, "facility", "city", "state", "zip", "country"),
+        "other": [description.get("briefSummary"), description.get("detailedDescription"),
+                  elig.get("eligibilityCriteria"), *_texts(arms.get("armGroups"), "label", "description")],
+    }
+    joined = {k: "\n".join(v for v in values if isinstance(v, str)) for k, values in text.items()}
+    locations = [
+        (s.get("facility"), s.get("status"), s.get("city"), s.get("state"), s.get("zip"), s.get("country"))
+        for s in sites
+        if isinstance(s, dict)
+    ]
+    return columns, joined, locations
+
+
+# ---------------------------------------------------------------------------
+# ESSIE subset -> SQL
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class _Field:
+    """How an AREA[...] name maps onto the index.
+
+    ``kind`` is ``text`` (FTS columns in ``target``, empty for all), ``enum``,
+    ``phase``, ``bool``, ``age``, ``date``, ``number``, ``id`` (a ``studies``
+    column) or ``location`` (a ``locations`` column).
+    """
+
+    kind: str
+    target: Tuple[str, ...] = ()
+
+
+def _text(*columns: str) -> _Field:
+    return _Field("text", columns)
+
+
+FIELDS: Dict[str, _Field] = {
+    "basicsearch": _text(),
+    "conditionsearch": _text("cond"),
+    "condition": _text("cond"),
+    "keyword": _text("cond"),
+    "conditionmeshterm": _text("cond"),
+    "interventionsearch": _text("intr"),
+    "interventionname": _text("intr"),
+    "interventionothername": _text("intr"),
+    "interventionmeshterm": _text("intr"),
+    "outcomesearch": _text("outc"),
+    "primaryoutcomemeasure": _text("outc"),
+    "secondaryoutcomemeasure": _text("outc"),
+    "titlesearch": _text("titles"),
+    "brieftitle": _text("titles"),
+    "officialtitle": _text("titles"),
+    "acronym": _text("titles"),
+    "sponsorsearch": _text("spons", "lead"),
+    "leadsponsorname": _text("lead"),
+    "collaboratorname": _text("spons"),
+    "idsearch": _text("ids"),
+    "orgstudyid": _text("ids"),
+    "secondaryid": _text("ids"),
+    "locationsearch": _text("locn"),
+    "locationfacility": _text("locn"),
+    "briefsummary": _text("other"),
+    "detaileddescription": _text("other"),
+    "eligibilitycriteria": _text("other"),
+    "nctid": _Field("id", ("nct_id",)),
+    "overallstatus": _Field("enum", ("overall_status",)),
+    "studytype": _Field("enum", ("study_type",)),
+    "sex": _Field("enum", ("sex",)),
+    "gender": _Field("enum", ("sex",)),
+    "phase": _Field("phase", ("phases",)),
+    "healthyvolunteers": _Field("bool", ("healthy_volunteers",)),
+    "minimumage": _Field("age", ("min_age_days",)),
+    "maximumage": _Field("age", ("max_age_days",)),
+    "enrollmentcount": _Field("number", ("enrollment",)),
+    "startdate": _Field("date", ("start_date",)),
+    "primarycompletiondate": _Field("date", ("primary_completion_date",)),
+    "completiondate": _Field("date", ("completion_date",)),
+    "studyfirstpostdate": _Field("date", ("first_post_date",)),
+    "lastupdatepostdate": _Field("date", ("last_update_date",)),
+    "locationcountry": _Field("location", ("country",)),
+    "locationcity": _Field("location", ("city",)),
+    "locationstate": _Field("location", ("state",)),
+    "locationzip": _Field("location", ("zip",)),
+    "locationstatus": _Field("location", ("status",)),
+}
+
+# listStudies query parameters and the search area each one searches
+QUERY_AREAS: Dict[str, str] = {
+    "query.cond": "ConditionSearch",
+    "query.term": "BasicSearch",
+    "query.locn": "LocationSearch",
+    "query.titles": "TitleSearch",
+    "query.intr": "InterventionSearch",
+    "query.outc": "OutcomeSearch",
+    "query.spons": "SponsorSearch",
+    "query.lead": "LeadSponsorName",
+    "query.id": "IdSearch",
+    "filter.advanced": "BasicSearch",
+    "postFilter.advanced": "BasicSearch",
+}
+
+def _enum_value(value: str) -> str:
+    return re.sub(r"[\s\-]+", "_", value.strip()).upper()
+
+
+def _phase_value(value: str) -> str:
+    compact = re.sub(r"[\s_\-]+", "", value).upper()
+    if compact in ("NA", "N/A"):
+        return "NA"
+    return "EARLY_PHASE1" if compact.startswith("EARLY") else compact
+
+
+class _Translator:
+    """Translation of a parsed ESSIE expression into a SQL condition.
+
+    Conditions refer to the ``studies`` table as ``s``.
+    """
+
+    def __init__(self, area: str) -> None:
+        self.area = area
+        self.params: List[Any] = []
+        # FTS5 queries of the text terms outside NOT, for relevance ranking
+        self.rank_terms: List[str] = []
+        self._negated = False
+
+    def _field(self) -> _Field:
+        field = FIELDS.get(self.area.lower())
+        if field is None:
+            raise Untranslatable(f"unknown area {self.area!r}")
+        return field
+
+    def translate(self, node: Node) -> str:
+        if isinstance(node, Bool):
+            return "(" + f" {node.op} ".join(self.translate(child) for child in node.children) + ")"
+        if isinstance(node, Unary):
+            if node.op != "NOT":
+                raise Untranslatable(f"{node.op}[...] is not supported locally")
+            self._negated = not self._negated
+            try:
+                return f"NOT {self.translate(node.child)}"
+            finally:
+                self._negated = not self._negated
+        if isinstance(node, Search):
+            raise Untranslatable("SEARCH[...] is not supported locally")
+        if isinstance(node, Area):
+            outer, self.area = self.area, node.name
+            try:
+                return self.translate(node.child)
+            finally:
+                self.area = outer
+        if isinstance(node, All):
+            return "1"
+        if isinstance(node, Range):
+            return self._range(self._field(), node.low, node.high)
+        if isinstance(node, Missing):
+            return self._missing(self._field())
+        return self._match(self._field(), node.text)
+
+    def _match(self, field: _Field, value: str) -> str:
+        if field.kind == "text":
+            words = re.findall(r"\w+", value)
+            if not words:
+                raise Untranslatable(f"no searchable words in {value!r}")
+            phrase = '"' + " ".join(words) + '"'
+            if field.target:
+                phrase = "{" + " ".join(field.target) + "} : " + phrase
+            self.params.append(phrase)
+            if not self._negated:
+                self.rank_terms.append(phrase)
+            return "s.rowid IN (SELECT rowid FROM study_text WHERE study_text MATCH ?)"
+        column = field.target[0]
+        if field.kind == "enum":
+            self.params.append(_enum_value(value))
+            return f"s.{column} = ?"
+        if field.kind == "phase":
+            self.params.append(f"% {_phase_value(value)} %")
+            return f"s.{column} LIKE ?"
+        if field.kind == "id":
+            self.params.append(value.strip().upper())
+            return f"s.{column} = ?"
+        if field.kind == "bool":
+            self.params.append(1 if value.strip().lower() in ("true", "yes", "1") else 0)
+            return f"s.{column} = ?"
+        if field.kind == "location":
+            self.params.append(_enum_value(value) if column == "status" else value.strip())
+            return f"EXISTS (SELECT 1 FROM locations l WHERE l.study = s.rowid AND l.{column} = ?)"
+        if field.kind == "number":
+            self.params.append(self._bound(field, value))
+            return f"s.{column} = ?"
+        raise Untranslatable(f"{self.area} needs RANGE[...] locally")
+
+    def _bound(self, field: _Field, value: str) -> Any:
+        if field.kind == "age":
+            days = parse_age(value)
+            if days is None:
+                raise Untranslatable(f"age {value!r} needs a unit, e.g. '{value.strip()} years'")
+            return days
+        if field.kind == "date":
+            date = normalize_date(value)
+            if date is None:
+                raise Untranslatable(f"unrecognized date {value!r}")
+            return date
+        try:
+            return float(value)
+        except ValueError:
+            raise Untranslatable(f"not a number: {value!r}") from None
+
+    def _range(self, field: _Field, low: str, high: str) -> str:
+        if field.kind not in ("age", "date", "number"):
+            raise Untranslatable(f"RANGE on {self.area} is not supported locally")
+        column = field.target[0]
+        clauses = [f"s.{column} IS NOT NULL"]
+        for bound, op, open_value in ((low, ">=", "MIN"), (high, "<=", "MAX")):
+            if bound.upper() == open_value:
+                continue
+            self.params.append(self._bound(field, bound))
+            clauses.append(f"s.{column} {op} ?")
+        return "(" + " AND ".join(clauses) + ")"
+
+    def _missing(self, field: _Field) -> str:
+        column = field.target[0] if field.target else ""
+        if field.kind == "location":
+            return f"NOT EXISTS (SELECT 1 FROM locations l WHERE l.study = s.rowid AND l.{column} IS NOT NULL)"
+        if field.kind == "phase":
+            return f"s.{column} = '  '"
+        if field.kind in ("text", "id"):
+            raise Untranslatable(f"MISSING on {self.area} is not supported locally")
+        return f"s.{column} IS NULL"
+
+
+def translate_essie(
+    text: str, area: str = "BasicSearch", rank_terms: Optional[List[str]] = None
+) -> Tuple[str, List[Any]]:
+    """Translate an ESSIE expression in the supported subset to a SQL condition.
+
+    :param text: ESSIE expression
+    :type text: str
+    :param area: Search area for terms outside ``AREA[...]``
+    :type area: str
+    :param rank_terms: When given, receives the FTS5 queries of the expression's
+        text terms outside NOT, for relevance ranking
+    :type rank_terms: Optional[list[str]]
+    :returns: SQL condition over ``studies s`` and its parameters
+    :rtype: tuple[str, list[Any]]
+    :raises Untranslatable: If the expression uses unsupported syntax or fields
+    """
+    try:
+        node = parse(text)
+    except EssieError as e:
+        raise Untranslatable(str(e)) from None
+    translator = _Translator(area)
+    sql = translator.translate(node)
+    if rank_terms is not None:
+        rank_terms.extend(translator.rank_terms)
+    return sql, translator.params
+
+
+RELEVANCE = "@relevance"
+# BM25 score of a study for the search's text terms; lower is more relevant
+_RANK = "(SELECT bm25(study_text) FROM study_text WHERE study_text MATCH ? AND rowid = s.rowid)"
+
+# Sortable fields: sort piece name -> (column, default direction)
+SORT_FIELDS: Dict[str, Tuple[str, str]] = {
+    "StartDate": ("start_date", "DESC"),
+    "PrimaryCompletionDate": ("primary_completion_date", "DESC"),
+    "CompletionDate": ("completion_date", "DESC"),
+    "StudyFirstPostDate": ("first_post_date", "DESC"),
+    "LastUpdatePostDate": ("last_update_date", "DESC"),
+    "EnrollmentCount": ("enrollment", "ASC"),
+}
+
+# Field/piece names accepted in ``fields`` and the record paths they select
+PIECES: Dict[str, str] = {
+    "NCTId": "protocolSection.identificationModule.nctId",
+    "BriefTitle": "protocolSection.identificationModule.briefTitle",
+    "OfficialTitle": "protocolSection.identificationModule.officialTitle",
+    "Acronym": "protocolSection.identificationModule.acronym",
+    "OrgStudyId": "protocolSection.identificationModule.orgStudyIdInfo.id",
+    "OverallStatus": "protocolSection.statusModule.overallStatus",
+    "StartDate": "protocolSection.statusModule.startDateStruct.date",
+    "PrimaryCompletionDate": "protocolSection.statusModule.primaryCompletionDateStruct.date",
+    "CompletionDate": "protocolSection.statusModule.completionDateStruct.date",
+    "StudyFirstPostDate": "protocolSection.statusModule.studyFirstPostDateStruct.date",
+    "LastUpdatePostDate": "protocolSection.statusModule.lastUpdatePostDateStruct.date",
+    "LeadSponsorName": "protocolSection.sponsorCollaboratorsModule.leadSponsor.name",
+    "CollaboratorName": "protocolSection.sponsorCollaboratorsModule.collaborators.name",
+    "BriefSummary": "protocolSection.descriptionModule.briefSummary",
+    "DetailedDescription": "protocolSection.descriptionModule.detailedDescription",
+    "Condition": "protocolSection.conditionsModule.conditions",
+    "Keyword": "protocolSection.conditionsModule.keywords",
+    "StudyType": "protocolSection.designModule.studyType",
+    "Phase": "protocolSection.designModule.phases",
+    "EnrollmentCount": "protocolSection.designModule.enrollmentInfo.count",
+    "InterventionType": "protocolSection.armsInterventionsModule.interventions.type",
+    "InterventionName": "protocolSection.armsInterventionsModule.interventions.name",
+    "InterventionDescription": "protocolSection.armsInterventionsModule.interventions.description",
+    "PrimaryOutcomeMeasure": "protocolSection.outcomesModule.primaryOutcomes.measure",
+    "SecondaryOutcomeMeasure": "protocolSection.outcomesModule.secondaryOutcomes.measure",
+    "EligibilityCriteria": "protocolSection.eligibilityModule.eligibilityCriteria",
+    "HealthyVolunteers": "protocolSection.eligibilityModule.healthyVolunteers",
+    "Sex": "protocolSection.eligibilityModule.sex",
+    "MinimumAge": "protocolSection.eligibilityModule.minimumAge",
+    "MaximumAge": "protocolSection.eligibilityModule.maximumAge",
+    "StdAge": "protocolSection.eligibilityModule.stdAges",
+    "LocationFacility": "protocolSection.contactsLocationsModule.locations.facility",
+    "LocationStatus": "protocolSection.contactsLocationsModule.locations.status",
+    "LocationCity": "protocolSection.contactsLocationsModule.locations.city",
+    "LocationState": "protocolSection.contactsLocationsModule.locations.state",
+    "LocationZip": "protocolSection.contactsLocationsModule.locations.zip",
+    "LocationCountry": "protocolSection.contactsLocationsModule.locations.country",
+    "HasResults": "hasResults",
+}
+for _section in ("protocolSection", "resultsSection", "annotationSection", "documentSection", "derivedSection"):
+    PIECES[_section[0].upper() + _section[1:]] = _section
+for _module in (
+    "identification", "status", "sponsorCollaborators", "oversight", "description", "conditions", "design",
+    "armsInterventions", "outcomes", "eligibility", "contactsLocations", "references", "ipdSharingStatement",
+):
+    PIECES[_module[0].upper() + _module[1:] + "Module"] = f"protocolSection.{_module}Module"
+
+_PARAMS_IGNORED = frozenset({"format", "markupFormat", "countTotal", "pageSize", "pageToken", "fields", "sort"})
+_STATUS_PARAMS = ("filter.overallStatus", "postFilter.overallStatus")
+_ID_PARAMS = ("filter.ids", "postFilter.ids")
+
+
+PieceResolver = Callable[[str], Optional[str]]
+
+
+@dataclass
+class LocalQuery:
+    """A ``/studies`` request translated for the local index."""
+
+    where: str
+    params: List[Any]
+    order: str
+    order_params: List[Any]
+    limit: int
+    offset: int
+    count_total: bool
+    fields: Optional[List[str]]
+
+
+def translate_params(params: Mapping[str, str], pieces: Optional[PieceResolver] = None) -> LocalQuery:
+    """Translate ``listStudies`` query parameters into a :class:`LocalQuery`.
+
+    :param params: Request query parameters
+    :type params: Mapping[str, str]
+    :param pieces: Resolves ``fields`` piece names missing from :data:`PIECES`
+        to record paths (e.g. the metadata field index)
+    :type pieces: Optional[Callable[[str], Optional[str]]]
+    :returns: Translated query
+    :rtype: LocalQuery
+    :raises Untranslatable: If any parameter or expression is outside the supported subset
+    """
+    if params.get("format", "json") != "json" or params.get("markupFormat", "markdown") != "markdown":
+        raise Untranslatable("only JSON with markdown markup is served locally")
+    where: List[str] = []
+    values: List[Any] = []
+    rank_terms: List[str] = []
+    for name, value in params.items():
+        if name in _PARAMS_IGNORED or not value:
+            continue
+        if name in QUERY_AREAS:
+            sql, args = translate_essie(value, QUERY_AREAS[name], rank_terms)
+        elif name in _STATUS_PARAMS:
+            statuses = [_enum_value(v) for v in re.split(r"[,|]", value) if v.strip()]
+            sql, args = f"s.overall_status IN ({','.join('?' * len(statuses))})", statuses
+        elif name in _ID_PARAMS:
+            ids = [v.strip().upper() for v in re.split(r"[,|\s]", value) if v.strip()]
+            sql, args = f"s.nct_id IN ({','.join('?' * len(ids))})", ids
+        else:
+            raise Untranslatable(f"parameter {name} is not supported locally")
+        where.append(sql)
+        values.extend(args)
+
+    order = []
+    order_params: List[Any] = []
+    # Like the API, rank by relevance unless told otherwise; with no text terms
+    # there is nothing to rank and NCT ID order stands in
+    sort = (params.get("sort") or "").strip() or (RELEVANCE if rank_terms else "")
+    for item in sort.split(","):
+        piece, _, direction = item.strip().partition(":")
+        if not piece:
+            continue
+        if piece == RELEVANCE:
+            if not rank_terms:
+                raise Untranslatable("relevance sort needs a text search term")
+            column, default = _RANK, "DESC"
+            # Once for the NULL test, once for the score
+            order_params += [" OR ".join(f"({term})" for term in rank_terms)] * 2
+        elif piece in SORT_FIELDS:
+            column, default = SORT_FIELDS[piece]
+            column = f"s.{column}"
+        else:
+            raise Untranslatable(f"sort by {piece} is not supported locally")
+        direction = (direction.strip() or default).upper()
+        if direction not in ("ASC", "DESC"):
+            raise Untranslatable(f"sort direction {direction!r} is not supported locally")
+        if piece == RELEVANCE:
+            # Most relevant first is the lowest BM25 score
+            direction = "ASC" if direction == "DESC" else "DESC"
+        order.append(f"{column} IS NULL, {column} {direction}")
+    order.append("s.nct_id")
+
+    token = params.get("pageToken")
+    if token and not token.startswith(PAGE_TOKEN_PREFIX):
+        raise Untranslatable("page token was issued by the live API")
+    try:
+        offset = int(token[len(PAGE_TOKEN_PREFIX):]) if token else 0
+        page_size = int(params.get("pageSize") or 0) or DEFAULT_PAGE_SIZE
+    except ValueError:
+        raise Untranslatable("invalid pageSize or pageToken") from None
+
+    fields = None
+    if params.get("fields"):
+        fields = []
+        for piece in params["fields"].split(","):
+            piece = piece.strip()
+            path = PIECES.get(piece) or (pieces(piece) if pieces else None)
+            if path:
+                fields.append(path)
+            elif "." in piece or piece in ("protocolSection", "derivedSection", "hasResults"):
+                fields.append(piece)
+            else:
+                raise Untranslatable(f"field {piece!r} is not known locally")
+
+    return LocalQuery(
+        where=" AND ".join(where) or "1",
+        params=values,
+        order=", ".join(order),
+        order_params=order_params,
+        limit=min(page_size, MAX_PAGE_SIZE),
+        offset=offset,
+        count_total=params.get("countTotal", "false").lower() == "true" and not token,
+        fields=fields,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Index
+# ---------------------------------------------------------------------------
+
+class StudyIndex:
+    """On-disk SQLite index of study records.
+
+    Readers get one read-only connection per thread, so searches can run in
+    :func:`asyncio.to_thread` workers.
+
+    :param path: SQLite database file
+    :type path: str
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            self._local.conn = conn
+        return conn
+
+    def ingest(self, studies: Iterable[Mapping[str, Any]]) -> int:
+        """Insert or replace study records.
+
+        :param studies: Study JSON records
+        :type studies: Iterable[Mapping[str, Any]]
+        :returns: Number of records written
+        :rtype: int
+        """
+        conn = sqlite3.connect(self.path)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            count = 0
+            batch: List[Mapping[str, Any]] = []
+            for study in studies:
+                batch.append(study)
+                if len(batch) >= INGEST_BATCH:
+                    count += self._write(conn, batch)
+                    batch = []
+            count += self._write(conn, batch)
+            total = conn.execute("SELECT COUNT(*) FROM studies").fetchone()[0]
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('studies', ?)", (str(total),))
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('ingested_at', datetime('now'))")
+                conn.execute("INSERT INTO study_text(study_text) VALUES ('optimize')")
+            return count
+        finally:
+            conn.close()
+
+    def ingested_at(self) -> Optional[float]:
+        """Return when the index was last ingested.
+
+        :returns: Unix time of the last completed ingest, or None if unknown
+        :rtype: Optional[float]
+        """
+        try:
+            row = self._reader().execute("SELECT value FROM meta WHERE key = 'ingested_at'").fetchone()
+        except sqlite3.Error as e:
+            logger.warning("cannot read the local index age: %s", e)
+            return None
+        if row is None:
+            return None
+        # Written by SQLite's datetime('now'), in UTC
+        return datetime.fromisoformat(row[0]).replace(tzinfo=timezone.utc).timestamp()
+
+    @staticmethod
+    def _write(conn: sqlite3.Connection, batch: Sequence[Mapping[str, Any]]) -> int:
+        with conn:
+            for study in batch:
+                try:
+                    columns, text, locations = extract_study(study)
+                except ValueError as e:
+                    logger.warning("skipping record: %s", e)
+                    continue
+                old = conn.execute("SELECT rowid FROM studies WHERE nct_id = ?", (columns["nct_id"],)).fetchone()
+                if old is not None:
+                    conn.execute("DELETE FROM study_text WHERE rowid = ?", old)
+                    conn.execute("DELETE FROM locations WHERE study = ?", old)
+                    conn.execute("DELETE FROM studies WHERE rowid = ?", old)
+                names = list(columns)
+                cursor = conn.execute(
+                    f"INSERT INTO studies ({', '.join(names)}, data) VALUES ({', '.join('?' * (len(names) + 1))})",
+                    [*columns.values(), json.dumps(study, separators=(",", ":"))],
+                )
+                rowid = cursor.lastrowid
+                conn.execute(
+                    f"INSERT INTO study_text (rowid, {', '.join(TEXT_COLUMNS)}) VALUES (?{', ?' * len(TEXT_COLUMNS)})",
+                    [rowid, *(text[c] for c in TEXT_COLUMNS)],
+                )
+                conn.executemany("INSERT INTO locations VALUES (?, ?, ?, ?, ?, ?, ?)", [(rowid, *loc) for loc in locations])
+        return len(batch)
+
+    def search(self, query: LocalQuery) -> Dict[str, Any]:
+        """Run a translated query and build a ``PagedStudies`` response body.
+
+        :param query: Translated request
+        :type query: LocalQuery
+        :returns: ``studies``, plus ``nextPageToken`` and ``totalCount`` when applicable
+        :rtype: dict[str, Any]
+        """
+        conn = self._reader()
+        rows = conn.execute(
+            f"SELECT data FROM studies s WHERE {query.where} ORDER BY {query.order} LIMIT ? OFFSET ?",
+            [*query.params, *query.order_params, query.limit + 1, query.offset],
+        ).fetchall()
+        studies = [json.loads(data) for (data,) in rows[: query.limit]]
+        if query.fields is not None:
+            trie = build_trie(query.fields)
+            studies = [project(study, trie) for study in studies]
+        result: Dict[str, Any] = {}
+        if query.count_total:
+            sql = f"SELECT COUNT(*) FROM studies s WHERE {query.where}"
+            result["totalCount"] = conn.execute(sql, query.params).fetchone()[0]
+        result["studies"] = studies
+        if len(rows) > query.limit:
+            result["nextPageToken"] = f"{PAGE_TOKEN_PREFIX}{query.offset + query.limit}"
+        return result
+
+
+# ---------------------------------------------------------------------------
+# Transport
+# ---------------------------------------------------------------------------
+
+_STUDIES_PATH = re.compile(r"/studies$")
+
+
+class LocalIndexTransport(httpx.AsyncBaseTransport):
+    """Transport answering translatable ``GET /studies`` searches from a :class:`StudyIndex`.
+
+    :param transport: Wrapped transport for everything the index cannot answer
+    :type transport: httpx.AsyncBaseTransport
+    :param index: Local study index
+    :type index: StudyIndex
+    :param pieces: Resolver for ``fields`` piece names beyond :data:`PIECES`
+    :type pieces: Optional[Callable[[str], Optional[str]]]
+    :param max_age: Index age in seconds beyond which searches go to the live
+        API; None for no limit
+    :type max_age: Optional[float]
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        index: StudyIndex,
+        pieces: Optional[PieceResolver] = None,
+        max_age: Optional[float] = MAX_AGE,
+    ) -> None:
+        self._transport = transport
+        self.index = index
+        self.pieces = pieces
+        self.max_age = max_age
+        self._ingested_at: Optional[float] = None
+        self._stale = False
+        self.local = 0
+        self.forwarded = 0
+
+    def fresh(self) -> bool:
+        """Return whether the index is recent enough to answer searches.
+
+        The ingest time is re-read while the index is stale, so a re-ingest
+        takes effect without a restart.
+
+        :returns: True without a ``max_age`` or while the index is younger than it
+        :rtype: bool
+        """
+        if self.max_age is None:
+            return True
+        if self._ingested_at is None or time.time() - self._ingested_at > self.max_age:
+            self._ingested_at = self.index.ingested_at()
+        stale = self._ingested_at is None or time.time() - self._ingested_at > self.max_age
+        if stale != self._stale:
+            self._stale = stale
+            if stale:
+                logger.warning("local index is older than %gs; searching the live API until it is re-ingested", self.max_age)
+            else:
+                logger.info("local index was re-ingested; answering searches from it again")
+        return not stale
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """Answer ``request`` locally when possible, otherwise forward it.
+
+        :param request: Outgoing request
+        :type request: httpx.Request
+        :returns: Local or upstream response
+        :rtype: httpx.Response
+        """
+        if request.method == "GET" and _STUDIES_PATH.search(request.url.path) and self.fresh():
+            try:
+                query = translate_params(dict(request.url.params), self.pieces)
+            except Untranslatable as e:
+                logger.debug("forwarding search: %s", e)
+            else:
+                try:
+                    body = await asyncio.to_thread(self.index.search, query)
+                except sqlite3.Error as e:
+                    logger.warning("local index search failed, forwarding: %s", e)
+                else:
+                    self.local += 1
+                    return httpx.Response(
+                        200, json=body, headers={"x-irmcp-source": "local-index"}, request=request
+                    )
+        self.forwarded += 1
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        """Close the wrapped transport."""
+        await self._transport.aclose()
+
+
+def open_index(path: Optional[str] = None) -> Optional[StudyIndex]:
+    """Return the index at ``path`` (default CT_INDEX_PATH), or None when not configured.
+
+    :param path: SQLite database file
+    :type path: Optional[str]
+    :returns: Index, or None when unset or the file does not exist
+    :rtype: Optional[StudyIndex]
+    """
+    path = path or os.environ.get("CT_INDEX_PATH")
+    if not path:
+        return None
+    if not os.path.exists(path):
+        logger.warning("CT_INDEX_PATH %s does not exist; searching the live API only", path)
+        return None
+    return StudyIndex(path)
+
+
+# ---------------------------------------------------------------------------
+# Dump reading and CLI
+# ---------------------------------------------------------------------------
+
+def _records(data: Any) -> Iterator[Mapping[str, Any]]:
+    if isinstance(data, list):
+        yield from data
+    elif isinstance(data, dict) and "studies" in data:
+        yield from data["studies"]
+    elif isinstance(data, dict):
+        yield data
+
+
+def iter_dump(path: str) -> Iterator[Mapping[str, Any]]:
+    """Yield study records from a bulk dump.
+
+    Accepts the ClinicalTrials.gov JSON zip (one file per study), a directory of
+    ``.json`` files, JSON Lines (``.jsonl``/``.ndjson``) or a JSON file holding
+    one study, a list of studies or a ``PagedStudies`` page.
+
+    :param path: Dump location
+    :type path: str
+    :returns: Iterator of study records
+    :rtype: Iterator[Mapping[str, Any]]
+    """
+    if os.path.isdir(path):
+        for root, _, files in os.walk(path):
+            for name in sorted(files):
+                if name.endswith(".json"):
+                    with open(os.path.join(root, name), "rb") as f:
+                        yield from _records(json.load(f))
+    elif zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for name in archive.namelist():
+                if name.endswith(".json"):
+                    yield from _records(json.loads(archive.read(name)))
+    elif path.endswith((".jsonl", ".ndjson")):
+        with open(path, "rb") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, "rb") as f:
+            yield from _records(json.load(f))
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Entry point: ingest bulk dumps into the local index.
+
+    :param argv: Command-line arguments (defaults to ``sys.argv[1:]``)
+    :type argv: Optional[Sequence[str]]
+    :returns: Nothing
+    :rtype: None
+    """
+    parser = argparse.ArgumentParser(description="Load ClinicalTrials.gov study JSON into a local search index")
+    parser.add_argument("dumps", nargs="+", help="zip, directory, .jsonl or .json dump")
+    parser.add_argument("--db", default=os.environ.get("CT_INDEX_PATH"), help="index file (default: CT_INDEX_PATH)")
+    args = parser.parse_args(argv)
+    if not args.db:
+        parser.error("--db or CT_INDEX_PATH is required")
+    logging.basicConfig(level=logging.INFO)
+    index = StudyIndex(args.db)
+    for dump in args.dumps:
+        count = index.ingest(iter_dump(dump))
+        logger.info("ingested %d studies from %s", count, dump)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,425 @@
+"""Version-aware snapshot of ClinicalTrials.gov metadata, enums and search areas.
+
+``/studies/metadata``, ``/studies/enums`` and ``/studies/search-areas`` are
+large and change only with a data release. :class:`MetadataStore` keeps them in
+memory, persists them under CT_METADATA_DIR, and re-fetches them only when the
+``dataTimestamp`` reported by ``/version`` changes. :class:`MetadataTransport`
+serves the documents from the snapshot and schedules the version check in the
+background; :class:`FieldIndex` answers field-name lookups without walking the
+metadata tree.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import difflib
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Mapping, Optional
+
+import httpx
+
+from irmcp.deadline import without_deadline
+
+logger = logging.getLogger(__name__)
+
+METADATA_PATH = "/studies/metadata"
+SEARCH_AREAS_PATH = "/studies/search-areas"
+ENUMS_PATH = "/studies/enums"
+VERSION_PATH = "/version"
+DOCUMENT_PATHS = (METADATA_PATH, SEARCH_AREAS_PATH, ENUMS_PATH)
+SNAPSHOT_FILE = "ct_metadata.json"
+# Seconds before retrying a failed version check
+RETRY_AFTER_FAILURE = 60.0
+
+
+@dataclass(frozen=True)
+class FieldInfo:
+    """One study data field from ``/studies/metadata``.
+
+    :param piece: Piece name used in ``fields``, ``sort`` and ``AREA[...]``
+    :type piece: str
+    :param path: Dotted path of the field in a study record
+    :type path: str
+    :param type: Field type (``text``, ``enum ...``, ``date``, ``FieldNode[]``, ...)
+    :type type: str
+    :param is_enum: Whether the field holds enumeration values
+    :type is_enum: bool
+    :param title: Short field title
+    :type title: str
+    :param description: Field description
+    :type description: str
+    """
+
+    piece: str
+    path: str
+    type: str
+    is_enum: bool = False
+    title: str = ""
+    description: str = ""
+
+
+@dataclass
+class FieldIndex:
+    """In-memory lookup over the metadata, search-area and enum documents."""
+
+    fields: Dict[str, FieldInfo] = field(default_factory=dict)
+    areas: Dict[str, str] = field(default_factory=dict)
+    enum_values: Dict[str, List[str]] = field(default_factory=dict)
+
+    @classmethod
+    def from_documents(cls, documents: Mapping[str, Any]) -> "FieldIndex":
+        """Build the index from the three metadata documents.
+
+        :param documents: Parsed JSON keyed by :data:`DOCUMENT_PATHS`
+        :type documents: Mapping[str, Any]
+        :returns: Index keyed by lowercase piece and area names
+        :rtype: FieldIndex
+        """
+        index = cls()
+        stack = [(node, "") for node in documents.get(METADATA_PATH) or []]
+        while stack:
+            node, parent = stack.pop()
+            path = f"{parent}.{node['name']}" if parent else node["name"]
+            info = FieldInfo(
+                piece=node.get("piece", node["name"]),
+                path=path,
+                type=node.get("type", ""),
+                is_enum=bool(node.get("isEnum")),
+                title=node.get("title", ""),
+                description=node.get("description", ""),
+            )
+            for name in (info.piece, *(node.get("altPieceNames") or [])):
+                index.fields.setdefault(name.lower(), info)
+            stack.extend((child, path) for child in node.get("children") or [])
+        for document in documents.get(SEARCH_AREAS_PATH) or []:
+            for area in document.get("areas") or []:
+                index.areas[area["name"].lower()] = area["name"]
+        for enum in documents.get(ENUMS_PATH) or []:
+            values = [v["value"] for v in enum.get("values") or []]
+            for piece in enum.get("pieces") or []:
+                index.enum_values[piece.lower()] = values
+        return index
+
+    def field(self, name: str) -> Optional[FieldInfo]:
+        """Return the field for a piece name (case-insensitive).
+
+        :param name: Piece name or alternative piece name
+        :type name: str
+        :returns: Field, or None when unknown
+        :rtype: Optional[FieldInfo]
+        """
+        return self.fields.get(name.lower())
+
+    def path(self, name: str) -> Optional[str]:
+        """Return the record path of a piece name, or None when unknown."""
+        info = self.fields.get(name.lower())
+        return info.path if info else None
+
+    def suggest(self, name: str, limit: int = 3) -> List[str]:
+        """Return known piece or area names close to ``name``.
+
+        :param name: Unknown name
+        :type name: str
+        :param limit: Maximum suggestions
+        :type limit: int
+        :returns: Canonical names, best match first
+        :rtype: list[str]
+        """
+        candidates = {**{k: v.piece for k, v in self.fields.items()}, **self.areas}
+        matches = difflib.get_close_matches(name.lower(), list(candidates), n=limit, cutoff=0.75)
+        return list(dict.fromkeys(candidates[m] for m in matches))
+
+    def describe(self, name: str) -> Optional[Dict[str, Any]]:
+        """Describe a field or search area for a lookup response.
+
+        :param name: Piece or search area name
+        :type name: str
+        :returns: Piece, path, type, title, description and enum values, or
+            ``{"area": name}`` for a search area; None when unknown
+        :rtype: Optional[dict[str, Any]]
+        """
+        info = self.field(name)
+        if info is None:
+            area = self.areas.get(name.lower())
+            return {"area": area} if area else None
+        result: Dict[str, Any] = {"piece": info.piece, "path": info.path, "type": info.type}
+        if info.title:
+            result["title"] = info.title
+        if info.description:
+            result["description"] = info.description
+        values = self.enum_values.get(info.piece.lower())
+        if values:
+            result["values"] = values
+        return result
+
+
+class MetadataSnapshot:
+    """Metadata documents for one data release, pre-serialized for serving.
+
+    :param version: ``/version`` response (``apiVersion``, ``dataTimestamp``)
+    :type version: Mapping[str, Any]
+    :param documents: Parsed documents keyed by :data:`DOCUMENT_PATHS`
+    :type documents: Mapping[str, Any]
+    """
+
+    def __init__(self, version: Mapping[str, Any], documents: Mapping[str, Any]) -> None:
+        self.version = dict(version)
+        self.documents = dict(documents)
+        self.bodies = {path: json.dumps(doc, separators=(",", ":")).encode("utf-8") for path, doc in documents.items()}
+        self.fields = FieldIndex.from_documents(documents)
+
+    @property
+    def data_timestamp(self) -> Optional[str]:
+        """Data release timestamp this snapshot was taken at."""
+        return self.version.get("dataTimestamp")
+
+
+def _metadata_dir() -> Optional[str]:
+    """Return the snapshot directory from CT_METADATA_DIR, or None when disabled (empty)."""
+    default = os.path.join(os.path.expanduser("~"), ".cache", "irmcp", "ct")
+    return os.environ.get("CT_METADATA_DIR", default) or None
+
+
+class MetadataStore:
+    """Holds the current :class:`MetadataSnapshot` and keeps it up to date.
+
+    :param base_url: API base URL (``.../api/v2``)
+    :type base_url: str
+    :param directory: Where the snapshot is persisted; defaults to CT_METADATA_DIR
+        (empty disables persistence)
+    :type directory: Optional[str]
+    :param check_interval: Seconds between ``/version`` checks; defaults to
+        CT_METADATA_CHECK_INTERVAL (3600). 0 disables background checks.
+    :type check_interval: Optional[float]
+    :param clock: Monotonic clock, overridable for tests
+    :type clock: Callable[[], float]
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        directory: Optional[str] = None,
+        check_interval: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.directory = directory if directory is not None else _metadata_dir()
+        if check_interval is None:
+            check_interval = float(os.environ.get("CT_METADATA_CHECK_INTERVAL", "3600"))
+        self.check_interval = check_interval
+        self.clock = clock
+        self.snapshot: Optional[MetadataSnapshot] = None
+        self._transport: Optional[httpx.AsyncBaseTransport] = None
+        self._task: Optional["asyncio.Task[bool]"] = None
+        self._next_check = 0.0
+
+    @property
+    def fields(self) -> Optional[FieldIndex]:
+        """Field index of the current snapshot, or None before the first load."""
+        return self.snapshot.fields if self.snapshot else None
+
+    def field_path(self, name: str) -> Optional[str]:
+        """Return the record path of a piece name, or None when unknown or not loaded."""
+        return self.snapshot.fields.path(name) if self.snapshot else None
+
+    def bind(self, transport: httpx.AsyncBaseTransport) -> None:
+        """Set the transport used to fetch ``/version`` and the documents.
+
+        :param transport: Transport below the snapshot layer
+        :type transport: httpx.AsyncBaseTransport
+        """
+        self._transport = transport
+
+    def load(self) -> bool:
+        """Load the persisted snapshot, if any.
+
+        :returns: Whether a snapshot was loaded
+        :rtype: bool
+        """
+        if not self.directory:
+            return False
+        try:
+            with open(os.path.join(self.directory, SNAPSHOT_FILE), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.snapshot = MetadataSnapshot(data["version"], data["documents"])
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.debug("No usable metadata snapshot: %s", e)
+            return False
+        return True
+
+    def _save(self, snapshot: MetadataSnapshot) -> None:
+        if not self.directory:
+            return
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"version": snapshot.version, "documents": snapshot.documents}, f, separators=(",", ":"))
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning("Could not persist metadata snapshot %s: %s", path, e)
+
+    async def _get_json(self, path: str) -> Any:
+        if self._transport is None:
+            raise RuntimeError("MetadataStore.bind() was not called")
+        request = httpx.Request(
+            "GET", self.base_url + path, headers={"Accept": "application/json", "User-Agent": "irmcp-ct-metadata/1.0"}
+        )
+        response = await self._transport.handle_async_request(request)
+        try:
+            content = await response.aread()
+        finally:
+            await response.aclose()
+        if response.status_code != 200:
+            raise httpx.HTTPStatusError(f"{path} returned {response.status_code}", request=request, response=response)
+        return json.loads(content)
+
+    async def refresh(self, force: bool = False) -> bool:
+        """Check ``/version`` and re-fetch the documents if the data changed.
+
+        :param force: Re-fetch even if the data timestamp is unchanged
+        :type force: bool
+        :returns: Whether a new snapshot was installed
+        :rtype: bool
+        """
+        version = await self._get_json(VERSION_PATH)
+        if not force and self.snapshot is not None and self.snapshot.data_timestamp == version.get("dataTimestamp"):
+            return False
+        documents = await asyncio.gather(*(self._get_json(path) for path in DOCUMENT_PATHS))
+        snapshot = MetadataSnapshot(version, dict(zip(DOCUMENT_PATHS, documents)))
+        self.snapshot = snapshot
+        self._save(snapshot)
+        logger.info("metadata snapshot updated to data release %s", snapshot.data_timestamp)
+        return True
+
+    async def _check(self) -> bool:
+        try:
+            return await self.refresh()
+        except (httpx.HTTPError, TimeoutError, ValueError, KeyError, TypeError) as e:
+            logger.warning("metadata version check failed: %s", e)
+            self._next_check = min(self._next_check, self.clock() + RETRY_AFTER_FAILURE)
+            return False
+
+    def maybe_check(self) -> None:
+        """Start a background version check when one is due.
+
+        Must be called from the serving event loop; returns immediately.
+        """
+        if self.check_interval <= 0 and self.snapshot is not None:
+            return
+        if self._task is not None and not self._task.done():
+            return
+        now = self.clock()
+        if now < self._next_check:
+            return
+        self._next_check = now + (self.check_interval if self.check_interval > 0 else float("inf"))
+        # The check serves later requests too, so the current caller's deadline does not apply
+        self._task = asyncio.create_task(self._check(), context=without_deadline())
+
+    async def preload(self) -> None:
+        """Check for a new data release now and wait for the snapshot.
+
+        Run at server startup, so a cold start fetches the documents before
+        the first request asks for them; that request then joins the check
+        instead of starting it. Failures are logged by the check.
+        """
+        self.maybe_check()
+        if self._task is not None:
+            await asyncio.shield(self._task)
+
+    async def document(self, path: str) -> Optional[bytes]:
+        """Return a serialized document, fetching the snapshot first if there is none.
+
+        :param path: One of :data:`DOCUMENT_PATHS`
+        :type path: str
+        :returns: JSON body, or None when no snapshot could be obtained
+        :rtype: Optional[bytes]
+        """
+        if self.snapshot is None:
+            self.maybe_check()
+            if self._task is not None:
+                await asyncio.shield(self._task)
+        return self.snapshot.bodies.get(path) if self.snapshot else None
+
+
+class MetadataTransport(httpx.AsyncBaseTransport):
+    """Transport serving the metadata documents from a :class:`MetadataStore`.
+
+    Requests with query parameters (e.g. ``includeIndexedOnly``) are forwarded.
+    Every request also gives the store a chance to run its background check.
+
+    :param transport: Wrapped transport; also used by the store for its fetches
+    :type transport: httpx.AsyncBaseTransport
+    :param store: Snapshot store
+    :type store: MetadataStore
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, store: MetadataStore) -> None:
+        self._transport = transport
+        self.store = store
+        store.bind(transport)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """Serve a metadata document from memory or forward the request.
+
+        :param request: Outgoing request
+        :type request: httpx.Request
+        :returns: Snapshot or upstream response
+        :rtype: httpx.Response
+        """
+        self.store.maybe_check()
+        if request.method == "GET" and not request.url.query:
+            path = next((p for p in DOCUMENT_PATHS if request.url.path.endswith(p)), None)
+            if path is not None:
+                body = await self.store.document(path)
+                if body is not None:
+                    return httpx.Response(
+                        200,
+                        content=body,
+                        headers={"Content-Type": "application/json", "x-irmcp-source": "metadata-snapshot"},
+                        request=request,
+                    )
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        """Close the wrapped transport."""
+        await self._transport.aclose()
+
+
+def register_metadata_tools(app: Any, store: MetadataStore) -> None:
+    """Register ``find_study_fields``, a field lookup backed by the snapshot.
+
+    :param app: FastMCP server instance
+    :type app: Any
+    :param store: Snapshot store
+    :type store: MetadataStore
+    """
+
+    @app.tool(
+        name="find_study_fields",
+        description=(
+            "Look up ClinicalTrials.gov study data fields or search areas by name (e.g. OverallStatus, "
+            "MinimumAge, ConditionSearch). Returns each field's path, type, description and enum values, "
+            "and close matches for unknown names. Much cheaper than fetching the full studies metadata."
+        ),
+    )
+    async def find_study_fields(names: List[str]) -> Dict[str, Any]:
+        if store.snapshot is None:
+            await store.document(METADATA_PATH)
+        index = store.fields
+        if index is None:
+            raise ValueError("Study metadata is not available right now; try studiesMetadata instead.")
+        found: Dict[str, Any] = {}
+        unknown: Dict[str, List[str]] = {}
+        for name in names:
+            described = index.describe(name)
+            if described is None:
+                unknown[name] = index.suggest(name)
+            else:
+                found[name] = described
+        return {"fields": found, "unknown": unknown}
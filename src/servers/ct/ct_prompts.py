@@ -40,8 +40,10 @@ def register_prompts(app: Any) -> None:
             "    the analysis in order to maximize the number of trials under consideration. These fields\n"
             "    should come from the list under Study Data Fields. You should not request modules,\n"
             "    only the fields within those modules. Do not assume fields exist.\n"
-            "    If unsure what fields are need, use the studies_metadata endpoint\n"
+            "    If unsure what fields are need, look them up with the find_study_fields tool\n"
             "  g. make sure to sort by relevance (@relevance:desc) so that relevant studies come first.\n"
+            "  h. To search several synonyms, nearby locations or status filters, pass them to one\n"
+            "    multi_search_studies call instead of running many search_studies calls one after another.\n"
             "3. Examining the list of clinical trials returned one by one, then examine the following parts of the clinical trial step by step. Think carefully:\n"
             "  a. if the patient's sex does not match the clinical trial's requirements, exclude the study.\n"
             "  b. if the patient's age does not match the clinical trial's requirements, exclude the study.\n"
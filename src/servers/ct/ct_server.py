@@ -4,70 +4,136 @@ Provides an async setup routine to construct a FastMCP OpenAPI server and a
 sync `main()` for launching via CLI.
 """
 
-import asyncio
 import os
 
-import httpx
-
 # Ensure FastMCP uses the experimental OpenAPI parser
 os.environ.setdefault("FASTMCP_EXPERIMENTAL_ENABLE_NEW_OPENAPI_PARSER", "true")
 from fastmcp.experimental.server.openapi import FastMCPOpenAPI
 
-from irmcp.server import load_openapi_spec, setup_httpx_logging
+from irmcp.deadline import load_deadlines, register_deadlines
+from irmcp.projection import ProjectionRule, load_projection_rules, register_slimming
+from irmcp.scheduler import SchedulerConfig
+from irmcp.server import (
+    TransportWrapper,
+    create_http_client,
+    create_response_cache,
+    load_openapi_spec,
+    on_startup,
+    register_cache_stats,
+    register_metrics,
+    run_server,
+    setup_httpx_logging,
+    upstream_metrics,
+)
+from servers.ct.ct_index import LocalIndexTransport, open_index
+from servers.ct.ct_metadata import MetadataStore, MetadataTransport, register_metadata_tools
 from servers.ct.ct_prompts import register_prompts
+from servers.ct.ct_stream import register_screening
 from servers.ct.ct_tools import register_tools
+from servers.ct.essie_guide import register_guide
+from servers.ct.essie_parser import register_essie_validation
 
 # Server configuration
 API_BASE: str = os.environ.get("API_BASE", "https://clinicaltrials.gov/api/v2")
 DEFAULT_TIMEOUT: float = float(os.environ.get("API_TIMEOUT", "30"))
+# ClinicalTrials.gov publishes no hard limit; stay polite by default
+RATE_LIMIT: float = 10.0
+
+# Cache TTLs (seconds) per operation path. Search results change as studies are
+# updated. Metadata, search areas and enums only change with a data release and
+# are served from the version-aware snapshot in ct_metadata instead.
+CACHE_TTLS: dict[str, float] = {
+    "/studies/{nctId}": 3600,
+    "/studies": 300,
+    "/stats/size": 3600,
+    "/stats/field/values": 3600,
+    "/stats/field/sizes": 3600,
+    "/version": 300,
+}
+
+# Result slimming per tool; RESPONSE_PROJECTION_FILE can override. Study text
+# fields (summaries, descriptions, eligibility criteria) are long markdown.
+PROJECTIONS: dict[str, ProjectionRule] = {
+    "search_studies": ProjectionRule(max_text=2000),
+    "search_all_studies": ProjectionRule(max_text=2000),
+    "multi_search_studies": ProjectionRule(max_text=2000),
+    "screen_studies": ProjectionRule(max_text=2000),
+    "fetchStudy": ProjectionRule(max_text=8000),
+}
+
+# Deadline budgets (seconds) for tools that need more than API_TOOL_DEADLINE;
+# API_TOOL_DEADLINES can override. Screening reads up to ten 1000-study pages.
+DEADLINES: dict[str, float] = {
+    "screen_studies": 300,
+}
 
 async def create_ct_server() -> FastMCPOpenAPI:
     """Build the ClinicalTrials.gov FastMCP server instance.
 
-    Creates an :class:`httpx.AsyncClient`, loads the OpenAPI spec, configures
-    HTTP logging, registers prompts, applies tool transformations, and returns
-    a ready-to-run :class:`fastmcp.experimental.server.openapi.FastMCPOpenAPI`.
+    Creates a caching :class:`httpx.AsyncClient`, loads the OpenAPI spec, configures
+    HTTP logging, registers prompts, applies tool transformations and result
+    slimming, and returns a ready-to-run :class:`fastmcp.experimental.server.openapi.FastMCPOpenAPI`.
 
     :returns: Configured FastMCP server instance for ClinicalTrials.gov
     :rtype: fastmcp.experimental.server.openapi.FastMCPOpenAPI
     """
-    # Use an async client: FastMCP's OpenAPI server awaits HTTP calls
-    client = httpx.AsyncClient(
-        base_url=API_BASE, 
-        timeout=httpx.Timeout(DEFAULT_TIMEOUT, connect=10.0),
-        limits=httpx.Limits(max_keepalive_connections=5, max_connections=10),
-        headers={
-            "User-Agent": "irmcp-clinical-trials-server/1.0",
-            "Accept": "application/json",
-        }
-    )
-
     schema_path = os.path.join(os.path.dirname(__file__), "ctg-oas-v2.yaml")
     openapi_spec = load_openapi_spec(schema_path)
+    # Use an async client: FastMCP's OpenAPI server awaits HTTP calls
+    cache = create_response_cache(CACHE_TTLS)
+    # Metadata documents come from a persisted snapshot refreshed on data releases
+    metadata = MetadataStore(API_BASE)
+    metadata.load()
+    # Check for a newer data release (or fetch the documents on a cold start) while the server starts
+    on_startup(metadata.preload)
+    wrappers: list[TransportWrapper] = []
+    # Answer translatable searches from the local study index (CT_INDEX_PATH)
+    index = open_index()
+    if index is not None:
+        wrappers.append(lambda t: LocalIndexTransport(t, index, metadata.field_path))
+    wrappers.append(lambda t: MetadataTransport(t, metadata))
+    client = create_http_client(
+        API_BASE,
+        "irmcp-clinical-trials-server/1.0",
+        DEFAULT_TIMEOUT,
+        cache,
+        wrappers,
+        scheduler=SchedulerConfig.from_env(default_rate=RATE_LIMIT),
+        instrument=upstream_metrics("clinical-trials", openapi_spec),
+    )
 
     # Configure HTTP logging and build app
     setup_httpx_logging()
     app = FastMCPOpenAPI(openapi_spec=openapi_spec, client=client, name="clinical-trials")
     # Register prompts using decorators
     register_prompts(app)
-    # Transform tools to enhance with ESSIE rules
+    register_cache_stats(app, cache)
+    register_metrics(app, cache)
+    register_deadlines(app, load_deadlines(DEADLINES))
+    # Serve the ESSIE guide on demand and point search_studies at it
+    register_guide(app)
+    register_metadata_tools(app, metadata)
+    # Bulk screening reads large pages from the byte stream instead of buffering them;
+    # registered before register_tools disables listStudies, which it is built from
+    await register_screening(app, client, metadata.field_path)
+    # Transform tools to enhance with ESSIE summary
     await register_tools(app)
+    # Reject malformed ESSIE before the round trip; fix what is unambiguous
+    register_essie_validation(app, metadata)
+    register_slimming(app, load_projection_rules(PROJECTIONS))
     return app
 
 def main() -> None:
     """Entry point: build and run the MCP server.
 
-    Creates the server via :func:`ct_server`, then runs it with the default
-    STDIO transport so an MCP client can connect.
+    Builds the server via :func:`create_ct_server` and runs it with the default STDIO
+    transport on the same event loop, so the HTTP client is created, pre-warmed
+    and closed on the loop that serves requests.
 
     :returns: Nothing. Blocks the current process running the server.
     :rtype: None
     """
-      
-    # Setup the app with async operations
-    app = asyncio.run(create_ct_server())
-    # Run the server in sync context
-    app.run()
+    run_server(create_ct_server)
 
 if __name__ == "__main__":
     main()
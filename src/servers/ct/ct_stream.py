@@ -0,0 +1,325 @@
+"""Streaming reads of large ``listStudies`` pages.
+
+The generated tools buffer and parse a whole response before returning it, so a
+``pageSize=1000`` page with full study records costs several times its size in
+memory. ``screen_studies`` instead reads ``GET /studies`` from the httpx byte
+stream: :func:`irmcp.jsonstream.iter_json_members` decodes the ``studies``
+array one element at a time and :func:`iter_csv_rows` yields CSV records as
+they complete. Each study is projected onto the requested fields at once and
+kept as a tuple in a :class:`StudyTable`, so memory grows with the projected
+rows rather than with the raw page.
+
+Streamed requests are marked with :data:`irmcp.cache.STREAM_EXTENSION`; the
+response cache and singleflight layers pass them through without buffering.
+"""
+
+from __future__ import annotations
+
+import codecs
+import csv
+import io
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+from fastmcp.exceptions import NotFoundError
+from fastmcp.tools import Tool
+from fastmcp.tools.tool_transform import ArgTransform
+
+from irmcp.cache import STREAM_EXTENSION
+from irmcp.jsonstream import iter_json_members
+from irmcp.server import progress_reporter
+from servers.ct.ct_index import MAX_PAGE_SIZE, PIECES, PieceResolver
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_STUDIES = 1000
+MAX_STUDIES = 10_000
+# listStudies' own default field list, used when ``fields`` is not given
+DEFAULT_FIELDS = (
+    "NCTId", "BriefTitle", "OverallStatus", "Phase", "EligibilityCriteria", "Sex", "MinimumAge", "MaximumAge",
+    "Condition", "InterventionName", "LocationCity", "LocationState", "LocationCountry", "BriefSummary",
+)
+
+
+# ---------------------------------------------------------------------------
+# Incremental parsers
+# ---------------------------------------------------------------------------
+
+def _record_boundary(text: str) -> int:
+    """Return the offset just past the last newline that ends a complete CSV record.
+
+    A newline inside a quoted field leaves an odd number of quotes before it.
+
+    :param text: CSV text
+    :type text: str
+    :returns: Offset, or 0 if no record is complete
+    :rtype: int
+    """
+    cut = start = 0
+    quoted = False
+    while True:
+        newline = text.find("\n", start)
+        if newline < 0:
+            return cut
+        if text.count('"', start, newline) % 2:
+            quoted = not quoted
+        if not quoted:
+            cut = newline + 1
+        start = newline + 1
+
+
+async def iter_csv_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[List[str]]:
+    """Yield CSV records as they complete, including quoted fields with newlines.
+
+    :param chunks: Raw body bytes, e.g. ``response.aiter_bytes()``
+    :type chunks: AsyncIterator[bytes]
+    :returns: Async iterator of records; the first is the header
+    :rtype: AsyncIterator[list[str]]
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    carry = ""
+    async for chunk in chunks:
+        text = carry + decoder.decode(chunk)
+        cut = _record_boundary(text)
+        for row in csv.reader(io.StringIO(text[:cut])):
+            if row:
+                yield row
+        carry = text[cut:]
+    carry += decoder.decode(b"", final=True)
+    for row in csv.reader(io.StringIO(carry)):
+        if row:
+            yield row
+
+
+# ---------------------------------------------------------------------------
+# Projection
+# ---------------------------------------------------------------------------
+
+def _extract(value: Any, keys: Sequence[str]) -> Any:
+    """Follow ``keys`` into a study record, mapping over lists on the way."""
+    for i, key in enumerate(keys):
+        if isinstance(value, list):
+            found: List[Any] = []
+            for item in value:
+                sub = _extract(item, keys[i:])
+                if isinstance(sub, list):
+                    found.extend(sub)
+                elif sub is not None:
+                    found.append(sub)
+            return found or None
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+        if value is None:
+            return None
+    return value
+
+
+class StudyTable:
+    """Projected studies held as one tuple per study.
+
+    :param columns: Column names (field pieces, or CSV header names)
+    :type columns: Sequence[str]
+    :param paths: Record paths selecting each column from a study's JSON;
+        omitted for CSV, whose rows are already projected
+    :type paths: Optional[Sequence[str]]
+    """
+
+    __slots__ = ("columns", "rows", "_keys")
+
+    def __init__(self, columns: Sequence[str], paths: Optional[Sequence[str]] = None) -> None:
+        self.columns = list(columns)
+        self.rows: List[Tuple[Any, ...]] = []
+        self._keys = [tuple(path.split(".")) for path in paths] if paths is not None else None
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def add_study(self, study: Any) -> None:
+        """Project one study record onto the columns and keep it.
+
+        :param study: Study record from the JSON ``studies`` array
+        :type study: Any
+        """
+        assert self._keys is not None, "table has no record paths"
+        self.rows.append(tuple(_extract(study, keys) for keys in self._keys))
+
+    def add_row(self, values: Sequence[str]) -> None:
+        """Keep one CSV record, padded or cut to the header's width.
+
+        :param values: Field values in header order
+        :type values: Sequence[str]
+        """
+        width = len(self.columns)
+        self.rows.append(tuple(values[:width]) + ("",) * (width - len(values)))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return ``columns`` and ``rows`` (lists of values in column order).
+
+        :returns: JSON-serializable table
+        :rtype: dict[str, Any]
+        """
+        return {"columns": self.columns, "rows": [list(row) for row in self.rows]}
+
+
+def resolve_fields(fields: Sequence[str], pieces: Optional[PieceResolver] = None) -> List[str]:
+    """Map ``fields`` piece names to study record paths.
+
+    :param fields: Piece names (``NCTId``, ``Condition``, ...) or dotted paths
+    :type fields: Sequence[str]
+    :param pieces: Resolves names missing from :data:`servers.ct.ct_index.PIECES`
+        (e.g. the metadata field index)
+    :type pieces: Optional[Callable[[str], Optional[str]]]
+    :returns: One record path per field
+    :rtype: list[str]
+    :raises ValueError: If a name cannot be resolved
+    """
+    paths = []
+    for piece in fields:
+        path = PIECES.get(piece) or (pieces(piece) if pieces else None)
+        if path is None and "." in piece:
+            path = piece
+        if path is None:
+            raise ValueError(f"Unknown field {piece!r}; look up field names with find_study_fields")
+        paths.append(path)
+    return paths
+
+
+# ---------------------------------------------------------------------------
+# Tool
+# ---------------------------------------------------------------------------
+
+def _query_params(arguments: Dict[str, Any], defaults: Dict[str, Any]) -> Dict[str, str]:
+    # Arguments arrive with the schema defaults filled in; sending those would
+    # change nothing upstream but would split cache keys, so send only the rest
+    params = {}
+    for name, value in arguments.items():
+        if value is None or value == "" or value == [] or (name in defaults and value == defaults[name]):
+            continue
+        if isinstance(value, bool):
+            value = str(value).lower()
+        elif isinstance(value, (list, tuple)):
+            value = ",".join(str(v) for v in value)
+        params[name] = str(value)
+    return params
+
+
+async def _read_json_page(response: httpx.Response, table: StudyTable, result: Dict[str, Any]) -> Optional[str]:
+    token = None
+    async for key, value in iter_json_members(response.aiter_bytes(), ("studies",)):
+        if key == ("studies",):
+            table.add_study(value)
+        elif key == ("nextPageToken",):
+            token = value
+        elif key == ("totalCount",) and "totalCount" not in result:
+            result["totalCount"] = value
+    return token
+
+
+async def _read_csv_page(response: httpx.Response, table: StudyTable, result: Dict[str, Any]) -> Optional[str]:
+    # CSV pages carry paging in headers; every page repeats the header row
+    total = response.headers.get("x-total-count")
+    if total and "totalCount" not in result:
+        result["totalCount"] = int(total)
+    header = True
+    async for row in iter_csv_rows(response.aiter_bytes()):
+        if header:
+            table.columns = table.columns or row
+            header = False
+        else:
+            table.add_row(row)
+    return response.headers.get("x-next-page-token")
+
+
+def _screening_tool(original: Tool, client: httpx.AsyncClient, pieces: Optional[PieceResolver]) -> Tool:
+    """Build ``screen_studies``: streamed ``listStudies`` pages as a compact table.
+
+    :param original: The generated ``listStudies`` tool
+    :type original: fastmcp.tools.Tool
+    :param client: ClinicalTrials.gov HTTP client
+    :type client: httpx.AsyncClient
+    :param pieces: Resolver for field names beyond :data:`servers.ct.ct_index.PIECES`
+    :type pieces: Optional[Callable[[str], Optional[str]]]
+    :returns: Transformed tool that reads pages incrementally
+    :rtype: fastmcp.tools.Tool
+    """
+
+    properties = original.parameters.get("properties", {})
+    defaults = {name: spec["default"] for name, spec in properties.items() if "default" in spec}
+
+    async def screen_studies(max_studies: int = DEFAULT_MAX_STUDIES, **kwargs: Any) -> Dict[str, Any]:
+        if not 1 <= max_studies <= MAX_STUDIES:
+            raise ValueError(f"max_studies must be between 1 and {MAX_STUDIES}")
+        params = _query_params(kwargs, defaults)
+        fmt = params.setdefault("format", "json")
+        if fmt not in ("json", "csv"):
+            raise ValueError("format must be json or csv")
+        fields = [f.strip() for f in params.get("fields", "").split(",") if f.strip()] or list(DEFAULT_FIELDS)
+        params["fields"] = ",".join(fields)
+        page_size = min(int(params.get("pageSize") or MAX_PAGE_SIZE), MAX_PAGE_SIZE)
+        table = StudyTable(fields, resolve_fields(fields, pieces)) if fmt == "json" else StudyTable([])
+        read_page = _read_json_page if fmt == "json" else _read_csv_page
+        result: Dict[str, Any] = {}
+        report = progress_reporter()
+        token = params.pop("pageToken", None)
+        while True:
+            # Size the last page to what is left so nextPageToken resumes exactly
+            params["pageSize"] = str(min(page_size, max_studies - len(table)))
+            if token:
+                params["pageToken"] = token
+            async with client.stream(
+                "GET", "/studies", params=params, extensions={STREAM_EXTENSION: True}
+            ) as response:
+                if response.status_code != 200:
+                    body = (await response.aread()).decode("utf-8", "replace")
+                    raise ValueError(f"ClinicalTrials.gov returned HTTP {response.status_code}: {body[:500]}")
+                token = await read_page(response, table, result)
+            if report is not None:
+                await report(len(table), max_studies, f"{len(table)} studies")
+            if not token or len(table) >= max_studies:
+                break
+        logger.debug("screen_studies read %d studies", len(table))
+        result.update(table.to_dict())
+        result["returned"] = len(table)
+        if token:
+            result["nextPageToken"] = token
+        return result
+
+    return Tool.from_tool(
+        original,
+        name="screen_studies",
+        description=(
+            "Bulk screening: run a search_studies query (same query, filter, fields and sort "
+            "parameters; see its description for ESSIE syntax) and return up to max_studies "
+            f"(at most {MAX_STUDIES}) studies as a compact table: `columns` plus one `rows` entry "
+            "per study with values in column order. Pages of up to 1000 studies are read "
+            "incrementally, so large result sets are cheap; list only the fields you need. "
+            "format=csv returns the CSV download columns as strings. nextPageToken resumes the search."
+        ),
+        transform_fn=screen_studies,
+        # listStudies itself is disabled once search_studies replaces it
+        enabled=True,
+        transform_args={
+            "format": ArgTransform(default="json"),
+            "pageSize": ArgTransform(default=MAX_PAGE_SIZE),
+        },
+    )
+
+
+async def register_screening(app: Any, client: httpx.AsyncClient, pieces: Optional[PieceResolver] = None) -> None:
+    """Add ``screen_studies``, which streams large ``listStudies`` pages.
+
+    :param app: FastMCPOpenAPI ClinicalTrials.gov server
+    :type app: Any
+    :param client: HTTP client the server uses for ClinicalTrials.gov
+    :type client: httpx.AsyncClient
+    :param pieces: Resolver for field names beyond :data:`servers.ct.ct_index.PIECES`
+    :type pieces: Optional[Callable[[str], Optional[str]]]
+    """
+    try:
+        original = await app.get_tool("listStudies")
+    except NotFoundError:
+        logger.warning("listStudies tool not found; screen_studies not added")
+        return
+    app.add_tool(_screening_tool(original, client, pieces))
@@ -5,34 +5,285 @@ Call register_tools(app) after creating the server to transform existing tools.
 
 from __future__ import annotations
 
+import asyncio
+import itertools
+import json
 import logging
-import os
-from typing import Any
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional, Sequence
 
 from fastmcp.tools import Tool
+from fastmcp.tools.tool_transform import ArgTransform, forward_raw
 
-from irmcp.server import UnexpectedBehavior
+from irmcp.server import UnexpectedBehavior, progress_reporter
+from servers.ct.essie_guide import get_essie_guide
 
+logger = logging.getLogger(__name__)
 
-def load_essie_rules() -> str:
-    """Load ESSIE search guide rules from markdown file.
-    
-    :returns: Content of essie_gpt.md file or error message if not found
-    :rtype: str
+ESSIE_SUMMARY = (
+    "`query.*` and `filter.advanced` take ESSIE expressions: terms and quoted phrases combined with "
+    "AND, OR, NOT and parentheses; AREA[Field] scopes a term to a data field or search area; "
+    "SEARCH[Location](...) binds location fields to one site; RANGE[low, high] matches numbers and "
+    "dates (ages need units, e.g. RANGE[18 years, MAX]); MISSING matches empty fields; "
+    "EXPANSION[...], COVERAGE[...] and TILT[...] adjust matching and ranking.\n"
+    "Read the full guide with the `essie_guide` tool or the essie://guide/{section} resources. "
+    "`essie_guide` also accepts a data field or search area name (e.g. OverallStatus, ConditionSearch)."
+)
+
+DEFAULT_MAX_STUDIES = 100
+DEFAULT_MAX_BYTES = 500_000
+# Upper bound on conditions x locations x statuses in one multi_search_studies call
+MAX_QUERY_VARIANTS = 60
+
+FetchPage = Callable[[Optional[str]], Awaitable[Dict[str, Any]]]
+ReportProgress = Callable[[int, int, str], Awaitable[None]]
+
+
+async def collect_study_pages(
+    fetch_page: FetchPage,
+    max_studies: int = DEFAULT_MAX_STUDIES,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    report: Optional[ReportProgress] = None,
+) -> Dict[str, Any]:
+    """Follow ``nextPageToken`` until exhausted or a budget is reached.
+
+    The next page is requested as soon as the current page's token is known, so
+    fetching overlaps with processing. Studies are kept until either
+    ``max_studies`` or the serialized size ``max_bytes`` would be exceeded.
+
+    :param fetch_page: Coroutine returning one ``/studies`` JSON page for a page token
+        (None for the first page)
+    :type fetch_page: Callable[[Optional[str]], Awaitable[dict[str, Any]]]
+    :param max_studies: Maximum number of studies to return
+    :type max_studies: int
+    :param max_bytes: Maximum total size of returned studies as compact JSON
+    :type max_bytes: int
+    :param report: Optional progress callback ``(studies, max_studies, message)``
+    :type report: Optional[Callable[[int, int, str], Awaitable[None]]]
+    :returns: ``studies``, ``pages``, ``truncated`` and, when stopped on a page
+        boundary with more results available, ``nextPageToken`` to resume with
+        ``search_studies``
+    :rtype: dict[str, Any]
     """
-    rules_file = os.path.join(os.path.dirname(__file__), "essie_gpt.md")
+    studies: List[Any] = []
+    size = 0
+    pages = 0
+    truncated = False
+    total_count = None
+    resume_token: Optional[str] = None
+    pending: Optional[asyncio.Future[Dict[str, Any]]] = asyncio.ensure_future(fetch_page(None))
     try:
-        with open(rules_file, 'r', encoding='utf-8') as f:
-            return f.read()
-    except FileNotFoundError:
-        return "ClinicalTrials.gov study search guide file not found."
+        while pending is not None:
+            page = await pending
+            pages += 1
+            if total_count is None:
+                total_count = page.get("totalCount")
+            token = page.get("nextPageToken")
+            # Prefetch the next page while this one is merged
+            pending = asyncio.ensure_future(fetch_page(token)) if token else None
+            for study in page.get("studies") or []:
+                study_size = len(json.dumps(study, separators=(",", ":")))
+                if len(studies) >= max_studies or size + study_size > max_bytes:
+                    truncated = True
+                    break
+                studies.append(study)
+                size += study_size
+            if report is not None:
+                await report(len(studies), max_studies, f"page {pages}: {len(studies)} studies")
+            if truncated:
+                break
+            if pending is not None and len(studies) >= max_studies:
+                # Stopped on a page boundary: the caller can resume from here
+                truncated = True
+                resume_token = token
+                break
+    finally:
+        if pending is not None:
+            pending.cancel()
+
+    result: Dict[str, Any] = {"studies": studies, "pages": pages, "truncated": truncated}
+    if total_count is not None:
+        result["totalCount"] = total_count
+    if resume_token:
+        result["nextPageToken"] = resume_token
+    return result
+
+
+def _paginated_studies_tool(original_studies_tool: Any) -> Tool:
+    """Build ``search_all_studies``: ``listStudies`` with server-side paging.
+
+    :param original_studies_tool: The generated ``listStudies`` tool
+    :type original_studies_tool: Any
+    :returns: Transformed tool that merges pages into one result
+    :rtype: fastmcp.tools.Tool
+    """
+
+    async def search_all_studies(
+        max_studies: int = DEFAULT_MAX_STUDIES, max_bytes: int = DEFAULT_MAX_BYTES, **kwargs: Any
+    ) -> Dict[str, Any]:
+        async def fetch_page(token: Optional[str]) -> Dict[str, Any]:
+            # Every page must repeat the first page's query, filter and fields params
+            args = {**kwargs, "format": "json"}
+            if token:
+                args["pageToken"] = token
+            result = await forward_raw(**args)
+            return result.structured_content or {}
+
+        return await collect_study_pages(fetch_page, max_studies, max_bytes, progress_reporter())
+
+    return Tool.from_tool(
+        original_studies_tool,
+        name="search_all_studies",
+        description=(
+            "Run a search_studies query and follow nextPageToken on the server, returning one "
+            "merged result. Takes the same query, filter, fields, sort and pageSize parameters "
+            "as search_studies (see its description for ESSIE syntax), plus max_studies and "
+            "max_bytes (compact JSON size of returned studies) to stop early. If stopped at a "
+            "page boundary, nextPageToken resumes the search with search_studies. Use a larger pageSize "
+            "(e.g. 100-1000) with a narrow fields list for fewer round trips."
+        ),
+        transform_fn=search_all_studies,
+        transform_args={
+            "pageToken": ArgTransform(hide=True),
+            "format": ArgTransform(hide=True, default="json"),
+        },
+    )
+
+
+def _nct_id(study: Mapping[str, Any]) -> Optional[str]:
+    ident = (study.get("protocolSection") or {}).get("identificationModule") or {}
+    return ident.get("nctId")
+
+
+def merge_ranked_studies(pages: Sequence[Sequence[Mapping[str, Any]]], max_studies: int) -> Dict[str, Any]:
+    """Merge per-query result lists by NCT ID, keeping each study's best rank.
+
+    Studies are ordered by best rank (1 = first result of some query), then by
+    how many queries found them, then by first appearance. Studies without an
+    NCT ID are kept as they are.
+
+    :param pages: One relevance-ordered study list per query
+    :type pages: Sequence[Sequence[Mapping[str, Any]]]
+    :param max_studies: Maximum number of studies to return
+    :type max_studies: int
+    :returns: ``studies``, a parallel ``ranking`` list (``nctId``, ``bestRank``,
+        ``queries`` as indexes into ``pages``), ``uniqueStudies`` and ``truncated``
+    :rtype: dict[str, Any]
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    for query, studies in enumerate(pages):
+        for rank, study in enumerate(studies, start=1):
+            key = _nct_id(study) or f"#{query}:{rank}"
+            entry = merged.get(key)
+            if entry is None:
+                merged[key] = {"study": study, "nctId": _nct_id(study), "bestRank": rank, "queries": [query]}
+                continue
+            if query not in entry["queries"]:
+                entry["queries"].append(query)
+            if rank < entry["bestRank"]:
+                entry["bestRank"] = rank
+    # Dicts keep insertion order, so the final key is first appearance
+    ordered = sorted(merged.values(), key=lambda e: (e["bestRank"], -len(e["queries"])))
+    kept = ordered[:max_studies]
+    return {
+        "studies": [e["study"] for e in kept],
+        "ranking": [{"nctId": e["nctId"], "bestRank": e["bestRank"], "queries": e["queries"]} for e in kept],
+        "uniqueStudies": len(merged),
+        "truncated": len(ordered) > max_studies,
+    }
+
+
+def _multi_search_tool(original_studies_tool: Any) -> Tool:
+    """Build ``multi_search_studies``: concurrent query variants merged into one list.
+
+    :param original_studies_tool: The generated ``listStudies`` tool
+    :type original_studies_tool: Any
+    :returns: Transformed tool fanning out over conditions, locations and statuses
+    :rtype: fastmcp.tools.Tool
+    """
+
+    async def multi_search_studies(
+        conditions: Optional[List[str]] = None,
+        locations: Optional[List[str]] = None,
+        statuses: Optional[List[str]] = None,
+        max_studies: int = DEFAULT_MAX_STUDIES,
+        **kwargs: Any,
+    ) -> Dict[str, Any]:
+        variants = [
+            {name: value for name, value in zip(("query.cond", "query.locn", "filter.overallStatus"), combo) if value}
+            for combo in itertools.product(conditions or [""], locations or [""], statuses or [""])
+        ]
+        if len(variants) > MAX_QUERY_VARIANTS:
+            raise ValueError(
+                f"{len(variants)} query variants exceed the limit of {MAX_QUERY_VARIANTS}; "
+                "combine synonyms with OR inside one condition instead"
+            )
+        fields = kwargs.get("fields")
+        if fields and "NCTId" not in [f.strip() for f in str(fields).split(",")]:
+            # Needed to merge duplicates
+            kwargs["fields"] = f"{fields},NCTId"
+        report = progress_reporter()
+        done = 0
+
+        async def run(variant: Dict[str, str]) -> Dict[str, Any]:
+            nonlocal done
+            # Hidden args are not forwarded unless set, so pass format explicitly
+            try:
+                result = await forward_raw(**{**kwargs, **variant, "format": "json"})
+            finally:
+                done += 1
+                if report is not None:
+                    await report(done, len(variants), f"{done}/{len(variants)} queries")
+            return result.structured_content or {}
+
+        # The shared client's scheduler keeps the fan-out within the rate limit
+        outcomes = await asyncio.gather(*(run(v) for v in variants), return_exceptions=True)
+        if all(isinstance(o, BaseException) for o in outcomes):
+            raise outcomes[0]  # type: ignore[misc]
+        pages: List[List[Any]] = []
+        summaries: List[Dict[str, Any]] = []
+        for variant, outcome in zip(variants, outcomes):
+            if isinstance(outcome, BaseException):
+                logger.warning("multi_search_studies variant %s failed: %s", variant, outcome)
+                pages.append([])
+                summaries.append({**variant, "error": str(outcome)})
+            else:
+                pages.append(outcome.get("studies") or [])
+                summaries.append({**variant, "returned": len(pages[-1])})
+        return {**merge_ranked_studies(pages, max_studies), "queries": summaries}
+
+    return Tool.from_tool(
+        original_studies_tool,
+        name="multi_search_studies",
+        description=(
+            "Run several search_studies queries at once and return one merged, deduplicated list. "
+            "Every combination of `conditions` x `locations` x `statuses` (filter.overallStatus values, "
+            "e.g. \"RECRUITING,NOT_YET_RECRUITING\") becomes one query; the other search_studies "
+            "parameters (query.term, filter.advanced, fields, sort, pageSize, ...) apply to all of them. "
+            "Use it for condition synonyms and nearby locations instead of many sequential searches. "
+            "Studies are merged by NCT ID and ordered by their best rank in any query; `ranking` gives "
+            "each study's best rank and the indexes of the `queries` that found it."
+        ),
+        transform_fn=multi_search_studies,
+        transform_args={
+            "query.cond": ArgTransform(hide=True),
+            "query.locn": ArgTransform(hide=True),
+            "filter.overallStatus": ArgTransform(hide=True),
+            "pageToken": ArgTransform(hide=True),
+            "countTotal": ArgTransform(hide=True),
+            "format": ArgTransform(hide=True, default="json"),
+        },
+    )
 
 
 async def register_tools(app: Any) -> None:
-    """Transform existing tools by enhancing their descriptions with ESSIE rules.
+    """Transform existing tools by enhancing their descriptions with an ESSIE summary.
     
-    Gets the original 'studies' tool, creates an enhanced version with ESSIE guidelines
-    appended to the description, adds the enhanced tool, and disables the original.
+    Gets the original 'studies' tool, creates an enhanced version with a short ESSIE
+    summary and the guide's section index appended to the description, adds the
+    enhanced tool, and disables the original. The guide itself is served on demand
+    by :func:`servers.ct.essie_guide.register_guide`. Also adds
+    ``search_all_studies``, which pages through results on the server, and
+    ``multi_search_studies``, which runs query variants concurrently and merges them.
     
     :param app: FastMCP server instance with get_tool, add_tool methods
     :type app: Any
@@ -45,16 +296,14 @@ async def register_tools(app: Any) -> None:
         if not original_studies_tool:
             raise UnexpectedBehavior("Original 'studies' tool not found")
         
-        # Load ESSIE rules to append to description
-        essie_rules = load_essie_rules()
-        
-        # Create enhanced description by combining original with ESSIE rules
+        # Create enhanced description by combining original with the ESSIE summary
         original_description = getattr(original_studies_tool, 'description', '') or ""
         enhanced_description = (
             f"{original_description}\n\n"
-            f"{essie_rules}\n\n"
+            f"{ESSIE_SUMMARY}\n\n"
+            f"ESSIE guide sections:\n{get_essie_guide().index()}\n\n"
             "When composing queries you must follow these guidelines:\n"
-            "1. Only use the search fields, search areas, sections, modules and structs given above. "
+            "1. Only use the search fields, search areas, sections, modules and structs documented in the guide. "
             "Use full names and do not invent names.\n"
             "2. Use ESSIE search syntax for params that can accept that format except when doing free text searching.\n"
             "3. When filling out the fields parameter, use only fields, not modules."
@@ -69,6 +318,8 @@ async def register_tools(app: Any) -> None:
         
         # Add the enhanced tool to the server
         app.add_tool(enhanced_studies_tool)
+        app.add_tool(_paginated_studies_tool(original_studies_tool))
+        app.add_tool(_multi_search_tool(original_studies_tool))
         
         # Disable the original tool to avoid confusion
         original_studies_tool.disable()
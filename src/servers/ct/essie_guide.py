@@ -0,0 +1,176 @@
+"""ESSIE search guide served on demand.
+
+essie_gpt.md is parsed once into named sections (BNF, operators, data fields,
+search areas, examples, API parameters) plus field and search-area indexes.
+Call register_guide(app) to expose the sections as ``essie://guide/{section}``
+resources and the ``essie_guide`` lookup tool.
+"""
+
+from __future__ import annotations
+
+import functools
+import html
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from fastmcp.resources import TextResource
+from pydantic import AnyUrl
+
+from irmcp.docs import DocSection, section_index, split_markdown_sections
+
+# Heading prefix in essie_gpt.md -> short section name used by clients
+SECTION_NAMES: Dict[str, str] = {
+    "Query Syntax Grammar": "bnf",
+    "Query Language Elements": "operators",
+    "Study Data Fields": "data_fields",
+    "Search Areas": "search_areas",
+    "Examples": "examples",
+    "Addendum": "api_parameters",
+}
+
+_FIELD_BULLET = re.compile(r"^\* (\w+) \(([^)]*)\) [–-] (.+)$", re.MULTILINE)
+_AREA_BULLET = re.compile(r"^\* (\w+)(?: \([^)]*\))? [–-] (.+)$", re.MULTILINE)
+
+
+@dataclass(frozen=True)
+class FieldEntry:
+    """A study data field described in the guide.
+
+    :param name: Field name as used in ``AREA[...]``
+    :type name: str
+    :param type: Field type as documented (text, enumeration, ...)
+    :type type: str
+    :param description: Description, including enum values where listed
+    :type description: str
+    """
+
+    name: str
+    type: str
+    description: str
+
+    def render(self) -> str:
+        """Format the entry for a lookup response.
+
+        :returns: ``Name (type) – description``
+        :rtype: str
+        """
+        return f"{self.name} ({self.type}) – {self.description}"
+
+
+@dataclass
+class EssieGuide:
+    """Parsed ESSIE guide with section, field and search-area indexes."""
+
+    sections: Dict[str, DocSection] = field(default_factory=dict)
+    fields: Dict[str, FieldEntry] = field(default_factory=dict)
+    search_areas: Dict[str, str] = field(default_factory=dict)
+
+    def index(self) -> str:
+        """Render the section index shown in tool descriptions.
+
+        :returns: Markdown bullet list of section names and titles
+        :rtype: str
+        """
+        return section_index(self.sections)
+
+    def lookup(self, topic: str) -> Optional[str]:
+        """Resolve a section name, data field or search area to guide text.
+
+        Matching is case-insensitive and ignores an ``AREA[...]`` wrapper.
+
+        :param topic: Section name (e.g. ``bnf``), field (``OverallStatus``) or
+            search area (``ConditionSearch``)
+        :type topic: str
+        :returns: Matching text, or None when nothing matches
+        :rtype: Optional[str]
+        """
+        key = re.sub(r"^AREA\[(.*)\]$", r"\1", topic.strip(), flags=re.IGNORECASE).lower()
+        if key in self.sections:
+            return self.sections[key].text
+        if key in self.fields:
+            return self.fields[key].render()
+        if key in self.search_areas:
+            return self.search_areas[key]
+        return None
+
+
+def parse_essie_guide(text: str) -> EssieGuide:
+    """Parse the ESSIE guide markdown into an :class:`EssieGuide`.
+
+    :param text: Contents of essie_gpt.md
+    :type text: str
+    :returns: Indexed guide
+    :rtype: EssieGuide
+    """
+    guide = EssieGuide()
+    for section in split_markdown_sections(html.unescape(text)):
+        name = next((n for prefix, n in SECTION_NAMES.items() if section.title.startswith(prefix)), section.slug)
+        guide.sections[name] = DocSection(name, section.title, section.text)
+
+    if "data_fields" in guide.sections:
+        for m in _FIELD_BULLET.finditer(guide.sections["data_fields"].text):
+            entry = FieldEntry(m.group(1), m.group(2), m.group(3).strip())
+            guide.fields[entry.name.lower()] = entry
+    if "search_areas" in guide.sections:
+        for m in _AREA_BULLET.finditer(guide.sections["search_areas"].text):
+            area = m.group(1).lower()
+            line = m.group(0)[2:].strip()
+            # Areas appear in both the parameter list and the quick reference
+            guide.search_areas[area] = f"{guide.search_areas[area]}\n{line}" if area in guide.search_areas else line
+    return guide
+
+
+@functools.lru_cache(maxsize=1)
+def get_essie_guide() -> EssieGuide:
+    """Load and parse essie_gpt.md once per process.
+
+    :returns: Indexed guide; empty when the file is missing
+    :rtype: EssieGuide
+    """
+    rules_file = os.path.join(os.path.dirname(__file__), "essie_gpt.md")
+    try:
+        with open(rules_file, "r", encoding="utf-8") as f:
+            return parse_essie_guide(f.read())
+    except FileNotFoundError:
+        logging.warning("ClinicalTrials.gov study search guide file not found: %s", rules_file)
+        return EssieGuide()
+
+
+def register_guide(app: Any) -> None:
+    """Register guide sections as resources and the ``essie_guide`` lookup tool.
+
+    :param app: FastMCP server instance
+    :type app: Any
+    """
+    guide = get_essie_guide()
+
+    for name, section in guide.sections.items():
+        app.add_resource(
+            TextResource(
+                uri=AnyUrl(f"essie://guide/{name}"),
+                name=f"essie_{name}",
+                description=section.title,
+                mime_type="text/markdown",
+                text=section.text,
+            )
+        )
+
+    @app.tool(
+        name="essie_guide",
+        description=(
+            "Look up the ClinicalTrials.gov ESSIE query guide. Pass a section name, "
+            "a study data field (e.g. OverallStatus) or a search area (e.g. ConditionSearch).\n\n"
+            f"Sections:\n{guide.index()}"
+        ),
+    )
+    def essie_guide(topic: str) -> str:
+        result = guide.lookup(topic)
+        if result is None:
+            raise ValueError(
+                f"Unknown ESSIE guide topic {topic!r}. Use a section name "
+                f"({', '.join(guide.sections)}), a data field or a search area."
+            )
+        return result
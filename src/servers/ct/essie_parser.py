@@ -0,0 +1,578 @@
+"""Local ESSIE parser and validator for ClinicalTrials.gov search parameters.
+
+:func:`parse` turns an ESSIE expression into a small AST following the BNF in
+essie_gpt.md and raises :class:`EssieError` with the offending position for
+syntax errors (unbalanced parentheses, dangling AND/OR/NOT, unterminated
+quotes, SEARCH[...] without a group, malformed RANGE[...]). :func:`check_query`
+also validates AREA/TILT field names against a :class:`Vocabulary` and the
+EXPANSION/COVERAGE/SEARCH values, and applies fixes that have exactly one
+reading (field-name case, MIN/MAX case, unitless ages such as ``RANGE[66, MAX]``
+on MinimumAge/MaximumAge become ``66 years``). Fixes are spliced into the
+original text so the rest of the query is passed on byte for byte.
+
+:class:`EssieValidationMiddleware` runs the check on the ``query.*`` and
+``*.advanced`` arguments of the study search tools so malformed queries fail
+before the upstream round trip. See benchmarks/bench_essie.py for its cost.
+"""
+
+from __future__ import annotations
+
+import difflib
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+import mcp.types
+from fastmcp.exceptions import ToolError
+from fastmcp.server.middleware import CallNext, Middleware, MiddlewareContext
+from fastmcp.tools.tool import ToolResult
+
+from irmcp.metrics import REGISTRY
+from servers.ct.ct_metadata import FieldIndex, MetadataStore
+from servers.ct.essie_guide import EssieGuide, get_essie_guide
+
+logger = logging.getLogger(__name__)
+
+# Allowed arguments of the bracketed operators (canonical spelling)
+EXPANSION_VALUES = ("None", "Term", "Concept", "Relaxation", "Lossy")
+COVERAGE_VALUES = ("FullMatch", "StartsWith", "EndsWith", "Contains")
+SEARCH_CONTEXTS = ("Study", "Location")
+# Tools whose ESSIE arguments are checked before the call
+ESSIE_TOOLS = ("search_studies", "search_all_studies", "multi_search_studies", "screen_studies")
+ADVANCED_PARAMS = ("filter.advanced", "postFilter.advanced")
+# multi_search_studies arguments holding one ESSIE expression per entry
+LIST_PARAMS = ("conditions", "locations")
+
+ESSIE_CHECKS = REGISTRY.counter(
+    "irmcp_essie_checks_total", "ESSIE arguments checked locally by outcome", ("tool", "outcome")
+)
+
+_OPERATORS = ("AREA", "SEARCH", "RANGE", "EXPANSION", "COVERAGE", "TILT")
+_TOKEN = re.compile(
+    r'\s*(?:(?P<op>AREA|SEARCH|RANGE|EXPANSION|COVERAGE|TILT)\[(?P<arg>[^\]]*)\]'
+    r'|(?P<paren>[()])|"(?P<phrase>[^"]*)"|(?P<word>[^\s()"]+))'
+)
+_UNCLOSED_OPERATOR = re.compile(r"(?:%s)\[" % "|".join(_OPERATORS))
+_AGE_FIELDS = frozenset({"minimumage", "maximumage"})
+_NUMBER = re.compile(r"^\d+(?:\.\d+)?$")
+_AGE = re.compile(r"^\d+(?:\.\d+)?\s*(?:year|month|week|day|hour|minute)s?$", re.IGNORECASE)
+_DATE = re.compile(r"^(?:\d{4}(?:-\d{2}(?:-\d{2})?)?|\d{1,2}/\d{1,2}/\d{4})$")
+
+
+class EssieError(ValueError):
+    """An ESSIE expression is malformed or names an unknown field.
+
+    :param message: What is wrong
+    :type message: str
+    :param text: The expression
+    :type text: str
+    :param position: Character offset of the problem in ``text``
+    :type position: int
+    """
+
+    def __init__(self, message: str, text: str, position: int) -> None:
+        excerpt = text if len(text) <= 60 else text[max(0, position - 30) : position + 30]
+        super().__init__(f"{message} at position {position} in {excerpt!r}")
+        self.message = message
+        self.text = text
+        self.position = position
+
+
+# ---------------------------------------------------------------------------
+# AST
+# ---------------------------------------------------------------------------
+
+@dataclass(slots=True)
+class Term:
+    """A search term or quoted phrase."""
+
+    text: str
+    quoted: bool
+    pos: int
+
+
+@dataclass(slots=True)
+class Range:
+    """``RANGE[low, high]``; ``span`` covers the text between the brackets."""
+
+    low: str
+    high: str
+    pos: int
+    span: Tuple[int, int]
+
+
+@dataclass(slots=True)
+class Missing:
+    """``MISSING`` inside an ``AREA[...]``."""
+
+    pos: int
+
+
+@dataclass(slots=True)
+class All:
+    """``ALL``: every study."""
+
+    pos: int
+
+
+@dataclass(slots=True)
+class Area:
+    """``AREA[name]`` scoping ``child`` to a field or search area."""
+
+    name: str
+    child: "Node"
+    pos: int
+    span: Tuple[int, int]
+
+
+@dataclass(slots=True)
+class Search:
+    """``SEARCH[context](...)``."""
+
+    context: str
+    child: "Node"
+    pos: int
+    span: Tuple[int, int]
+
+
+@dataclass(slots=True)
+class Unary:
+    """``NOT``, ``EXPANSION[...]``, ``COVERAGE[...]`` or ``TILT[...]`` applied to ``child``.
+
+    ``arg`` and ``span`` are empty for ``NOT``.
+    """
+
+    op: str
+    arg: str
+    child: "Node"
+    pos: int
+    span: Tuple[int, int] = (0, 0)
+
+
+@dataclass(slots=True)
+class Bool:
+    """``AND`` (including adjacent terms) or ``OR`` over two or more children."""
+
+    op: str
+    children: List["Node"]
+    pos: int
+
+
+Node = Union[Term, Range, Missing, All, Area, Search, Unary, Bool]
+
+# kind, value, operator argument, position, argument position
+_Token = Tuple[str, str, str, int, int]
+
+
+def _tokenize(text: str) -> List[_Token]:
+    tokens: List[_Token] = []
+    pos = 0
+    end = len(text.rstrip())
+    while pos < end:
+        m = _TOKEN.match(text, pos)
+        if m is None:
+            # Words exclude '"', so only an unpaired quote fails to match
+            raise EssieError("unterminated quote", text, text.index('"', pos))
+        kind = m.lastgroup or ""
+        start = m.start(kind)
+        if kind == "arg":
+            if "[" in m.group("arg"):
+                raise EssieError(f"missing ']' after {m.group('op')}[", text, m.start("op"))
+            tokens.append(("op", m.group("op"), m.group("arg"), m.start("op"), start))
+        else:
+            tokens.append((kind, m.group(kind), "", start, start))
+        pos = m.end()
+    tokens.append(("end", "", "", end, end))
+    return tokens
+
+
+class _Parser:
+    """Recursive descent over the ESSIE BNF; adjacent operands are ANDed."""
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.tokens = _tokenize(text)
+        self.pos = 0
+        # Nesting depth of AREA[...]; RANGE and MISSING need a field
+        self.scoped = 0
+
+    def error(self, message: str, position: int) -> EssieError:
+        return EssieError(message, self.text, position)
+
+    def parse(self) -> Node:
+        if self.tokens[0][0] == "end":
+            raise self.error("empty expression", 0)
+        node = self._or()
+        kind, value, _, pos, _ = self.tokens[self.pos]
+        if kind != "end":
+            raise self.error("unmatched ')'" if value == ")" else f"unexpected {value!r}", pos)
+        return node
+
+    def _at_boundary(self) -> bool:
+        kind, value, _, _, _ = self.tokens[self.pos]
+        return kind == "end" or (kind == "paren" and value == ")") or (kind == "word" and value in ("AND", "OR"))
+
+    def _or(self) -> Node:
+        start = self.tokens[self.pos][3]
+        parts = [self._and()]
+        while self.tokens[self.pos][:2] == ("word", "OR"):
+            self.pos += 1
+            parts.append(self._and())
+        return parts[0] if len(parts) == 1 else Bool("OR", parts, start)
+
+    def _and(self) -> Node:
+        start = self.tokens[self.pos][3]
+        parts = [self._unary()]
+        while True:
+            kind, value, _, _, _ = self.tokens[self.pos]
+            if kind == "end" or (kind, value) in (("word", "OR"), ("paren", ")")):
+                break
+            if (kind, value) == ("word", "AND"):
+                self.pos += 1
+            parts.append(self._unary())
+        return parts[0] if len(parts) == 1 else Bool("AND", parts, start)
+
+    def _unary(self) -> Node:
+        kind, value, arg, pos, arg_pos = self.tokens[self.pos]
+        if self._at_boundary():
+            if kind == "end":
+                previous = self.tokens[self.pos - 1] if self.pos else None
+                if previous is not None and previous[0] in ("word", "op"):
+                    raise self.error(f"{previous[1]} has nothing after it", previous[3])
+                raise self.error("expected a term", pos)
+            if kind == "paren":
+                raise self.error("empty parentheses" if self._previous_is("(") else "expected a term before ')'", pos)
+            raise self.error(f"{value} needs a term on both sides", pos)
+        span = (arg_pos, arg_pos + len(arg))
+        if (kind, value) == ("word", "NOT"):
+            self.pos += 1
+            return Unary("NOT", "", self._operand("NOT", pos), pos)
+        if kind != "op" or value == "RANGE":
+            return self._primary()
+        self.pos += 1
+        if value == "SEARCH":
+            if self.tokens[self.pos][:2] != ("paren", "("):
+                raise self.error(f"SEARCH[{arg}] must be followed by a parenthesized expression", pos)
+            return Search(arg.strip(), self._primary(), pos, span)
+        if value == "AREA":
+            self.scoped += 1
+            try:
+                return Area(arg.strip(), self._operand(f"AREA[{arg}]", pos), pos, span)
+            finally:
+                self.scoped -= 1
+        return Unary(value, arg.strip(), self._operand(f"{value}[{arg}]", pos), pos, span)
+
+    def _previous_is(self, value: str) -> bool:
+        return self.pos > 0 and self.tokens[self.pos - 1][1] == value
+
+    def _operand(self, operator: str, pos: int) -> Node:
+        if self._at_boundary():
+            raise self.error(f"{operator} has nothing after it", pos)
+        return self._unary()
+
+    def _primary(self) -> Node:
+        kind, value, arg, pos, arg_pos = self.tokens[self.pos]
+        self.pos += 1
+        if kind == "paren":
+            # "(" -- ")" is caught by _at_boundary
+            node = self._or()
+            if self.tokens[self.pos][:2] != ("paren", ")"):
+                raise self.error("unclosed '('", pos)
+            self.pos += 1
+            return node
+        if kind == "op":
+            if not self.scoped:
+                raise self.error("RANGE[...] must follow AREA[Field]", pos)
+            bounds = arg.split(",")
+            if len(bounds) != 2 or not all(b.strip() for b in bounds):
+                raise self.error(f"RANGE needs two bounds, e.g. RANGE[low, high], not RANGE[{arg}]", pos)
+            return Range(bounds[0].strip(), bounds[1].strip(), pos, (arg_pos, arg_pos + len(arg)))
+        if kind == "phrase":
+            return Term(value, True, pos)
+        if value == "ALL":
+            return All(pos)
+        if value == "MISSING" and self.scoped:
+            return Missing(pos)
+        if _UNCLOSED_OPERATOR.match(value):
+            raise self.error(f"missing ']' after {value[: value.index('[') + 1]}", pos)
+        return Term(value, False, pos)
+
+
+def parse(text: str) -> Node:
+    """Parse an ESSIE expression.
+
+    :param text: ESSIE expression
+    :type text: str
+    :returns: Root node
+    :rtype: Node
+    :raises EssieError: On a syntax error, with the offending position
+    """
+    return _Parser(text).parse()
+
+
+# ---------------------------------------------------------------------------
+# Validation and normalization
+# ---------------------------------------------------------------------------
+
+@dataclass
+class Vocabulary:
+    """Field and search-area names accepted in ``AREA[...]`` and ``TILT[...]``.
+
+    :param names: Lowercase name mapped to its canonical spelling
+    :type names: dict[str, str]
+    :param strict: Reject unknown names. Without a complete list (no metadata
+        snapshot) unknown names are let through and only the case is fixed.
+    :type strict: bool
+    """
+
+    names: Dict[str, str] = field(default_factory=dict)
+    strict: bool = True
+
+    @classmethod
+    def from_field_index(cls, index: FieldIndex) -> "Vocabulary":
+        """Build a strict vocabulary from a metadata snapshot's field index."""
+        names = {key: info.piece for key, info in index.fields.items()}
+        names.update(index.areas)
+        return cls(names, strict=True)
+
+    @classmethod
+    def from_guide(cls, guide: EssieGuide) -> "Vocabulary":
+        """Build a lenient vocabulary from the fields and areas in essie_gpt.md."""
+        names = {key: entry.name for key, entry in guide.fields.items()}
+        names.update({key: line.split()[0] for key, line in guide.search_areas.items()})
+        return cls(names, strict=False)
+
+    def canonical(self, name: str) -> Optional[str]:
+        """Return the canonical spelling of ``name``, or None when unknown."""
+        return self.names.get(name.lower())
+
+    def suggest(self, name: str, limit: int = 3) -> List[str]:
+        """Return known names close to ``name``, best match first."""
+        matches = difflib.get_close_matches(name.lower(), list(self.names), n=limit, cutoff=0.75)
+        return list(dict.fromkeys(self.names[m] for m in matches))
+
+
+@dataclass
+class CheckedQuery:
+    """Result of :func:`check_query`.
+
+    :param text: Expression to send, with fixes applied
+    :type text: str
+    :param fixes: Human-readable description of each fix
+    :type fixes: list[str]
+    """
+
+    text: str
+    fixes: List[str] = field(default_factory=list)
+
+
+class _Checker:
+    def __init__(self, text: str, vocabulary: Optional[Vocabulary]) -> None:
+        self.text = text
+        self.vocabulary = vocabulary
+        self.edits: List[Tuple[int, int, str]] = []
+        self.fixes: List[str] = []
+
+    def _replace(self, span: Tuple[int, int], new: str, note: str) -> None:
+        self.edits.append((span[0], span[1], new))
+        self.fixes.append(note)
+
+    def _choice(self, node: Union[Search, Unary], value: str, allowed: Sequence[str]) -> None:
+        for option in allowed:
+            if value == option:
+                return
+            if value.lower() == option.lower():
+                self._replace(node.span, option, f"{value} -> {option}")
+                return
+        operator = "SEARCH" if isinstance(node, Search) else node.op
+        raise EssieError(f"{operator}[{value}] must be one of {', '.join(allowed)}", self.text, node.pos)
+
+    def _field(self, node: Union[Area, Unary], name: str) -> str:
+        operator = "AREA" if isinstance(node, Area) else node.op
+        if not name:
+            raise EssieError(f"{operator}[] needs a field name", self.text, node.pos)
+        if self.vocabulary is None:
+            return name
+        canonical = self.vocabulary.canonical(name)
+        if canonical is None:
+            if not self.vocabulary.strict:
+                return name
+            hint = self.vocabulary.suggest(name)
+            message = f"unknown field or search area {operator}[{name}]"
+            if hint:
+                message += f"; did you mean {' or '.join(hint)}?"
+            raise EssieError(message, self.text, node.pos)
+        if canonical != name and canonical.lower() == name.lower():
+            self._replace(node.span, canonical, f"{name} -> {canonical}")
+            return canonical
+        return name
+
+    def _range(self, node: Range, area: str) -> None:
+        key = area.lower()
+        bounds = []
+        changed = False
+        for bound, open_value in ((node.low, "MIN"), (node.high, "MAX")):
+            if bound.upper() == open_value:
+                changed |= bound != open_value
+                bounds.append(open_value)
+            elif key in _AGE_FIELDS and _NUMBER.match(bound):
+                changed = True
+                bounds.append(f"{bound} years")
+            elif key in _AGE_FIELDS and not _AGE.match(bound):
+                raise EssieError(f"age {bound!r} in AREA[{area}] needs a unit, e.g. '18 years'", self.text, node.pos)
+            elif key.endswith("date") and not _DATE.match(bound):
+                raise EssieError(
+                    f"date {bound!r} in AREA[{area}] must be YYYY, YYYY-MM, YYYY-MM-DD or MM/DD/YYYY",
+                    self.text,
+                    node.pos,
+                )
+            else:
+                bounds.append(bound)
+        if changed:
+            new = f"{bounds[0]}, {bounds[1]}"
+            self._replace(node.span, new, f"RANGE[{node.low}, {node.high}] -> RANGE[{new}]")
+
+    def visit(self, node: Node, area: str) -> None:
+        if isinstance(node, Bool):
+            for child in node.children:
+                self.visit(child, area)
+        elif isinstance(node, Area):
+            self.visit(node.child, self._field(node, node.name))
+        elif isinstance(node, Search):
+            self._choice(node, node.context, SEARCH_CONTEXTS)
+            self.visit(node.child, area)
+        elif isinstance(node, Unary):
+            if node.op == "EXPANSION":
+                self._choice(node, node.arg, EXPANSION_VALUES)
+            elif node.op == "COVERAGE":
+                self._choice(node, node.arg, COVERAGE_VALUES)
+            elif node.op == "TILT":
+                self._field(node, node.arg)
+            self.visit(node.child, area)
+        elif isinstance(node, Range):
+            self._range(node, area)
+
+    def result(self) -> CheckedQuery:
+        text = self.text
+        for start, end, new in sorted(self.edits, reverse=True):
+            text = text[:start] + new + text[end:]
+        return CheckedQuery(text, self.fixes)
+
+
+def check_query(text: str, vocabulary: Optional[Vocabulary] = None) -> CheckedQuery:
+    """Parse, validate and normalize one ESSIE expression.
+
+    :param text: ESSIE expression
+    :type text: str
+    :param vocabulary: Known field and search-area names; None skips name checks
+    :type vocabulary: Optional[Vocabulary]
+    :returns: Expression to send and the fixes applied to it
+    :rtype: CheckedQuery
+    :raises EssieError: If the expression is malformed or names an unknown field
+    """
+    checker = _Checker(text, vocabulary)
+    checker.visit(parse(text), "")
+    return checker.result()
+
+
+def is_essie_param(name: str) -> bool:
+    """Whether a listStudies parameter takes an ESSIE expression."""
+    return name.startswith("query.") or name in ADVANCED_PARAMS
+
+
+def check_arguments(
+    arguments: Mapping[str, Any], vocabulary: Optional[Vocabulary] = None
+) -> Tuple[Dict[str, Any], List[str]]:
+    """Check every ESSIE argument of a search call.
+
+    :param arguments: Tool arguments
+    :type arguments: Mapping[str, Any]
+    :param vocabulary: Known field and search-area names
+    :type vocabulary: Optional[Vocabulary]
+    :returns: Arguments with fixes applied, and the fixes as ``param: fix``
+    :rtype: tuple[dict[str, Any], list[str]]
+    :raises ValueError: Naming the parameter and the problem
+    """
+    checked = dict(arguments)
+    fixes: List[str] = []
+
+    def check(name: str, value: Any) -> Any:
+        if not isinstance(value, str) or not value.strip():
+            return value
+        try:
+            result = check_query(value, vocabulary)
+        except EssieError as e:
+            raise ValueError(f"Invalid ESSIE expression in {name}: {e}") from None
+        fixes.extend(f"{name}: {fix}" for fix in result.fixes)
+        return result.text
+
+    for name, value in arguments.items():
+        if is_essie_param(name):
+            checked[name] = check(name, value)
+        elif name in LIST_PARAMS and isinstance(value, list):
+            checked[name] = [check(f"{name}[{i}]", item) for i, item in enumerate(value)]
+    return checked, fixes
+
+
+class EssieValidationMiddleware(Middleware):
+    """Reject or normalize ESSIE arguments of the study search tools before they run.
+
+    :param vocabulary: Returns the current vocabulary (it may change with the
+        metadata snapshot)
+    :type vocabulary: Callable[[], Optional[Vocabulary]]
+    :param tools: Tool names to check
+    :type tools: Iterable[str]
+    """
+
+    def __init__(self, vocabulary: Callable[[], Optional[Vocabulary]], tools: Iterable[str] = ESSIE_TOOLS) -> None:
+        self.vocabulary = vocabulary
+        self.tools = frozenset(tools)
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next: CallNext) -> ToolResult:
+        name = context.message.name
+        if name not in self.tools or not context.message.arguments:
+            return await call_next(context)
+        try:
+            arguments, fixes = check_arguments(context.message.arguments, self.vocabulary())
+        except ValueError as e:
+            ESSIE_CHECKS.inc(name, "rejected")
+            raise ToolError(f"{e}. Nothing was sent to ClinicalTrials.gov; fix the query and retry.") from None
+        if not fixes:
+            ESSIE_CHECKS.inc(name, "ok")
+            return await call_next(context)
+        ESSIE_CHECKS.inc(name, "normalized")
+        logger.info("normalized %s arguments: %s", name, "; ".join(fixes))
+        message = mcp.types.CallToolRequestParams(name=name, arguments=arguments)
+        return await call_next(context.copy(message=message))
+
+
+def register_essie_validation(app: Any, store: Optional[MetadataStore] = None) -> EssieValidationMiddleware:
+    """Check ESSIE arguments of the study search tools (:data:`ESSIE_TOOLS`) locally.
+
+    Field names are checked against the metadata snapshot when ``store`` has
+    one, otherwise against the fields and areas listed in essie_gpt.md (case
+    fixes only).
+
+    :param app: FastMCP server instance
+    :type app: Any
+    :param store: Metadata snapshot store
+    :type store: Optional[MetadataStore]
+    :returns: The installed middleware
+    :rtype: EssieValidationMiddleware
+    """
+    fallback = Vocabulary.from_guide(get_essie_guide())
+    # Rebuilt only when the snapshot (and so its field index) is replaced
+    cached: List[Tuple[FieldIndex, Vocabulary]] = []
+
+    def vocabulary() -> Vocabulary:
+        index = store.fields if store is not None else None
+        if index is None:
+            return fallback
+        if not cached or cached[0][0] is not index:
+            cached[:] = [(index, Vocabulary.from_field_index(index))]
+        return cached[0][1]
+
+    middleware = EssieValidationMiddleware(vocabulary)
+    app.add_middleware(middleware)
+    return middleware
@@ -0,0 +1,216 @@
+"""Single-process MCP gateway serving every server package over streamable HTTP.
+
+Discovers ``create_*_server`` coroutines in ``*_server`` modules under
+:mod:`servers`, builds them once, and mounts each under its app name (tools
+become ``clinical-trials_search_studies``, ``pubchem_Get_compound_properties``,
+...). All MCP sessions share each server's HTTP client, connection pool and
+response cache.
+
+Run with ``python -m servers.gateway``; ``--workers N`` starts N uvicorn worker
+processes behind one port. Workers do not share session state, so multi-worker
+mode serves stateless HTTP. Prometheus metrics for all servers are served at
+``/metrics`` next to the MCP endpoint.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib
+import inspect
+import logging
+import os
+import pkgutil
+from contextlib import AsyncExitStack
+from typing import Any, Awaitable, Callable, Dict, List, MutableMapping, Optional, Sequence
+
+from fastmcp import FastMCP
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+
+import servers
+from irmcp.metrics import REGISTRY
+from irmcp.server import managed_http_clients, warm_up
+
+logger = logging.getLogger(__name__)
+
+ServerFactory = Callable[[], Awaitable[FastMCP]]
+Scope = MutableMapping[str, Any]
+Message = MutableMapping[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+
+DEFAULT_HOST: str = os.environ.get("GATEWAY_HOST", "127.0.0.1")
+DEFAULT_PORT: int = int(os.environ.get("GATEWAY_PORT", "8000"))
+DEFAULT_PATH: str = os.environ.get("GATEWAY_PATH", "/mcp")
+DEFAULT_WORKERS: int = int(os.environ.get("GATEWAY_WORKERS", "1"))
+
+
+def discover_server_factories(package: Any = servers) -> Dict[str, ServerFactory]:
+    """Find server factories in the subpackages of ``package``.
+
+    A factory is a coroutine function named ``create_*_server`` defined in a
+    module whose name ends in ``_server``.
+
+    :param package: Package whose subpackages hold servers
+    :type package: module
+    :returns: Module names (e.g. ``ct_server``) mapped to factories
+    :rtype: dict[str, Callable[[], Awaitable[FastMCP]]]
+    """
+    factories: Dict[str, ServerFactory] = {}
+    for sub in pkgutil.iter_modules(package.__path__):
+        if not sub.ispkg:
+            continue
+        subpackage = importlib.import_module(f"{package.__name__}.{sub.name}")
+        for mod in pkgutil.iter_modules(subpackage.__path__):
+            if not mod.name.endswith("_server"):
+                continue
+            module = importlib.import_module(f"{subpackage.__name__}.{mod.name}")
+            for name, obj in vars(module).items():
+                if (
+                    name.startswith("create_")
+                    and name.endswith("_server")
+                    and inspect.iscoroutinefunction(obj)
+                    and obj.__module__ == module.__name__
+                ):
+                    factories[mod.name] = obj
+    return factories
+
+
+async def create_gateway(names: Optional[Sequence[str]] = None) -> FastMCP:
+    """Build every (or the named) server and mount them into one FastMCP app.
+
+    :param names: Server module names to include; defaults to GATEWAY_SERVERS
+        (comma-separated) or all discovered servers
+    :type names: Optional[Sequence[str]]
+    :returns: Gateway server
+    :rtype: fastmcp.FastMCP
+    :raises ValueError: If a requested server does not exist
+    """
+    factories = discover_server_factories()
+    if names is None:
+        selected = os.environ.get("GATEWAY_SERVERS", "")
+        names = [n.strip() for n in selected.split(",") if n.strip()] or list(factories)
+    unknown = sorted(set(names) - factories.keys())
+    if unknown:
+        raise ValueError(f"Unknown servers {unknown}; available: {sorted(factories)}")
+
+    apps: List[FastMCP] = await asyncio.gather(*(factories[name]() for name in names))
+    gateway: FastMCP = FastMCP(name="irmcp-gateway")
+    for app in apps:
+        gateway.mount(app, prefix=app.name)
+        logger.info("mounted %s", app.name)
+
+    @gateway.custom_route("/metrics", methods=["GET"])
+    async def metrics(request: Request) -> PlainTextResponse:
+        return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+    return gateway
+
+
+class GatewayASGI:
+    """ASGI app that builds the gateway during lifespan startup.
+
+    Server construction is async, but uvicorn app factories are called
+    synchronously inside the worker's event loop. This wrapper defers the build
+    to the first lifespan message and then hands the lifespan and all requests
+    to the gateway's streamable HTTP app. The servers' HTTP clients are created
+    on the worker's loop, pre-warmed in the background after startup, and closed
+    before shutdown completes.
+
+    :param path: URL path of the MCP endpoint
+    :type path: str
+    :param stateless: Serve stateless HTTP (no per-session state between requests)
+    :type stateless: bool
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, stateless: bool = False) -> None:
+        self.path = path
+        self.stateless = stateless
+        self._app: Optional[Callable[[Scope, Receive, Send], Awaitable[None]]] = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan" and self._app is None:
+            startup = await receive()
+            clients = AsyncExitStack()
+            try:
+                managed = await clients.enter_async_context(managed_http_clients())
+                gateway = await create_gateway()
+                self._app = gateway.http_app(path=self.path, stateless_http=self.stateless)
+            except Exception as e:
+                logger.exception("gateway startup failed")
+                await clients.aclose()
+                await send({"type": "lifespan.startup.failed", "message": str(e)})
+                return
+            replay = [startup]
+            warming = asyncio.create_task(warm_up(managed))
+
+            async def receive_again() -> Message:
+                return replay.pop() if replay else await receive()
+
+            async def send_closing(message: Message) -> None:
+                if message["type"] == "lifespan.shutdown.complete":
+                    warming.cancel()
+                    await clients.aclose()
+                await send(message)
+
+            try:
+                await self._app(scope, receive_again, send_closing)
+            finally:
+                warming.cancel()
+                await clients.aclose()
+            return
+        if self._app is None:
+            raise RuntimeError("gateway used before lifespan startup")
+        await self._app(scope, receive, send)
+
+
+def create_asgi_app() -> GatewayASGI:
+    """uvicorn factory: one :class:`GatewayASGI` per worker process.
+
+    Reads GATEWAY_PATH and GATEWAY_STATELESS (set by :func:`main` for multi-worker runs).
+
+    :returns: Lazily built gateway ASGI app
+    :rtype: GatewayASGI
+    """
+    stateless = os.environ.get("GATEWAY_STATELESS", "").lower() in ("1", "true", "yes")
+    return GatewayASGI(os.environ.get("GATEWAY_PATH", DEFAULT_PATH), stateless)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Entry point: serve all servers over streamable HTTP with uvicorn.
+
+    :param argv: Command-line arguments (defaults to ``sys.argv[1:]``)
+    :type argv: Optional[Sequence[str]]
+    :returns: Nothing. Blocks the current process running the gateway.
+    :rtype: None
+    """
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--path", default=DEFAULT_PATH)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--servers", help="comma-separated server modules (default: all)")
+    parser.add_argument("--stateless", action="store_true", help="serve stateless HTTP")
+    args = parser.parse_args(argv)
+
+    # Worker processes rebuild the app from the environment
+    os.environ["GATEWAY_PATH"] = args.path
+    if args.servers:
+        os.environ["GATEWAY_SERVERS"] = args.servers
+    if args.stateless or args.workers > 1:
+        os.environ["GATEWAY_STATELESS"] = "1"
+    uvicorn.run(
+        "servers.gateway:create_asgi_app",
+        factory=True,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        lifespan="on",
+    )
+
+
+if __name__ == "__main__":
+    main()
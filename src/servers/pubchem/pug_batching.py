@@ -0,0 +1,363 @@
+"""Request coalescing for per-CID PubChem lookups.
+
+PubChem's ``/compound/cid/{cids}/property/{properties}/JSON`` and
+``/compound/cid/{cids}/synonyms/JSON`` accept comma-separated CID lists.
+:class:`CidBatchingTransport` collects such requests that arrive within a short
+window with the same properties, format and query string, sends one multi-CID
+request, and splits the ``PropertyTable``/``InformationList`` back per caller.
+
+The opposite problem, one request naming thousands of CIDs (typically the hits
+of a structure search), is handled by :class:`CidChunkingTransport`: such a
+list would overflow URL length limits and PubChem's per-request limits, so it
+is sent as ``cid=`` POST bodies of bounded size, concurrently under the
+scheduler's rate limit, and the JSON results are merged in request order.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import httpx
+
+from irmcp.cache import buffer_response
+from irmcp.deadline import without_deadline
+from irmcp.scheduler import IDEMPOTENT_EXTENSION
+
+logger = logging.getLogger(__name__)
+
+_CID_PATH = re.compile(r"^(?P<prefix>.*/compound/cid/)(?P<cids>[^/]+)(?P<suffix>/(?:property/[^/]+|synonyms)/JSON)$")
+
+# Response envelope and record list for each batchable operation
+_RECORDS: Dict[str, Tuple[str, str]] = {
+    "property": ("PropertyTable", "Properties"),
+    "synonyms": ("InformationList", "Information"),
+}
+
+# Any operation on a CID list, e.g. ``/compound/cid/{cids}/property/{properties}/JSON``
+_CID_LIST_PATH = re.compile(r"^(?P<prefix>.*/compound/cid/)(?P<cids>[^/]+)/(?P<operation>.+)$")
+
+# Record lists that chunked JSON responses are concatenated along
+_MERGE_PATHS: Tuple[Tuple[str, ...], ...] = (
+    ("PropertyTable", "Properties"),
+    ("InformationList", "Information"),
+    ("IdentifierList", "CID"),
+    ("PC_Compounds",),
+)
+
+BatchKey = Tuple[str, str, str]
+
+
+def parse_cids(segment: str) -> Optional[List[int]]:
+    """Parse a comma-separated CID path segment.
+
+    :param segment: Path segment such as ``"2244,5793"``
+    :type segment: str
+    :returns: CIDs in request order, or None if any entry is not an integer
+    :rtype: Optional[list[int]]
+    """
+    parts = [p.strip() for p in segment.split(",")]
+    if not parts or not all(p.isdigit() for p in parts):
+        return None
+    return [int(p) for p in parts]
+
+
+def split_records(payload: Dict[str, Any], cids: List[int]) -> Optional[Dict[str, Any]]:
+    """Select one caller's records from a batched PubChem response.
+
+    :param payload: Parsed batched response (``PropertyTable`` or ``InformationList``)
+    :type payload: dict[str, Any]
+    :param cids: The caller's CIDs, in the order they asked for them
+    :type cids: list[int]
+    :returns: Response of the same shape containing only those CIDs, or None if
+        none of them are present
+    :rtype: Optional[dict[str, Any]]
+    """
+    for envelope, records_key in _RECORDS.values():
+        if envelope in payload:
+            by_cid: Dict[int, List[Any]] = {}
+            for record in payload[envelope].get(records_key, []):
+                by_cid.setdefault(record.get("CID"), []).append(record)
+            records = [r for cid in dict.fromkeys(cids) for r in by_cid.get(cid, [])]
+            if not records:
+                return None
+            return {envelope: {**payload[envelope], records_key: records}}
+    return None
+
+
+def merge_records(payloads: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Concatenate the record lists of PubChem JSON responses to chunks of one request.
+
+    :param payloads: Parsed chunk responses, in chunk order
+    :type payloads: list[dict[str, Any]]
+    :returns: The first response with its record list extended by the others',
+        or None if the responses have no known record list
+    :rtype: Optional[dict[str, Any]]
+    """
+    for path in _MERGE_PATHS:
+        *envelope, records_key = path
+        containers = []
+        for payload in payloads:
+            container: Any = payload
+            for key in envelope:
+                container = container.get(key) if isinstance(container, dict) else None
+            if not isinstance(container, dict) or not isinstance(container.get(records_key), list):
+                break
+            containers.append(container)
+        else:
+            records = [record for container in containers for record in container[records_key]]
+            merged: Dict[str, Any] = {**containers[0], records_key: records}
+            for key in reversed(envelope):
+                merged = {key: merged}
+            return {**payloads[0], **merged}
+    return None
+
+
+@dataclass
+class _Waiter:
+    request: httpx.Request
+    cids: List[int]
+    future: "asyncio.Future[httpx.Response]"
+
+
+@dataclass
+class _Batch:
+    prefix: str
+    suffix: str
+    waiters: List[_Waiter] = field(default_factory=list)
+    cids: Dict[int, None] = field(default_factory=dict)
+
+
+class CidBatchingTransport(httpx.AsyncBaseTransport):
+    """Transport that coalesces concurrent per-CID property and synonym lookups.
+
+    :param transport: Wrapped transport that performs real requests
+    :type transport: httpx.AsyncBaseTransport
+    :param window: Seconds to wait for more lookups before sending a batch
+    :type window: float
+    :param max_batch_size: Maximum distinct CIDs per upstream request
+    :type max_batch_size: int
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, window: float = 0.02, max_batch_size: int = 100) -> None:
+        self._transport = transport
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.upstream_requests = 0
+        self._open: Dict[BatchKey, _Batch] = {}
+        self._tasks: Set["asyncio.Task[None]"] = set()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """Join a batch for batchable CID lookups, otherwise forward directly.
+
+        :param request: Outgoing request
+        :type request: httpx.Request
+        :returns: Response containing only this request's CIDs
+        :rtype: httpx.Response
+        """
+        match = _CID_PATH.match(request.url.path) if request.method == "GET" else None
+        cids = parse_cids(match["cids"]) if match else None
+        if match is None or cids is None or len(cids) >= self.max_batch_size:
+            self.upstream_requests += 1
+            return await self._transport.handle_async_request(request)
+
+        key: BatchKey = (match["prefix"], match["suffix"], str(request.url.query, "ascii"))
+        batch = self._open.get(key)
+        if batch is not None and len(batch.cids.keys() | set(cids)) > self.max_batch_size:
+            self._flush(key)
+            batch = None
+        if batch is None:
+            batch = self._open[key] = _Batch(match["prefix"], match["suffix"])
+            asyncio.get_running_loop().call_later(self.window, self._flush, key, batch)
+
+        waiter = _Waiter(request, cids, asyncio.get_running_loop().create_future())
+        batch.waiters.append(waiter)
+        batch.cids.update(dict.fromkeys(cids))
+        if len(batch.cids) >= self.max_batch_size:
+            self._flush(key)
+        # Shield so one caller giving up does not fail the shared batch
+        return await asyncio.shield(waiter.future)
+
+    def _flush(self, key: BatchKey, batch: Optional[_Batch] = None) -> None:
+        """Close the open batch for ``key`` and send it in the background.
+
+        :param key: Batch key
+        :type key: tuple[str, str, str]
+        :param batch: When given (timer callback), only flush if still the open batch
+        :type batch: Optional[_Batch]
+        """
+        current = self._open.get(key)
+        if current is None or (batch is not None and batch is not current):
+            return
+        del self._open[key]
+        # The batch serves several callers, so no single caller's deadline applies
+        task = asyncio.get_running_loop().create_task(self._send(current), context=without_deadline())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: _Batch) -> None:
+        """Send one multi-CID request and resolve each waiter with its share.
+
+        If the batched request fails with an HTTP error or returns a body that
+        cannot be split, and covers more than one caller, each caller's original
+        request is retried on its own so one bad CID list cannot fail the others.
+
+        :param batch: Batch to send
+        :type batch: _Batch
+        """
+        first = batch.waiters[0].request
+        if len(batch.waiters) == 1:
+            await self._forward(batch.waiters[0])
+            return
+        url = first.url.copy_with(path=f"{batch.prefix}{','.join(map(str, batch.cids))}{batch.suffix}")
+        logger.debug("batched %d lookups into %s", len(batch.waiters), url)
+        try:
+            self.upstream_requests += 1
+            combined = httpx.Request("GET", url, headers=first.headers, extensions=first.extensions)
+            response = await buffer_response(await self._transport.handle_async_request(combined), combined)
+        except Exception as e:
+            for waiter in batch.waiters:
+                if not waiter.future.done():
+                    waiter.future.set_exception(e)
+            return
+
+        if response.status_code != 200:
+            await asyncio.gather(*(self._forward(w) for w in batch.waiters))
+            return
+        try:
+            payload = json.loads(response.content)
+            if not isinstance(payload, dict) or not any(envelope in payload for envelope, _ in _RECORDS.values()):
+                raise ValueError("no known record list")
+            shares = [split_records(payload, waiter.cids) for waiter in batch.waiters]
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.warning("unusable batched PubChem response (%s); sending %d lookups separately", e, len(batch.waiters))
+            await asyncio.gather(*(self._forward(w) for w in batch.waiters))
+            return
+        for waiter, share in zip(batch.waiters, shares):
+            if share is None:
+                fault = {"Fault": {"Code": "PUGREST.NotFound", "Message": "No records found for the given CID(s)"}}
+                result = httpx.Response(404, json=fault, request=waiter.request)
+            else:
+                result = httpx.Response(200, json=share, request=waiter.request)
+            if not waiter.future.done():
+                waiter.future.set_result(result)
+
+    async def _forward(self, waiter: _Waiter) -> None:
+        """Send a waiter's own request unbatched and resolve its future.
+
+        :param waiter: Caller to serve
+        :type waiter: _Waiter
+        """
+        try:
+            self.upstream_requests += 1
+            result = await buffer_response(
+                await self._transport.handle_async_request(waiter.request), waiter.request
+            )
+        except Exception as e:
+            if not waiter.future.done():
+                waiter.future.set_exception(e)
+            return
+        if not waiter.future.done():
+            waiter.future.set_result(result)
+
+    async def aclose(self) -> None:
+        """Close the wrapped transport."""
+        await self._transport.aclose()
+
+
+class CidChunkingTransport(httpx.AsyncBaseTransport):
+    """Transport that sends long CID lists as chunked ``cid=`` POST requests.
+
+    A GET on ``/compound/cid/{cids}/...`` whose URL exceeds ``max_url_length``
+    or whose list exceeds ``chunk_size`` CIDs is rewritten to
+    ``POST /compound/cid/...`` with the CIDs in a form body. JSON responses are
+    split into chunks of at most ``chunk_size`` CIDs that are sent concurrently;
+    the wrapped scheduler keeps them within the rate limit and may retry them,
+    as the POST only reads. Other formats are sent as one POST.
+
+    :param transport: Wrapped transport that performs real requests
+    :type transport: httpx.AsyncBaseTransport
+    :param chunk_size: Maximum CIDs per upstream request
+    :type chunk_size: int
+    :param max_url_length: Longest URL sent as a GET
+    :type max_url_length: int
+    """
+
+    def __init__(
+        self, transport: httpx.AsyncBaseTransport, chunk_size: int = 1000, max_url_length: int = 2000
+    ) -> None:
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        self._transport = transport
+        self.chunk_size = chunk_size
+        self.max_url_length = max_url_length
+        self.upstream_requests = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """Chunk long CID-list lookups, otherwise forward directly.
+
+        :param request: Outgoing request
+        :type request: httpx.Request
+        :returns: Upstream response, or the merged response of all chunks
+        :rtype: httpx.Response
+        """
+        match = _CID_LIST_PATH.match(request.url.path) if request.method == "GET" else None
+        cids = parse_cids(match["cids"]) if match else None
+        if (
+            match is None
+            or cids is None
+            or (len(cids) <= self.chunk_size and len(str(request.url)) <= self.max_url_length)
+        ):
+            self.upstream_requests += 1
+            return await self._transport.handle_async_request(request)
+
+        url = request.url.copy_with(path=f"{match['prefix']}{match['operation']}")
+        size = self.chunk_size if match["operation"].endswith("/JSON") else len(cids)
+        chunks = [cids[i:i + size] for i in range(0, len(cids), size)]
+        logger.debug("sending %d CIDs as %d POST request(s) to %s", len(cids), len(chunks), url)
+        responses = await asyncio.gather(*(self._post(request, url, chunk) for chunk in chunks))
+        if len(responses) == 1:
+            return responses[0]
+
+        # A chunk without any known CID answers 404; the others still count
+        found = [r for r in responses if r.status_code != 404]
+        failed = next((r for r in found if r.status_code != 200), None)
+        if failed is not None or not found:
+            return failed or responses[0]
+        merged = merge_records([json.loads(r.content) for r in found])
+        if merged is None:
+            raise ValueError(f"Cannot merge chunked PubChem responses from {url.path}")
+        return httpx.Response(200, json=merged, request=request)
+
+    async def _post(self, request: httpx.Request, url: httpx.URL, cids: List[int]) -> httpx.Response:
+        """Send one chunk as a form POST and buffer its response.
+
+        :param request: Original GET request (headers and extensions are reused)
+        :type request: httpx.Request
+        :param url: POST URL, the original without the CID segment
+        :type url: httpx.URL
+        :param cids: CIDs of this chunk
+        :type cids: list[int]
+        :returns: Buffered response
+        :rtype: httpx.Response
+        """
+        headers = [
+            (k, v) for k, v in request.headers.multi_items() if k.lower() not in ("content-length", "content-type")
+        ]
+        post = httpx.Request(
+            "POST",
+            url,
+            headers=headers,
+            data={"cid": ",".join(map(str, cids))},
+            extensions={**request.extensions, IDEMPOTENT_EXTENSION: True},
+        )
+        self.upstream_requests += 1
+        return await buffer_response(await self._transport.handle_async_request(post), request)
+
+    async def aclose(self) -> None:
+        """Close the wrapped transport."""
+        await self._transport.aclose()
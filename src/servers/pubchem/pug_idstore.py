@@ -0,0 +1,385 @@
+"""Persistent name/SMILES/InChIKey -> CID resolution store for PubChem.
+
+Resolving an identifier through ``/compound/name/...``, ``/compound/smiles/...``
+or ``/compound/inchikey/...`` is the first step of most chemistry sessions, and
+the answer almost never changes. :class:`IdentifierStore` keeps these mappings
+in SQLite under PUBCHEM_IDSTORE_PATH, records "not found" answers for
+PUBCHEM_IDSTORE_NEGATIVE_TTL seconds, and can be preloaded from PubChem's
+``CID-Synonym-filtered``, ``CID-InChI-Key`` or ``CID-SMILES`` dumps::
+
+    python -m servers.pubchem.pug_idstore --namespace name CID-Synonym-filtered.gz
+
+:class:`IdentifierTransport` learns mappings from upstream responses (including
+``/standardize/smiles/...``), answers ``.../cids/JSON`` and ``.../cids/TXT``
+lookups and known misses locally, and turns record lookups by identifier into
+record lookups by CID.
+
+Names are matched case-insensitively with whitespace collapsed, InChIKeys
+case-insensitively, SMILES exactly as given (there is no local
+canonicalization).
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import IO, Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import httpx
+
+from irmcp.cache import buffer_response
+
+logger = logging.getLogger(__name__)
+
+NAMESPACES = ("name", "smiles", "inchikey")
+DEFAULT_NEGATIVE_TTL = 900.0
+PRELOAD_BATCH = 10_000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS identifiers (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    cids TEXT NOT NULL,  -- comma-separated, '' for a recorded miss
+    expires REAL,        -- NULL: never
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+"""
+
+# Appends a preloaded CID to an existing mapping; replaces a recorded miss
+_PRELOAD = """
+INSERT INTO identifiers VALUES (?, ?, ?, NULL)
+ON CONFLICT (namespace, key) DO UPDATE SET
+    cids = CASE WHEN identifiers.cids = '' THEN excluded.cids ELSE identifiers.cids || ',' || excluded.cids END,
+    expires = NULL
+WHERE identifiers.cids = '' OR instr(',' || identifiers.cids || ',', ',' || excluded.cids || ',') = 0
+"""
+
+
+def normalize_identifier(namespace: str, value: str) -> str:
+    """Return the lookup key for an identifier.
+
+    :param namespace: ``name``, ``smiles`` or ``inchikey``
+    :type namespace: str
+    :param value: Identifier as given by the caller
+    :type value: str
+    :returns: Names casefolded with whitespace collapsed, InChIKeys uppercased,
+        SMILES stripped
+    :rtype: str
+    """
+    if namespace == "name":
+        return " ".join(value.split()).casefold()
+    if namespace == "inchikey":
+        return value.strip().upper()
+    return value.strip()
+
+
+class IdentifierStore:
+    """SQLite-backed identifier -> CID map with expiring negative entries.
+
+    Lookups are primary-key reads on one shared connection and take a few
+    microseconds, so they run directly on the event loop.
+
+    :param path: SQLite database file
+    :type path: str
+    :param negative_ttl: Seconds a "not found" answer is kept
+    :type negative_ttl: float
+    :param clock: Wall clock, overridable for tests
+    :type clock: Callable[[], float]
+    """
+
+    def __init__(
+        self, path: str, negative_ttl: float = DEFAULT_NEGATIVE_TTL, clock: Callable[[], float] = time.time
+    ) -> None:
+        self.path = path
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def get(self, namespace: str, value: str) -> Optional[List[int]]:
+        """Look up an identifier.
+
+        :param namespace: ``name``, ``smiles`` or ``inchikey``
+        :type namespace: str
+        :param value: Identifier
+        :type value: str
+        :returns: CIDs; an empty list for a recorded miss; None when unknown
+            or the miss has expired
+        :rtype: Optional[list[int]]
+        """
+        key = normalize_identifier(namespace, value)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT cids, expires FROM identifiers WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= self.clock()):
+            return None
+        return [int(cid) for cid in row[0].split(",")] if row[0] else []
+
+    def put(self, namespace: str, value: str, cids: Sequence[int]) -> None:
+        """Record the CIDs an identifier resolves to, or a miss when ``cids`` is empty.
+
+        :param namespace: ``name``, ``smiles`` or ``inchikey``
+        :type namespace: str
+        :param value: Identifier
+        :type value: str
+        :param cids: CIDs in upstream order
+        :type cids: Sequence[int]
+        """
+        expires = None if cids else self.clock() + self.negative_ttl
+        key = normalize_identifier(namespace, value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO identifiers VALUES (?, ?, ?, ?)",
+                (namespace, key, ",".join(map(str, cids)), expires),
+            )
+
+    def preload(self, namespace: str, rows: Iterable[Tuple[int, str]]) -> int:
+        """Bulk-load ``(cid, identifier)`` pairs; several CIDs per identifier accumulate.
+
+        :param namespace: ``name``, ``smiles`` or ``inchikey``
+        :type namespace: str
+        :param rows: CID and identifier pairs
+        :type rows: Iterable[tuple[int, str]]
+        :returns: Number of pairs read
+        :rtype: int
+        """
+        count = 0
+        batch: List[Tuple[str, str, str]] = []
+        with self._lock:
+            for cid, value in rows:
+                batch.append((namespace, normalize_identifier(namespace, value), str(cid)))
+                if len(batch) >= PRELOAD_BATCH:
+                    count += self._write(batch)
+                    batch = []
+            count += self._write(batch)
+        return count
+
+    def _write(self, batch: List[Tuple[str, str, str]]) -> int:
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.executemany(_PRELOAD, batch)
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+        return len(batch)
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+def open_identifier_store(path: Optional[str] = None) -> Optional[IdentifierStore]:
+    """Open the store at ``path``, defaulting to PUBCHEM_IDSTORE_PATH.
+
+    PUBCHEM_IDSTORE_PATH defaults to ``~/.cache/irmcp/pubchem/identifiers.sqlite``;
+    set it empty to disable the store. PUBCHEM_IDSTORE_NEGATIVE_TTL sets how
+    long misses are remembered (seconds, default 900).
+
+    :param path: SQLite database file
+    :type path: Optional[str]
+    :returns: Store, or None when disabled or the file cannot be opened
+    :rtype: Optional[IdentifierStore]
+    """
+    if path is None:
+        default = os.path.join(os.path.expanduser("~"), ".cache", "irmcp", "pubchem", "identifiers.sqlite")
+        path = os.environ.get("PUBCHEM_IDSTORE_PATH", default)
+    if not path:
+        return None
+    negative_ttl = float(os.environ.get("PUBCHEM_IDSTORE_NEGATIVE_TTL", str(DEFAULT_NEGATIVE_TTL)))
+    try:
+        return IdentifierStore(path, negative_ttl)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning("PubChem identifier store %s unavailable: %s", path, e)
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Transport
+# ---------------------------------------------------------------------------
+
+_LOOKUP_PATH = re.compile(
+    r"^(?P<prefix>.*/)compound/(?P<namespace>name|smiles|inchikey)/(?P<value>[^/]+)/(?P<output>cids/JSON|cids/TXT|JSON)$"
+)
+_STANDARDIZE_PATH = re.compile(r"/standardize/smiles/(?P<value>[^/]+)/JSON$")
+# Query parameters that do not change which compounds an identifier resolves to
+_NEUTRAL_PARAMS = frozenset({"record_type"})
+
+
+def response_cids(payload: Any) -> List[int]:
+    """Extract CIDs from an ``IdentifierList`` or ``PC_Compounds`` response.
+
+    :param payload: Parsed JSON response
+    :type payload: Any
+    :returns: Positive CIDs in response order
+    :rtype: list[int]
+    """
+    if not isinstance(payload, dict):
+        return []
+    if "IdentifierList" in payload:
+        cids = payload["IdentifierList"].get("CID") or []
+    else:
+        cids = [((c.get("id") or {}).get("id") or {}).get("cid") for c in payload.get("PC_Compounds") or []]
+    return list(dict.fromkeys(c for c in cids if isinstance(c, int) and c > 0))
+
+
+def _is_not_found(response: httpx.Response) -> bool:
+    if response.status_code != 404:
+        return False
+    try:
+        return response.json().get("Fault", {}).get("Code") == "PUGREST.NotFound"
+    except ValueError:
+        return False
+
+
+class IdentifierTransport(httpx.AsyncBaseTransport):
+    """Transport resolving identifiers through an :class:`IdentifierStore`.
+
+    :param transport: Wrapped transport
+    :type transport: httpx.AsyncBaseTransport
+    :param store: Identifier store
+    :type store: IdentifierStore
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, store: IdentifierStore) -> None:
+        self._transport = transport
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+
+    def _local(self, request: httpx.Request, body: Any, status: int = 200) -> httpx.Response:
+        self.hits += 1
+        headers = {"x-irmcp-source": "identifier-store"}
+        if isinstance(body, str):
+            return httpx.Response(status, text=body, headers=headers, request=request)
+        return httpx.Response(status, json=body, headers=headers, request=request)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """Answer or rewrite identifier lookups from the store; learn from upstream answers.
+
+        :param request: Outgoing request
+        :type request: httpx.Request
+        :returns: Local, rewritten or upstream response
+        :rtype: httpx.Response
+        """
+        if request.method != "GET":
+            return await self._transport.handle_async_request(request)
+        match = _LOOKUP_PATH.match(request.url.path)
+        if match is None or not _NEUTRAL_PARAMS.issuperset(request.url.params.keys()):
+            standardize = _STANDARDIZE_PATH.search(request.url.path)
+            if standardize is None:
+                return await self._transport.handle_async_request(request)
+            return await self._learn(request, "smiles", standardize["value"], record_miss=False)
+
+        namespace, value, output = match["namespace"], match["value"], match["output"]
+        cids = self.store.get(namespace, value)
+        if cids == []:
+            fault = {"Fault": {"Code": "PUGREST.NotFound", "Message": f"No CID found for {namespace} {value!r}"}}
+            return self._local(request, fault, 404)
+        if cids and output == "cids/JSON":
+            return self._local(request, {"IdentifierList": {"CID": cids}})
+        if cids and output == "cids/TXT":
+            return self._local(request, "".join(f"{cid}\n" for cid in cids))
+        if cids:
+            # Record lookup: fetch by CID instead of resolving the identifier again
+            self.hits += 1
+            path = f"{match['prefix']}compound/cid/{','.join(map(str, cids))}/JSON"
+            rewritten = httpx.Request(
+                "GET", request.url.copy_with(path=path), headers=request.headers, extensions=request.extensions
+            )
+            return await self._transport.handle_async_request(rewritten)
+        self.misses += 1
+        return await self._learn(request, namespace, value, record_miss=True)
+
+    async def _learn(self, request: httpx.Request, namespace: str, value: str, record_miss: bool) -> httpx.Response:
+        response = await buffer_response(await self._transport.handle_async_request(request), request)
+        try:
+            if response.status_code == 200:
+                if request.url.path.endswith("/TXT"):
+                    cids = [int(line) for line in response.text.split() if line.isdigit()]
+                else:
+                    cids = response_cids(json.loads(response.content))
+                if cids:
+                    self.store.put(namespace, value, cids)
+            elif record_miss and _is_not_found(response):
+                self.store.put(namespace, value, [])
+        except (ValueError, sqlite3.Error) as e:
+            logger.debug("not recording %s %r: %s", namespace, value, e)
+        return response
+
+    async def aclose(self) -> None:
+        """Close the wrapped transport."""
+        await self._transport.aclose()
+
+
+# ---------------------------------------------------------------------------
+# Dump reading and CLI
+# ---------------------------------------------------------------------------
+
+def _open_text(path: str) -> IO[str]:
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, "r", encoding="utf-8", errors="replace")
+
+
+def iter_cid_dump(path: str) -> Iterator[Tuple[int, str]]:
+    """Yield ``(cid, identifier)`` pairs from a tab-separated PubChem dump.
+
+    The CID is the first column and the identifier the last, which fits
+    ``CID-Synonym-filtered``, ``CID-SMILES`` and ``CID-InChI-Key``
+    (``cid, InChI, InChIKey``). Files may be gzip-compressed.
+
+    :param path: Dump file
+    :type path: str
+    :returns: Iterator of CID and identifier pairs
+    :rtype: Iterator[tuple[int, str]]
+    """
+    with _open_text(path) as f:
+        for line in f:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) >= 2 and parts[0].isdigit() and parts[-1]:
+                yield int(parts[0]), parts[-1]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Entry point: preload the identifier store from PubChem dumps.
+
+    :param argv: Command-line arguments (defaults to ``sys.argv[1:]``)
+    :type argv: Optional[Sequence[str]]
+    :returns: Nothing
+    :rtype: None
+    """
+    parser = argparse.ArgumentParser(description="Preload the PubChem identifier -> CID store")
+    parser.add_argument("dumps", nargs="+", help="tab-separated cid/identifier file, optionally .gz")
+    parser.add_argument("--namespace", choices=NAMESPACES, required=True, help="what the identifiers are")
+    parser.add_argument("--db", help="store file (default: PUBCHEM_IDSTORE_PATH)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    store = open_identifier_store(args.db)
+    if store is None:
+        parser.error("--db or PUBCHEM_IDSTORE_PATH is required")
+    try:
+        for dump in args.dumps:
+            count = store.preload(args.namespace, iter_cid_dump(dump))
+            logger.info("loaded %d %s identifiers from %s", count, args.namespace, dump)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
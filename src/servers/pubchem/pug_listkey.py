@@ -0,0 +1,341 @@
+"""Asynchronous structure-search results for PubChem PUG-REST.
+
+The fast structure searches may answer with ``{"Waiting": {"ListKey": ...}}``
+instead of hits, and ``MaxRecords`` defaults to two million. :func:`register_listkey_tools`
+wraps each search tool so the server polls the ListKey itself and returns only
+the first page of hits. The ListKey is kept in a :class:`HitStore` and
+``get_search_hits`` asks PubChem for each later page with
+``listkey_start``/``listkey_count``, so a broad search costs one request per
+page actually read rather than a download of every hit. Searches that answer
+with hits directly keep them as a compact ``array('I')`` in the store.
+
+Within a tool call's deadline (:mod:`irmcp.deadline`) the searches send the
+budget left as PubChem's ``MaxSeconds`` and stop polling when it runs out.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import os
+import time
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import httpx
+from fastmcp.exceptions import NotFoundError
+from fastmcp.tools import Tool
+from fastmcp.tools.tool_transform import ArgTransform, forward_raw
+
+from irmcp.deadline import current_deadline, remaining
+from irmcp.server import ProgressReporter, progress_reporter
+
+logger = logging.getLogger(__name__)
+
+# Generated tool names of the searches that can return a ListKey
+SEARCH_TOOLS = (
+    "Substructure_search_by_SMILES",
+    "Superstructure_search_by_CID",
+    "2D_similarity_search_by_CID",
+    "Identity_search_by_SMILES",
+    "Molecular_formula_search",
+)
+
+PAGE_SIZE: int = int(os.environ.get("PUBCHEM_HITS_PAGE_SIZE", "500"))
+MAX_PAGE_SIZE = 10_000
+POLL_TIMEOUT: float = float(os.environ.get("PUBCHEM_POLL_TIMEOUT", "120"))
+POLL_INITIAL_DELAY = 0.5
+POLL_MAX_DELAY = 8.0
+# Seconds of a deadline budget kept back from MaxSeconds to transfer the hits
+MAX_SECONDS_MARGIN = 2.0
+
+
+@dataclass(frozen=True)
+class ListKeyHits:
+    """Hits of a search that PubChem keeps under a ListKey.
+
+    :param listkey: PubChem ListKey
+    :type listkey: str
+    :param total: Number of hits, when PubChem reported it
+    :type total: Optional[int]
+    """
+
+    listkey: str
+    total: Optional[int] = None
+
+
+Hits = Union["array[int]", ListKeyHits]
+
+
+class HitStore:
+    """LRU store of search results: CID arrays or PubChem ListKeys.
+
+    :param max_hits: Total CIDs kept in arrays across all results before the oldest are dropped
+    :type max_hits: int
+    :param max_lists: Results kept before the oldest are dropped
+    :type max_lists: int
+    """
+
+    def __init__(self, max_hits: int = 20_000_000, max_lists: int = 10_000) -> None:
+        self.max_hits = max_hits
+        self.max_lists = max_lists
+        self.current_hits = 0
+        self._lists: "OrderedDict[str, Hits]" = OrderedDict()
+        self._ids = itertools.count(1)
+
+    def __len__(self) -> int:
+        return len(self._lists)
+
+    def put(self, hits: Hits) -> str:
+        """Store a search result and return its handle.
+
+        :param hits: Hit CIDs in PubChem's order, or the ListKey holding them
+        :type hits: Union[array, ListKeyHits]
+        :returns: Handle for :meth:`get` and :meth:`page`
+        :rtype: str
+        """
+        handle = f"hits-{next(self._ids)}"
+        self._lists[handle] = hits
+        self.current_hits += _stored_size(hits)
+        while (self.current_hits > self.max_hits or len(self._lists) > self.max_lists) and len(self._lists) > 1:
+            _, old = self._lists.popitem(last=False)
+            self.current_hits -= _stored_size(old)
+        return handle
+
+    def get(self, handle: str) -> Hits:
+        """Return a stored search result.
+
+        :param handle: Handle returned by :meth:`put`
+        :type handle: str
+        :returns: CID array or ListKey
+        :rtype: Union[array, ListKeyHits]
+        :raises ValueError: If the handle is unknown or has been evicted
+        """
+        hits = self._lists.get(handle)
+        if hits is None:
+            raise ValueError(f"Unknown or expired hit list '{handle}'; run the search again")
+        self._lists.move_to_end(handle)
+        return hits
+
+    def page(self, handle: str, start: int = 0, count: int = PAGE_SIZE) -> Dict[str, Any]:
+        """Return one page of a stored CID array.
+
+        :param handle: Handle returned by :meth:`put`
+        :type handle: str
+        :param start: Zero-based offset of the first hit
+        :type start: int
+        :param count: Page size, clamped to ``MAX_PAGE_SIZE``
+        :type count: int
+        :returns: ``handle``, ``total``, ``start``, ``CID`` and ``next_start`` when more remain
+        :rtype: dict[str, Any]
+        :raises ValueError: If the handle is unknown, evicted or holds a ListKey
+        """
+        cids = self.get(handle)
+        if isinstance(cids, ListKeyHits):
+            raise ValueError(f"Hit list '{handle}' is held by PubChem; page it with the get_search_hits tool")
+        start = max(0, start)
+        end = min(len(cids), start + _page_count(count))
+        return _page(handle, start, cids[start:end].tolist(), len(cids), count)
+
+
+def _stored_size(hits: Hits) -> int:
+    return 0 if isinstance(hits, ListKeyHits) else len(hits)
+
+
+def _page_count(count: int) -> int:
+    return max(1, min(count, MAX_PAGE_SIZE))
+
+
+def _page(handle: str, start: int, cids: List[int], total: Optional[int], count: int) -> Dict[str, Any]:
+    result: Dict[str, Any] = {"handle": handle, "total": total, "start": start, "CID": cids}
+    end = start + len(cids)
+    # Without a reported total, a full page means there may be more
+    if (end < total) if total is not None else len(cids) >= _page_count(count):
+        result["next_start"] = end
+    return result
+
+
+def _fault_message(response: httpx.Response) -> str:
+    try:
+        fault = response.json().get("Fault", {})
+        return f"{fault.get('Code', response.status_code)}: {fault.get('Message', response.reason_phrase)}"
+    except ValueError:
+        return f"HTTP {response.status_code}: {response.reason_phrase}"
+
+
+async def fetch_listkey_page(
+    client: httpx.AsyncClient,
+    listkey: str,
+    start: int = 0,
+    count: int = PAGE_SIZE,
+    timeout: float = POLL_TIMEOUT,
+    report: Optional[ProgressReporter] = None,
+) -> Tuple[List[int], Optional[int]]:
+    """Fetch one page of a ListKey's CIDs, polling while the search still runs.
+
+    A ``Waiting`` answer is retried with exponential backoff.
+
+    :param client: PubChem HTTP client (base URL ``.../rest/pug``)
+    :type client: httpx.AsyncClient
+    :param listkey: ListKey from a ``Waiting`` response
+    :type listkey: str
+    :param start: Zero-based offset of the first hit (``listkey_start``)
+    :type start: int
+    :param count: Hits to fetch (``listkey_count``), clamped to ``MAX_PAGE_SIZE``
+    :type count: int
+    :param timeout: Seconds to keep polling before giving up; the current
+        deadline shortens it
+    :type timeout: float
+    :param report: Optional progress callback ``(progress, total, message)``
+    :type report: Optional[Callable[[float, Optional[float], str], Awaitable[None]]]
+    :returns: The page's CIDs and the total number of hits, if PubChem reports it
+    :rtype: tuple[list[int], Optional[int]]
+    :raises ValueError: On a PubChem fault (e.g. an expired ListKey) or when polling times out
+    """
+    begin = time.monotonic()
+    deadline = begin + timeout
+    budget = current_deadline()
+    if budget is not None:
+        deadline = min(deadline, budget.expires_at)
+    delay = POLL_INITIAL_DELAY
+    while True:
+        response = await client.get(
+            f"/compound/listkey/{listkey}/cids/JSON",
+            params={"listkey_start": max(0, start), "listkey_count": _page_count(count)},
+        )
+        if response.status_code >= 400:
+            raise ValueError(
+                f"PubChem ListKey {listkey} failed: {_fault_message(response)}; "
+                "ListKeys expire after a while, so run the search again if needed"
+            )
+        payload = response.json()
+        if "Waiting" not in payload:
+            identifiers = payload.get("IdentifierList", {})
+            return list(identifiers.get("CID") or []), identifiers.get("Size")
+        if time.monotonic() + delay > deadline:
+            left = f" ({budget.describe()})" if budget is not None else ""
+            raise ValueError(
+                f"PubChem search {listkey} still running after {time.monotonic() - begin:.0f}s{left}; "
+                "narrow the query or lower MaxRecords"
+            )
+        if report is not None:
+            await report(0, None, f"waiting for PubChem ListKey {listkey}")
+        await asyncio.sleep(delay)
+        delay = min(POLL_MAX_DELAY, delay * 2)
+
+
+async def fetch_hits_page(
+    client: httpx.AsyncClient, store: HitStore, handle: str, start: int = 0, count: int = PAGE_SIZE
+) -> Dict[str, Any]:
+    """Return one page of a stored search result, asking PubChem for ListKey pages.
+
+    :param client: PubChem HTTP client
+    :type client: httpx.AsyncClient
+    :param store: Store holding the result
+    :type store: HitStore
+    :param handle: Handle returned by :meth:`HitStore.put`
+    :type handle: str
+    :param start: Zero-based offset of the first hit
+    :type start: int
+    :param count: Page size, clamped to ``MAX_PAGE_SIZE``
+    :type count: int
+    :returns: ``handle``, ``total``, ``start``, ``CID`` and ``next_start`` when more remain
+    :rtype: dict[str, Any]
+    :raises ValueError: If the handle is unknown or PubChem no longer has the ListKey
+    """
+    hits = store.get(handle)
+    if not isinstance(hits, ListKeyHits):
+        return store.page(handle, start, count)
+    start = max(0, start)
+    cids, total = await fetch_listkey_page(client, hits.listkey, start, count)
+    return _page(handle, start, cids, total if total is not None else hits.total, count)
+
+
+def _paged_search_tool(original: Tool, client: httpx.AsyncClient, store: HitStore) -> Tool:
+    """Wrap a structure-search tool to resolve ListKeys and return the first page of hits.
+
+    :param original: Generated search tool
+    :type original: fastmcp.tools.Tool
+    :param client: PubChem HTTP client used for ListKey polling
+    :type client: httpx.AsyncClient
+    :param store: Store for search results
+    :type store: HitStore
+    :returns: Transformed tool with the same name
+    :rtype: fastmcp.tools.Tool
+    """
+
+    async def paged_search(count: int = PAGE_SIZE, **kwargs: Any) -> Dict[str, Any]:
+        # Hidden args are not forwarded with their defaults; the wrapper needs JSON
+        kwargs["format"] = "JSON"
+        left = remaining()
+        if left is not None:
+            budget = max(1, int(left - MAX_SECONDS_MARGIN))
+            kwargs["MaxSeconds"] = min(kwargs.get("MaxSeconds") or budget, budget)
+        result = await forward_raw(**kwargs)
+        payload = result.structured_content or {}
+        if "Waiting" in payload:
+            listkey = payload["Waiting"].get("ListKey")
+            if not listkey:
+                raise ValueError(f"PubChem returned Waiting without a ListKey: {payload}")
+            cids, total = await fetch_listkey_page(client, listkey, 0, count, report=progress_reporter())
+            return _page(store.put(ListKeyHits(listkey, total)), 0, cids, total, count)
+        if "IdentifierList" in payload:
+            return store.page(store.put(array("I", payload["IdentifierList"].get("CID") or [])), 0, count)
+        return payload
+
+    return Tool.from_tool(
+        original,
+        name=original.name,
+        description=(
+            f"{original.description or ''}\n\n"
+            "Returns the first `count` hit CIDs with `total` and a `handle`. If `next_start` is "
+            "present, fetch further pages with get_search_hits(handle, start=next_start). "
+            "Long-running searches are polled on the server."
+        ),
+        transform_fn=paged_search,
+        transform_args={
+            "format": ArgTransform(hide=True, default="JSON"),
+            "callback": ArgTransform(hide=True),
+        },
+    )
+
+
+async def register_listkey_tools(
+    app: Any, client: httpx.AsyncClient, store: Optional[HitStore] = None
+) -> HitStore:
+    """Replace the structure-search tools with paged versions and add ``get_search_hits``.
+
+    :param app: FastMCPOpenAPI PubChem server
+    :type app: Any
+    :param client: HTTP client the server uses for PubChem
+    :type client: httpx.AsyncClient
+    :param store: Hit store to use; a new one is created when omitted
+    :type store: Optional[HitStore]
+    :returns: The hit store backing the tools
+    :rtype: HitStore
+    """
+    store = store or HitStore()
+    for name in SEARCH_TOOLS:
+        try:
+            original = await app.get_tool(name)
+        except NotFoundError:
+            logger.warning("PubChem search tool %s not found", name)
+            continue
+        app.remove_tool(name)
+        app.add_tool(_paged_search_tool(original, client, store))
+
+    @app.tool(
+        name="get_search_hits",
+        description=(
+            "Page through hit CIDs from an earlier PubChem structure search. Pass the search's "
+            "`handle` and the previous page's `next_start`; `count` is at most "
+            f"{MAX_PAGE_SIZE}."
+        ),
+    )
+    async def get_search_hits(handle: str, start: int = 0, count: int = PAGE_SIZE) -> Dict[str, Any]:
+        return await fetch_hits_page(client, store, handle, start, count)
+
+    return store
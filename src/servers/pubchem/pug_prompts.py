@@ -3,12 +3,19 @@
 Call register_prompts(app) after creating the server to attach prompts.
 """
 
+import functools
 import os
-from typing import Any
+from typing import Any, Dict
 
+from fastmcp.resources import TextResource
+from pydantic import AnyUrl
 
+from irmcp.docs import DocSection, section_index, split_markdown_sections
+
+
+@functools.lru_cache(maxsize=1)
 def _load_chemical_naming_rules() -> str:
-    """Load chemical naming rules from markdown file.
+    """Load chemical naming rules from markdown file, once per process.
     
     :returns: Content of chemical_naming_rules.md file or error message if not found
     :rtype: str
@@ -21,12 +28,42 @@ def _load_chemical_naming_rules() -> str:
         return "Chemical naming rules file not found."
 
 
+@functools.lru_cache(maxsize=1)
+def naming_rule_sections() -> Dict[str, DocSection]:
+    """Index the naming rules by top-level section (e.g. ``104-inversion-of-names``).
+
+    :returns: Sections keyed by slug
+    :rtype: dict[str, DocSection]
+    """
+    return {s.slug: s for s in split_markdown_sections(_load_chemical_naming_rules())}
+
+
 def register_prompts(app: Any) -> None:
     """Register PubChem prompts on the given FastMCP app using decorators.
     
     :param app: FastMCP server instance to register prompts on
     :type app: Any
     """
+    sections = naming_rule_sections()
+    for slug, section in sections.items():
+        app.add_resource(
+            TextResource(
+                uri=AnyUrl(f"naming-rules://section/{slug}"),
+                name=f"naming_rules_{slug.replace('-', '_')}",
+                description=section.title,
+                mime_type="text/markdown",
+                text=section.text,
+            )
+        )
+    app.add_resource(
+        TextResource(
+            uri=AnyUrl("naming-rules://index"),
+            name="naming_rules_index",
+            description="Section index of the chemical naming rules",
+            mime_type="text/markdown",
+            text=section_index(sections),
+        )
+    )
 
     @app.prompt(
         name="naming_smiles",
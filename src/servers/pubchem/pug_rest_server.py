@@ -4,66 +4,130 @@ Provides an async setup routine to construct a FastMCP OpenAPI server and a
 sync `main()` for launching via CLI.
 """
 
-import asyncio
 import os
 
-import httpx
-
 # Ensure FastMCP uses the experimental OpenAPI parser
 os.environ.setdefault("FASTMCP_EXPERIMENTAL_ENABLE_NEW_OPENAPI_PARSER", "true")
 from fastmcp.experimental.server.openapi import FastMCPOpenAPI
 
-from irmcp.server import load_openapi_spec, setup_httpx_logging
+from irmcp.deadline import load_deadlines, register_deadlines
+from irmcp.projection import ProjectionRule, load_projection_rules, register_slimming
+from irmcp.scheduler import SchedulerConfig
+from irmcp.server import (
+    TransportWrapper,
+    create_http_client,
+    create_response_cache,
+    load_openapi_spec,
+    register_cache_stats,
+    register_metrics,
+    run_server,
+    setup_httpx_logging,
+    upstream_metrics,
+)
+from servers.pubchem.pug_batching import CidBatchingTransport, CidChunkingTransport
+from servers.pubchem.pug_idstore import IdentifierTransport, open_identifier_store
+from servers.pubchem.pug_listkey import POLL_TIMEOUT, SEARCH_TOOLS, register_listkey_tools
 from servers.pubchem.pug_prompts import register_prompts
 
 # Server configuration
 API_BASE: str = os.environ.get("API_BASE", "https://pubchem.ncbi.nlm.nih.gov/rest/pug")
 DEFAULT_TIMEOUT: float = float(os.environ.get("API_TIMEOUT", "30"))
+# Coalesce per-CID property/synonym lookups arriving within this window (0 disables)
+BATCH_WINDOW: float = float(os.environ.get("PUBCHEM_BATCH_WINDOW_MS", "20")) / 1000
+BATCH_MAX_CIDS: int = int(os.environ.get("PUBCHEM_BATCH_MAX_CIDS", "100"))
+# Long CID lists are sent as POST requests of at most this many CIDs each
+CHUNK_CIDS: int = int(os.environ.get("PUBCHEM_CHUNK_CIDS", "1000"))
+# PubChem asks clients to stay at or below 5 requests per second
+RATE_LIMIT: float = 5.0
+
+# Cache TTLs (seconds) per operation path. Compound records, names and synonyms
+# are effectively static; structure searches are cheap to keep for an hour.
+CACHE_TTLS: dict[str, float] = {
+    "/compound/cid/{cids}/synonyms/{format}": 7 * 24 * 3600,
+    "/compound/cid/{cids}/property/{properties}/{format}": 7 * 24 * 3600,
+    "/compound/cid/{cids}/{format}": 7 * 24 * 3600,
+    "/compound/name/{name}/{format}": 24 * 3600,
+    "/compound/smiles/{smiles}/{format}": 24 * 3600,
+    "/compound/inchikey/{inchikey}/{format}": 24 * 3600,
+    "/standardize/smiles/{smiles}/{format}": 7 * 24 * 3600,
+    "/compound/fastsubstructure/smiles/{smiles}/cids/{format}": 3600,
+    "/compound/fastsuperstructure/cid/{cid}/cids/{format}": 3600,
+    "/compound/fastsimilarity_2d/cid/{cid}/cids/{format}": 3600,
+    "/compound/fastidentity/smiles/{smiles}/cids/{format}": 3600,
+    "/compound/fastformula/{formula}/cids/{format}": 3600,
+}
+
+# Result slimming per tool; RESPONSE_PROJECTION_FILE can override. Full records
+# carry 2D/3D coordinates that are large and rarely useful to a model.
+_RECORD_RULE = ProjectionRule(exclude=("PC_Compounds[*].coords",))
+PROJECTIONS: dict[str, ProjectionRule] = {
+    "Get_compound_records_by_CID": _RECORD_RULE,
+    "Get_compound_records_by_name": _RECORD_RULE,
+    "Get_compound_records_by_SMILES": _RECORD_RULE,
+    "Get_compound_records_by_InChI_Key": _RECORD_RULE,
+    "Get_compound_properties": ProjectionRule(),
+    "Get_compound_synonyms": ProjectionRule(),
+}
+
+# Deadline budgets (seconds) beyond API_TOOL_DEADLINE; API_TOOL_DEADLINES can
+# override. Structure searches poll their ListKey for up to POLL_TIMEOUT.
+DEADLINES: dict[str, float] = {name: POLL_TIMEOUT + 30 for name in SEARCH_TOOLS}
 
 async def create_pug_server() -> FastMCPOpenAPI:
     """Build the PubChem FastMCP server instance.
 
-    Creates an :class:`httpx.AsyncClient`, loads the OpenAPI spec, configures
-    HTTP logging, registers prompts, and returns a ready-to-run
+    Creates a caching :class:`httpx.AsyncClient`, loads the OpenAPI spec, configures
+    HTTP logging, registers prompts, paged structure-search tools and result
+    slimming, and returns a ready-to-run
     :class:`fastmcp.experimental.server.openapi.FastMCPOpenAPI`.
 
     :returns: Configured FastMCP server instance for PubChem
     :rtype: fastmcp.experimental.server.openapi.FastMCPOpenAPI
     """
-    # Use an async client with better connection handling: FastMCP's OpenAPI server awaits HTTP calls
-    client = httpx.AsyncClient(
-        base_url=API_BASE,
-        timeout=httpx.Timeout(DEFAULT_TIMEOUT, connect=10.0),
-        limits=httpx.Limits(max_keepalive_connections=5, max_connections=10),
-        headers={
-            "User-Agent": "irmcp-pubchem-server/1.0",
-            "Accept": "application/json",
-        },
-    )
-
     schema_path = os.path.join(os.path.dirname(__file__), "pug_rest_openapi.yaml")
     openapi_spec = load_openapi_spec(schema_path)
+    # Use an async client with better connection handling: FastMCP's OpenAPI server awaits HTTP calls
+    cache = create_response_cache(CACHE_TTLS)
+    wrappers: list[TransportWrapper] = [lambda t: CidChunkingTransport(t, CHUNK_CIDS)]
+    if BATCH_WINDOW > 0:
+        wrappers.append(lambda t: CidBatchingTransport(t, BATCH_WINDOW, BATCH_MAX_CIDS))
+    # Resolve names, SMILES and InChIKeys from the persistent store (PUBCHEM_IDSTORE_PATH)
+    identifiers = open_identifier_store()
+    if identifiers is not None:
+        wrappers.append(lambda t: IdentifierTransport(t, identifiers))
+    client = create_http_client(
+        API_BASE,
+        "irmcp-pubchem-server/1.0",
+        DEFAULT_TIMEOUT,
+        cache,
+        wrappers,
+        SchedulerConfig.from_env(default_rate=RATE_LIMIT),
+        instrument=upstream_metrics("pubchem", openapi_spec),
+    )
 
     # Configure HTTP logging and build app
     setup_httpx_logging()
     app = FastMCPOpenAPI(openapi_spec=openapi_spec, client=client, name="pubchem")
     register_prompts(app)
+    register_cache_stats(app, cache)
+    register_metrics(app, cache)
+    register_deadlines(app, load_deadlines(DEADLINES))
+    await register_listkey_tools(app, client)
+    register_slimming(app, load_projection_rules(PROJECTIONS))
     return app
 
 
 def main() -> None:
     """Entry point: build and run the MCP server.
 
-    Creates the server via :func:`pug_server`, then runs it with the default
-    STDIO transport so an MCP client can connect.
+    Builds the server via :func:`create_pug_server` and runs it with the default STDIO
+    transport on the same event loop, so the HTTP client is created, pre-warmed
+    and closed on the loop that serves requests.
 
     :returns: Nothing. Blocks the current process running the server.
     :rtype: None
     """
-    # Setup the app with async operations
-    app = asyncio.run(create_pug_server())
-    # Run the server in sync context
-    app.run()
+    run_server(create_pug_server)
 
 if __name__ == "__main__":
     main()
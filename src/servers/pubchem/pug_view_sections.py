@@ -0,0 +1,213 @@
+"""Section-level extraction from PubChem PUG-View compound records.
+
+A full PUG-View record for a well-annotated compound is many megabytes, while a
+question usually needs one or two sections (toxicity, physical properties, ...).
+``get_compound_sections`` asks PUG-View for each heading separately
+(``?heading=``), which returns only that section inside its parents. Only when
+PUG-View rejects a heading does it fall back to the full record, which is read
+from the byte stream one top-level section at a time; sections that are not
+requested are discarded as soon as they are decoded.
+
+Extracted sections are stored in the server's response cache under one key per
+CID and heading, so repeated questions about a compound need no transfer.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+import httpx
+
+from irmcp.cache import STREAM_EXTENSION, CacheEntry, ResponseCache
+from irmcp.jsonstream import iter_json_members
+
+logger = logging.getLogger(__name__)
+
+SECTION_TTL: float = float(os.environ.get("PUBCHEM_VIEW_SECTION_TTL", str(24 * 3600)))
+MAX_HEADINGS = 20
+_RECORD_SECTIONS = ("Record", "Section")
+
+
+class HeadingRejected(Exception):
+    """Raised when PUG-View does not accept a ``heading`` filter (HTTP 400)."""
+
+
+def normalize_heading(heading: str) -> str:
+    """Return the comparison form of a section heading (case and spacing folded).
+
+    :param heading: Section heading, e.g. ``Melting  point``
+    :type heading: str
+    :returns: Normalized heading, e.g. ``melting point``
+    :rtype: str
+    """
+    return " ".join(heading.split()).lower()
+
+
+def find_sections(
+    sections: Iterable[Any], wanted: Set[str], parents: Tuple[str, ...] = ()
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Search a ``Section`` tree depth-first for sections with wanted headings.
+
+    Matches are not searched further. Each match is returned with a ``Path``
+    entry listing its parent headings.
+
+    :param sections: ``Section`` list of a record or section
+    :type sections: Iterable[Any]
+    :param wanted: Normalized headings (see :func:`normalize_heading`)
+    :type wanted: set[str]
+    :param parents: Headings above ``sections``
+    :type parents: tuple[str, ...]
+    :returns: Iterator of ``(normalized heading, section)``
+    :rtype: Iterator[tuple[str, dict[str, Any]]]
+    """
+    for section in sections:
+        if not isinstance(section, dict):
+            continue
+        heading = str(section.get("TOCHeading") or "")
+        key = normalize_heading(heading)
+        if key in wanted:
+            yield key, {"Path": list(parents), **section}
+        else:
+            yield from find_sections(section.get("Section") or [], wanted, parents + (heading,))
+
+
+def _fault_message(body: bytes) -> str:
+    try:
+        fault = json.loads(body).get("Fault") or {}
+        return " ".join([fault.get("Message", ""), *fault.get("Details", [])]).strip()
+    except (ValueError, AttributeError):
+        return body[:200].decode("utf-8", "replace")
+
+
+async def scan_record(
+    client: httpx.AsyncClient, cid: int, wanted: Set[str], heading: Optional[str] = None
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Stream a compound record and collect the sections with wanted headings.
+
+    :param client: PUG-View HTTP client
+    :type client: httpx.AsyncClient
+    :param cid: Compound ID
+    :type cid: int
+    :param wanted: Normalized headings to collect
+    :type wanted: set[str]
+    :param heading: ``heading`` filter to send; None downloads the full record
+    :type heading: Optional[str]
+    :returns: Matching sections per normalized heading (empty lists when absent)
+    :rtype: dict[str, list[dict[str, Any]]]
+    :raises HeadingRejected: If PUG-View answers 400 to a ``heading`` filter
+    :raises ValueError: For other upstream errors
+    """
+    found: Dict[str, List[Dict[str, Any]]] = {key: [] for key in wanted}
+    params = {"heading": heading} if heading else None
+    async with client.stream(
+        "GET", f"/data/compound/{cid}/JSON", params=params, extensions={STREAM_EXTENSION: True}
+    ) as response:
+        if response.status_code != 200:
+            message = _fault_message(await response.aread())
+            if response.status_code == 404:
+                # No such compound, or it has no data under this heading
+                return found
+            if response.status_code == 400 and heading:
+                raise HeadingRejected(message)
+            raise ValueError(f"PUG-View returned HTTP {response.status_code} for CID {cid}: {message}")
+        async for path, value in iter_json_members(response.aiter_bytes(), _RECORD_SECTIONS):
+            if path == _RECORD_SECTIONS:
+                for key, section in find_sections([value], wanted):
+                    found[key].append(section)
+    return found
+
+
+def _cache_key(cid: int, key: str) -> str:
+    return f"pug_view section {cid} {key}"
+
+
+async def compound_sections(
+    client: httpx.AsyncClient, cid: int, headings: Sequence[str], cache: Optional[ResponseCache] = None
+) -> Dict[str, Any]:
+    """Return the requested sections of a compound's PUG-View record.
+
+    Cached sections are served from ``cache``; the rest are fetched one heading
+    per request, concurrently. Headings PUG-View rejects are extracted from one
+    streamed read of the full record.
+
+    :param client: PUG-View HTTP client
+    :type client: httpx.AsyncClient
+    :param cid: Compound ID
+    :type cid: int
+    :param headings: Section headings (TOCHeading values), matched case-insensitively
+    :type headings: Sequence[str]
+    :param cache: Cache for extracted sections; None disables caching
+    :type cache: Optional[ResponseCache]
+    :returns: ``cid``, ``sections`` (heading -> list of sections, each with its
+        parent ``Path``), ``notFound`` and ``fullRecordRead``
+    :rtype: dict[str, Any]
+    :raises ValueError: If no or too many headings are given, or on upstream errors
+    """
+    names = {normalize_heading(h): " ".join(h.split()) for h in headings if h.strip()}
+    if not names:
+        raise ValueError("Give at least one section heading, e.g. 'Toxicity' or 'Experimental Properties'")
+    if len(names) > MAX_HEADINGS:
+        raise ValueError(f"At most {MAX_HEADINGS} headings per call")
+
+    found: Dict[str, List[Dict[str, Any]]] = {}
+    if cache is not None:
+        for key in names:
+            entry = await cache.get(_cache_key(cid, key))
+            if entry is not None:
+                found[key] = json.loads(entry.content)
+    fetch = [key for key in names if key not in found]
+
+    async def by_heading(key: str) -> Optional[List[Dict[str, Any]]]:
+        try:
+            return (await scan_record(client, cid, {key}, names[key]))[key]
+        except HeadingRejected as e:
+            logger.debug("PUG-View rejected heading %r for CID %s: %s", names[key], cid, e)
+            return None
+
+    fetched = dict(zip(fetch, await asyncio.gather(*(by_heading(key) for key in fetch))))
+    rejected = {key for key, sections in fetched.items() if sections is None}
+    if rejected:
+        fetched.update(await scan_record(client, cid, rejected))
+    for key, sections in fetched.items():
+        found[key] = sections or []
+        if cache is not None:
+            content = json.dumps(found[key], separators=(",", ":")).encode("utf-8")
+            await cache.set(
+                _cache_key(cid, key),
+                CacheEntry(200, [("content-type", "application/json")], content, cache.clock() + SECTION_TTL),
+            )
+    return {
+        "cid": cid,
+        "sections": {names[key]: found[key] for key in names},
+        "notFound": [names[key] for key in names if not found[key]],
+        "fullRecordRead": bool(rejected),
+    }
+
+
+def register_section_tools(app: Any, client: httpx.AsyncClient, cache: Optional[ResponseCache] = None) -> None:
+    """Add ``get_compound_sections`` to the PUG-View server.
+
+    :param app: FastMCPOpenAPI PUG-View server
+    :type app: Any
+    :param client: HTTP client the server uses for PUG-View
+    :type client: httpx.AsyncClient
+    :param cache: Cache for extracted sections; None disables caching
+    :type cache: Optional[ResponseCache]
+    """
+
+    @app.tool(
+        name="get_compound_sections",
+        description=(
+            "Get selected annotation sections of one compound (by CID) from PubChem PUG View, "
+            "e.g. headings=['Toxicity', 'Experimental Properties'] or ['Melting Point']. "
+            "Headings are TOCHeading values from Get_compound_annotation_index and match "
+            "case-insensitively. Returns each heading's sections with their parent `Path`; "
+            f"`notFound` lists headings the compound has no data for. Up to {MAX_HEADINGS} headings."
+        ),
+    )
+    async def get_compound_sections(cid: int, headings: List[str]) -> Dict[str, Any]:
+        return await compound_sections(client, cid, headings, cache)
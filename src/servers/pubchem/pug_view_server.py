@@ -0,0 +1,103 @@
+"""PubChem PUG-View MCP server entrypoint.
+
+Provides an async setup routine to construct a FastMCP OpenAPI server and a
+sync `main()` for launching via CLI.
+"""
+
+import os
+
+# Ensure FastMCP uses the experimental OpenAPI parser
+os.environ.setdefault("FASTMCP_EXPERIMENTAL_ENABLE_NEW_OPENAPI_PARSER", "true")
+from fastmcp.experimental.server.openapi import FastMCPOpenAPI
+
+from irmcp.deadline import load_deadlines, register_deadlines
+from irmcp.projection import ProjectionRule, load_projection_rules, register_slimming
+from irmcp.scheduler import SchedulerConfig
+from irmcp.server import (
+    create_http_client,
+    create_response_cache,
+    load_openapi_spec,
+    register_cache_stats,
+    register_metrics,
+    run_server,
+    setup_httpx_logging,
+    upstream_metrics,
+)
+from servers.pubchem.pug_view_sections import register_section_tools
+
+# Server configuration; API_BASE is left to the PUG-REST server, which shares the process in the gateway
+API_BASE: str = os.environ.get("PUG_VIEW_API_BASE", "https://pubchem.ncbi.nlm.nih.gov/rest/pug_view")
+DEFAULT_TIMEOUT: float = float(os.environ.get("API_TIMEOUT", "30"))
+# PubChem asks clients to stay at or below 5 requests per second
+RATE_LIMIT: float = 5.0
+
+# Cache TTLs (seconds) per operation path. Annotations are updated as sources
+# are re-imported, at most daily. Full records are never cached: only the
+# heading-filtered responses and the sections extracted from them.
+CACHE_TTLS: dict[str, float] = {
+    "/index/compound/{cid}/JSON": 24 * 3600,
+    "/data/compound/{cid}/JSON": 24 * 3600,
+    "/annotations/heading/JSON": 24 * 3600,
+}
+
+# Result slimming per tool; RESPONSE_PROJECTION_FILE can override. Annotation
+# text (toxicity summaries, use descriptions) can be very long.
+PROJECTIONS: dict[str, ProjectionRule] = {
+    "get_compound_sections": ProjectionRule(max_text=4000),
+    "Get_compound_annotations_by_heading": ProjectionRule(max_text=4000),
+    "Get_annotations_by_heading": ProjectionRule(max_text=2000),
+}
+
+# Deadline budgets (seconds) beyond API_TOOL_DEADLINE; API_TOOL_DEADLINES can
+# override. A rejected heading falls back to streaming the full record.
+DEADLINES: dict[str, float] = {
+    "get_compound_sections": 180,
+}
+
+async def create_pug_view_server() -> FastMCPOpenAPI:
+    """Build the PubChem PUG-View FastMCP server instance.
+
+    Creates a caching :class:`httpx.AsyncClient`, loads the OpenAPI spec, configures
+    HTTP logging, registers section extraction and result slimming, and returns a
+    ready-to-run :class:`fastmcp.experimental.server.openapi.FastMCPOpenAPI`.
+
+    :returns: Configured FastMCP server instance for PUG-View
+    :rtype: fastmcp.experimental.server.openapi.FastMCPOpenAPI
+    """
+    schema_path = os.path.join(os.path.dirname(__file__), "pug_view_openapi.yaml")
+    openapi_spec = load_openapi_spec(schema_path)
+    cache = create_response_cache(CACHE_TTLS)
+    client = create_http_client(
+        API_BASE,
+        "irmcp-pubchem-view-server/1.0",
+        DEFAULT_TIMEOUT,
+        cache,
+        scheduler=SchedulerConfig.from_env(default_rate=RATE_LIMIT),
+        instrument=upstream_metrics("pubchem-view", openapi_spec),
+    )
+
+    # Configure HTTP logging and build app
+    setup_httpx_logging()
+    app = FastMCPOpenAPI(openapi_spec=openapi_spec, client=client, name="pubchem-view")
+    register_cache_stats(app, cache)
+    register_metrics(app, cache)
+    register_deadlines(app, load_deadlines(DEADLINES))
+    # Sections extracted per CID and heading share the response cache
+    register_section_tools(app, client, cache)
+    register_slimming(app, load_projection_rules(PROJECTIONS))
+    return app
+
+
+def main() -> None:
+    """Entry point: build and run the MCP server.
+
+    Builds the server via :func:`create_pug_view_server` and runs it with the
+    default STDIO transport on the same event loop.
+
+    :returns: Nothing. Blocks the current process running the server.
+    :rtype: None
+    """
+    run_server(create_pug_view_server)
+
+if __name__ == "__main__":
+    main()
@@ -5,3 +5,11 @@ import pytest
 def anyio_backend():
     # Run any @pytest.mark.anyio tests with asyncio backend only
     return "asyncio"
+
+
+@pytest.fixture(autouse=True)
+def _no_compiled_spec_cache(monkeypatch):
+    # Keep tests hermetic: do not write compiled OpenAPI specs under $HOME
+    monkeypatch.setenv("OPENAPI_CACHE_DIR", "")
+    monkeypatch.setenv("CT_METADATA_DIR", "")
+    monkeypatch.setenv("PUBCHEM_IDSTORE_PATH", "")
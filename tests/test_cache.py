@@ -0,0 +1,86 @@
+from typing import List
+
+import httpx
+import pytest
+
+from irmcp.cache import (
+    CacheEntry,
+    CachingTransport,
+    DiskCache,
+    MemoryCache,
+    ResponseCache,
+    normalize_cache_key,
+)
+
+
+def _client(cache: ResponseCache, calls: List[str]) -> httpx.AsyncClient:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(str(request.url))
+        return httpx.Response(200, json={"n": len(calls)})
+
+    transport = CachingTransport(httpx.MockTransport(handler), cache)
+    return httpx.AsyncClient(base_url="https://api.test", transport=transport)
+
+
+@pytest.mark.anyio
+async def test_cache_hit_ignores_query_param_order():
+    calls: List[str] = []
+    cache = ResponseCache(memory=MemoryCache(1 << 20), ttls={"/studies": 60})
+    async with _client(cache, calls) as client:
+        first = await client.get("/studies", params=[("a", "1"), ("b", "2")])
+        second = await client.get("/studies", params=[("b", "2"), ("a", "1")])
+
+    assert len(calls) == 1
+    assert first.json() == second.json() == {"n": 1}
+    assert cache.stats.hits == 1 and cache.stats.misses == 1
+
+
+@pytest.mark.anyio
+async def test_cache_expires_and_skips_uncached_paths():
+    now = [1000.0]
+    calls: List[str] = []
+    cache = ResponseCache(memory=MemoryCache(1 << 20), ttls={"/studies/{nctId}": 10}, clock=lambda: now[0])
+    async with _client(cache, calls) as client:
+        await client.get("/studies/NCT1")
+        await client.get("/studies/NCT1")
+        now[0] += 11
+        await client.get("/studies/NCT1")
+        # No TTL configured for /version: always forwarded
+        await client.get("/version")
+        await client.get("/version")
+
+    assert len(calls) == 4
+
+
+def test_memory_cache_evicts_lru_over_byte_budget():
+    mem = MemoryCache(max_bytes=25)
+    for key in ("a", "b", "c"):
+        mem.set(key, CacheEntry(200, [], b"x" * 10, expires_at=1e12))
+    assert mem.get("a") is None
+    assert mem.get("b") is not None and mem.get("c") is not None
+    assert mem.current_bytes == 20 and mem.evictions == 1
+
+
+@pytest.mark.anyio
+async def test_disk_tier_survives_new_memory_tier(tmp_path):
+    calls: List[str] = []
+    ttls = {"/compound/cid/{cids}/synonyms/{format}": 60}
+    cache = ResponseCache(memory=MemoryCache(1 << 20), disk=DiskCache(str(tmp_path)), ttls=ttls)
+    async with _client(cache, calls) as client:
+        await client.get("/compound/cid/2244/synonyms/JSON")
+
+    fresh = ResponseCache(memory=MemoryCache(1 << 20), disk=DiskCache(str(tmp_path)), ttls=ttls)
+    async with _client(fresh, calls) as client:
+        response = await client.get("/compound/cid/2244/synonyms/JSON")
+
+    assert len(calls) == 1
+    assert response.json() == {"n": 1}
+    assert fresh.stats.disk_hits == 1
+
+
+def test_cache_key_keeps_non_default_ports():
+    def key(url: str) -> str:
+        return normalize_cache_key(httpx.Request("GET", url))
+
+    assert key("http://127.0.0.1:8001/a?x=1") != key("http://127.0.0.1:8002/a?x=1")
+    assert key("https://api.test:443/a") == key("https://api.test/a") == "GET https://api.test/a?"
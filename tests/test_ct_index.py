@@ -0,0 +1,180 @@
+import json
+import sqlite3
+from typing import Any, Dict, List
+
+import httpx
+import pytest
+
+from servers.ct.ct_index import (
+    LocalIndexTransport,
+    StudyIndex,
+    Untranslatable,
+    iter_dump,
+    normalize_date,
+    parse_age,
+    translate_essie,
+    translate_params,
+)
+
+
+def _study(nct_id: str, condition: str, status: str, min_age: str, country: str, start: str) -> Dict[str, Any]:
+    return {
+        "protocolSection": {
+            "identificationModule": {"nctId": nct_id, "briefTitle": f"A study of {condition}"},
+            "statusModule": {"overallStatus": status, "startDateStruct": {"date": start}},
+            "conditionsModule": {"conditions": [condition]},
+            "designModule": {"phases": ["PHASE2"], "studyType": "INTERVENTIONAL"},
+            "eligibilityModule": {"sex": "ALL", "minimumAge": min_age, "eligibilityCriteria": "Adults with diabetes"},
+            "contactsLocationsModule": {"locations": [{"facility": "General Hospital", "city": "Boston", "country": country}]},
+        }
+    }
+
+
+STUDIES = [
+    _study("NCT00000001", "Heart Attack", "RECRUITING", "18 Years", "United States", "2021-03"),
+    _study("NCT00000002", "Breast Cancer", "COMPLETED", "65 Years", "Canada", "2019-01-10"),
+    _study("NCT00000003", "Lung Cancer", "RECRUITING", "6 Months", "United States", "2023-07-01"),
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    dump = tmp_path / "dump.jsonl"
+    dump.write_text("\n".join(json.dumps(s) for s in STUDIES))
+    idx = StudyIndex(str(tmp_path / "studies.sqlite"))
+    assert idx.ingest(iter_dump(str(dump))) == 3
+    # Re-ingesting replaces instead of duplicating
+    idx.ingest(STUDIES[:1])
+    return idx
+
+
+def _ids(result: Dict[str, Any]) -> List[str]:
+    return [s["protocolSection"]["identificationModule"]["nctId"] for s in result["studies"]]
+
+
+def test_ages_and_dates_normalize():
+    assert parse_age("18 Years") == pytest.approx(18 * 365.25)
+    assert parse_age("6 months") == pytest.approx(6 * 30.4375)
+    assert parse_age("66") is None
+    assert normalize_date("2021-03") == "2021-03-01"
+    assert normalize_date("01/31/2020") == "2020-01-31"
+
+
+def test_essie_subset_translation(index):
+    def search(**params: str) -> List[str]:
+        return sorted(_ids(index.search(translate_params(params))))
+
+    assert search(**{"query.cond": "cancer"}) == ["NCT00000002", "NCT00000003"]
+    assert search(**{"query.cond": '"breast cancer" OR "heart attack"'}) == ["NCT00000001", "NCT00000002"]
+    assert search(**{"query.cond": "cancer AND NOT lung"}) == ["NCT00000002"]
+    assert search(**{"filter.advanced": "AREA[OverallStatus]RECRUITING AND AREA[LocationCountry]\"United States\""}) == [
+        "NCT00000001",
+        "NCT00000003",
+    ]
+    assert search(**{"filter.advanced": "AREA[MinimumAge]RANGE[MIN, 18 years]"}) == ["NCT00000001", "NCT00000003"]
+    assert search(**{"filter.advanced": "AREA[StartDate]RANGE[2020-01-01, MAX]"}) == ["NCT00000001", "NCT00000003"]
+    assert search(**{"query.term": "diabetes", "filter.overallStatus": "COMPLETED"}) == ["NCT00000002"]
+    assert search(**{"filter.advanced": "AREA[MaximumAge]MISSING AND AREA[Phase](PHASE2 OR PHASE3)"}) == [
+        "NCT00000001",
+        "NCT00000002",
+        "NCT00000003",
+    ]
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        "AREA[MinimumAge]RANGE[66, MAX]",
+        "EXPANSION[None]cancer",
+        "SEARCH[Location](AREA[LocationCity]Boston)",
+        "AREA[InventedField]x",
+        "(cancer",
+    ],
+)
+def test_untranslatable_expressions(expression):
+    with pytest.raises(Untranslatable):
+        translate_essie(expression)
+
+
+def test_paging_sort_fields_and_count(index):
+    first = index.search(
+        translate_params({"pageSize": "2", "countTotal": "true", "sort": "StartDate", "fields": "NCTId,Condition"})
+    )
+    assert first["totalCount"] == 3
+    assert _ids(first) == ["NCT00000003", "NCT00000001"]
+    assert first["studies"][0] == {
+        "protocolSection": {
+            "identificationModule": {"nctId": "NCT00000003"},
+            "conditionsModule": {"conditions": ["Lung Cancer"]},
+        }
+    }
+    second = index.search(translate_params({"pageSize": "2", "sort": "StartDate", "pageToken": first["nextPageToken"]}))
+    assert _ids(second) == ["NCT00000002"] and "nextPageToken" not in second
+
+
+@pytest.mark.parametrize("sort", ["StartDate:asc LIMIT 0 --", "StartDate:sideways"])
+def test_sort_direction_must_be_asc_or_desc(sort):
+    with pytest.raises(Untranslatable, match="sort direction"):
+        translate_params({"sort": sort})
+    assert "DESC" in translate_params({"sort": "StartDate: desc"}).order
+
+
+def test_text_searches_are_ranked_by_relevance(index):
+    def search(**params: str) -> List[str]:
+        return _ids(index.search(translate_params(params)))
+
+    # NCT00000003 matches both terms, so it outranks NCT00000002 despite its later NCT ID
+    assert search(**{"query.term": "cancer OR lung"}) == ["NCT00000003", "NCT00000002"]
+    assert search(**{"query.term": "cancer OR lung", "sort": "@relevance:desc"}) == ["NCT00000003", "NCT00000002"]
+    assert search(**{"query.term": "cancer OR lung", "sort": "@relevance:asc"}) == ["NCT00000002", "NCT00000003"]
+    assert search(**{"query.term": "cancer OR lung", "sort": "StartDate:asc"}) == ["NCT00000002", "NCT00000003"]
+    # Terms under NOT do not contribute to the score
+    assert "lung" not in translate_params({"query.term": "cancer AND NOT lung"}).order_params[0]
+    # Without text terms there is nothing to rank by
+    assert search(**{"filter.overallStatus": "RECRUITING"}) == ["NCT00000001", "NCT00000003"]
+    with pytest.raises(Untranslatable, match="relevance"):
+        translate_params({"filter.overallStatus": "RECRUITING", "sort": "@relevance"})
+
+
+@pytest.mark.anyio
+async def test_transport_answers_locally_and_forwards_the_rest(index):
+    forwarded: List[str] = []
+
+    async def upstream(request: httpx.Request) -> httpx.Response:
+        forwarded.append(str(request.url))
+        return httpx.Response(200, json={"studies": []})
+
+    transport = LocalIndexTransport(httpx.MockTransport(upstream), index)
+    async with httpx.AsyncClient(base_url="https://ct.test/api/v2", transport=transport) as client:
+        local = await client.get("/studies", params={"query.cond": "cancer", "format": "json"})
+        await client.get("/studies", params={"query.cond": "cancer", "filter.geo": "distance(42,-71,50mi)"})
+        await client.get("/studies", params={"pageToken": "upstream-token"})
+        await client.get("/studies/NCT00000001")
+
+    assert local.headers["x-irmcp-source"] == "local-index"
+    assert _ids(local.json()) == ["NCT00000002", "NCT00000003"]
+    assert len(forwarded) == 3 and transport.local == 1
+
+
+@pytest.mark.anyio
+async def test_stale_index_forwards_until_reingested(index):
+    forwarded: List[str] = []
+
+    async def upstream(request: httpx.Request) -> httpx.Response:
+        forwarded.append(str(request.url))
+        return httpx.Response(200, json={"studies": []})
+
+    conn = sqlite3.connect(index.path)
+    with conn:
+        conn.execute("UPDATE meta SET value = datetime('now', '-10 days') WHERE key = 'ingested_at'")
+    conn.close()
+
+    transport = LocalIndexTransport(httpx.MockTransport(upstream), index, max_age=7 * 24 * 3600)
+    async with httpx.AsyncClient(base_url="https://ct.test/api/v2", transport=transport) as client:
+        stale = await client.get("/studies", params={"filter.overallStatus": "RECRUITING"})
+        index.ingest(STUDIES[:1])
+        fresh = await client.get("/studies", params={"filter.overallStatus": "RECRUITING"})
+
+    assert "x-irmcp-source" not in stale.headers and len(forwarded) == 1
+    assert fresh.headers["x-irmcp-source"] == "local-index"
+    assert LocalIndexTransport(httpx.MockTransport(upstream), index, max_age=None).fresh()
@@ -0,0 +1,149 @@
+import asyncio
+from typing import Any, Dict, List
+
+import httpx
+import pytest
+
+from irmcp.deadline import DeadlineExceeded, current_deadline, deadline_scope
+from irmcp.server import managed_http_clients, on_startup, warm_up
+from servers.ct.ct_metadata import RETRY_AFTER_FAILURE, FieldIndex, MetadataStore, MetadataTransport
+
+METADATA = [
+    {
+        "name": "protocolSection",
+        "piece": "ProtocolSection",
+        "sourceType": "STRUCT",
+        "type": "ProtocolSection",
+        "children": [
+            {
+                "name": "statusModule",
+                "piece": "StatusModule",
+                "sourceType": "STRUCT",
+                "type": "StatusModule",
+                "children": [
+                    {"name": "overallStatus", "piece": "OverallStatus", "sourceType": "ENUM", "type": "Status",
+                     "isEnum": True, "title": "Overall Recruitment Status", "altPieceNames": ["Status"]},
+                ],
+            }
+        ],
+    }
+]
+DOCUMENTS: Dict[str, Any] = {
+    "/studies/metadata": METADATA,
+    "/studies/search-areas": [{"name": "Study", "areas": [{"name": "ConditionSearch", "parts": []}]}],
+    "/studies/enums": [{"type": "Status", "pieces": ["OverallStatus"],
+                        "values": [{"value": "RECRUITING", "legacyValue": "Recruiting"}]}],
+}
+
+
+def _upstream(calls: List[str], version: Dict[str, str]) -> httpx.MockTransport:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.path.removeprefix("/api/v2")
+        calls.append(path)
+        if path == "/version":
+            return httpx.Response(200, json=version)
+        return httpx.Response(200, json=DOCUMENTS[path])
+
+    return httpx.MockTransport(handler)
+
+
+def test_field_index_resolves_pieces_areas_and_enums():
+    index = FieldIndex.from_documents(DOCUMENTS)
+    assert index.path("overallstatus") == "protocolSection.statusModule.overallStatus"
+    assert index.path("Status") == index.path("OverallStatus")
+    status = index.describe("OverallStatus")
+    assert status is not None and status["values"] == ["RECRUITING"]
+    assert index.describe("conditionsearch") == {"area": "ConditionSearch"}
+    assert index.suggest("OveralStatus") == ["OverallStatus"]
+
+
+@pytest.mark.anyio
+async def test_snapshot_served_from_memory_and_refetched_on_new_release(tmp_path):
+    calls: List[str] = []
+    version = {"apiVersion": "2", "dataTimestamp": "2024-01-01"}
+    now = [0.0]
+    store = MetadataStore("https://ct.test/api/v2", str(tmp_path), check_interval=60, clock=lambda: now[0])
+    transport = MetadataTransport(_upstream(calls, version), store)
+    async with httpx.AsyncClient(base_url="https://ct.test/api/v2", transport=transport) as client:
+        first = await client.get("/studies/metadata")
+        await client.get("/studies/enums")
+        assert first.json() == METADATA and first.headers["x-irmcp-source"] == "metadata-snapshot"
+        assert sorted(calls) == sorted(["/version", "/studies/metadata", "/studies/search-areas", "/studies/enums"])
+
+        # Within the interval: no upstream traffic at all
+        calls.clear()
+        await client.get("/studies/search-areas")
+        assert calls == []
+
+        # Interval elapsed, same release: only /version
+        now[0] = 61
+        await client.get("/studies/enums")
+        await asyncio.sleep(0.01)
+        assert calls == ["/version"]
+
+        # New release: documents re-fetched
+        calls.clear()
+        version["dataTimestamp"] = "2024-02-01"
+        now[0] = 200
+        await client.get("/studies/enums")
+        await asyncio.sleep(0.01)
+        assert "/studies/metadata" in calls
+
+    reloaded = MetadataStore("https://ct.test/api/v2", str(tmp_path))
+    assert reloaded.load() and reloaded.snapshot is not None
+    assert reloaded.snapshot.data_timestamp == "2024-02-01"
+    assert reloaded.field_path("OverallStatus") == "protocolSection.statusModule.overallStatus"
+
+
+@pytest.mark.anyio
+async def test_parameterized_requests_are_forwarded():
+    calls: List[str] = []
+    store = MetadataStore("https://ct.test/api/v2", "", check_interval=0)
+    transport = MetadataTransport(_upstream(calls, {"dataTimestamp": "x"}), store)
+    async with httpx.AsyncClient(base_url="https://ct.test/api/v2", transport=transport) as client:
+        response = await client.get("/studies/metadata", params={"includeIndexedOnly": "true"})
+        await asyncio.sleep(0.01)
+    assert "x-irmcp-source" not in response.headers
+    # One forwarded request plus the background snapshot fetch
+    assert calls.count("/studies/metadata") == 2
+
+
+@pytest.mark.anyio
+async def test_snapshot_is_preloaded_at_server_startup():
+    calls: List[str] = []
+    store = MetadataStore("https://ct.test/api/v2", "", check_interval=3600)
+    transport = MetadataTransport(_upstream(calls, {"dataTimestamp": "2024-01-01"}), store)
+    async with managed_http_clients() as clients:
+        assert on_startup(store.preload)
+        await warm_up(clients)
+    assert store.snapshot is not None and len(calls) == 4
+
+    # The first request is served from memory
+    calls.clear()
+    async with httpx.AsyncClient(base_url="https://ct.test/api/v2", transport=transport) as client:
+        response = await client.get("/studies/metadata")
+    assert response.json() == METADATA and calls == []
+    assert not on_startup(store.preload)
+
+
+@pytest.mark.anyio
+async def test_background_check_ignores_the_callers_deadline_and_survives_timeouts():
+    deadlines: List[Any] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/version"):
+            deadlines.append(current_deadline())
+            raise DeadlineExceeded("No time left to send GET /version")
+        return httpx.Response(200, json=METADATA)
+
+    store = MetadataStore("https://ct.test/api/v2", "", check_interval=3600, clock=lambda: 0.0)
+    transport = MetadataTransport(httpx.MockTransport(handler), store)
+    async with httpx.AsyncClient(base_url="https://ct.test/api/v2", transport=transport) as client:
+        async with deadline_scope(5.0):
+            response = await client.get("/studies/metadata")
+
+    # The failed check is forwarded around and retried soon instead of after the interval
+    assert deadlines == [None]
+    assert response.json() == METADATA and store.snapshot is None
+    assert store._task is not None and store._task.result() is False
+    assert store._next_check == RETRY_AFTER_FAILURE
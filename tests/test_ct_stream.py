@@ -0,0 +1,100 @@
+import json
+import os
+from typing import Any, AsyncIterator, Dict, List
+
+import httpx
+import pytest
+from fastmcp import Client
+from fastmcp.experimental.server.openapi import FastMCPOpenAPI
+
+from irmcp.cache import STREAM_EXTENSION, CachingTransport, MemoryCache, ResponseCache
+from irmcp.server import load_openapi_spec
+from servers.ct.ct_server import create_ct_server
+from servers.ct.ct_stream import (
+    StudyTable,
+    iter_csv_rows,
+    register_screening,
+    resolve_fields,
+)
+
+CT_SPEC = os.path.join(os.path.dirname(__file__), "..", "src", "servers", "ct", "ctg-oas-v2.yaml")
+
+
+async def _chunks(data: bytes, size: int) -> AsyncIterator[bytes]:
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def _study(nct_id: str, *cities: str) -> Dict[str, Any]:
+    return {
+        "protocolSection": {
+            "identificationModule": {"nctId": nct_id, "briefTitle": f"Trial é {nct_id}"},
+            "contactsLocationsModule": {"locations": [{"city": c} for c in cities]},
+        }
+    }
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("size", [1, 5, 4096])
+async def test_csv_rows_keep_quoted_newlines(size):
+    data = '﻿NCT Number,Conditions\r\nNCT1,"Asthma\r\nCOPD, ""severe"""\r\nNCT2,Gout\r\n'.encode()
+    rows = [r async for r in iter_csv_rows(_chunks(data, size))]
+    assert rows == [["NCT Number", "Conditions"], ["NCT1", 'Asthma\r\nCOPD, "severe"'], ["NCT2", "Gout"]]
+
+
+def test_table_projects_fields_and_maps_over_lists():
+    table = StudyTable(["NCTId", "LocationCity"], resolve_fields(["NCTId", "LocationCity"]))
+    table.add_study(_study("NCT1", "Boston", "Lyon"))
+    table.add_study(_study("NCT2"))
+    assert table.to_dict() == {"columns": ["NCTId", "LocationCity"], "rows": [["NCT1", ["Boston", "Lyon"]], ["NCT2", None]]}
+    assert resolve_fields(["Custom"], {"Custom": "a.b"}.get) == ["a.b"]
+    with pytest.raises(ValueError, match="find_study_fields"):
+        resolve_fields(["NoSuchField"])
+
+
+@pytest.mark.anyio
+async def test_screen_studies_streams_pages_past_the_cache():
+    requests: List[httpx.Request] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        n = int(request.url.params.get("pageToken") or 0)
+        size = int(request.url.params["pageSize"])
+        body: Dict[str, Any] = {"studies": [_study(f"NCT{n}{i}", "Oslo") for i in range(size)]}
+        if n < 2:
+            body["nextPageToken"] = str(n + 1)
+        if n == 0:
+            body = {"totalCount": 99, **body}
+        return httpx.Response(200, content=_chunks(json.dumps(body).encode(), 64))
+
+    cache = ResponseCache(memory=MemoryCache(1 << 20), ttls={"/studies": 300})
+    transport = CachingTransport(httpx.MockTransport(handler), cache)
+    client = httpx.AsyncClient(base_url="https://api.test", transport=transport)
+    app = FastMCPOpenAPI(openapi_spec=load_openapi_spec(CT_SPEC), client=client, name="ct")
+    await register_screening(app, client)
+    async with Client(app) as mcp:
+        result = await mcp.call_tool(
+            "screen_studies",
+            {"query.cond": "asthma", "fields": "NCTId,LocationCity", "pageSize": 3, "max_studies": 5},
+        )
+
+    structured = result.structured_content
+    assert structured is not None
+    assert structured["columns"] == ["NCTId", "LocationCity"]
+    assert structured["rows"][:2] == [["NCT00", ["Oslo"]], ["NCT01", ["Oslo"]]]
+    assert structured["returned"] == 5 and structured["totalCount"] == 99 and structured["nextPageToken"] == "2"
+    # The last page is sized to what is left, so the token resumes exactly
+    assert [r.url.params["pageSize"] for r in requests] == ["3", "2"]
+    assert all(r.extensions.get(STREAM_EXTENSION) for r in requests)
+    # Schema defaults the caller did not set are not sent
+    assert not {"geoDecay", "markupFormat", "countTotal"} & set(requests[0].url.params)
+    assert cache.stats.stores == 0
+
+
+@pytest.mark.anyio
+async def test_ct_server_lists_screen_studies():
+    app = await create_ct_server()
+    async with Client(app) as mcp:
+        names = {tool.name for tool in await mcp.list_tools()}
+    assert {"screen_studies", "search_studies"} <= names
+    assert "listStudies" not in names
@@ -0,0 +1,125 @@
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import anyio
+import httpx
+import pytest
+from fastmcp import Client
+from fastmcp.experimental.server.openapi import FastMCPOpenAPI
+
+from irmcp.server import load_openapi_spec
+from servers.ct.ct_tools import FetchPage, collect_study_pages, merge_ranked_studies, register_tools
+
+CT_SPEC = os.path.join(os.path.dirname(__file__), "..", "src", "servers", "ct", "ctg-oas-v2.yaml")
+
+
+def _pages(n_pages: int, per_page: int) -> Tuple[FetchPage, List[Optional[str]]]:
+    fetched: List[Optional[str]] = []
+
+    async def fetch_page(token: Optional[str]) -> Dict[str, Any]:
+        fetched.append(token)
+        n = int(token or 0)
+        page: Dict[str, Any] = {"studies": [{"nctId": f"NCT{n}{i}"} for i in range(per_page)]}
+        if n + 1 < n_pages:
+            page["nextPageToken"] = str(n + 1)
+        return page
+
+    return fetch_page, fetched
+
+
+@pytest.mark.anyio
+async def test_collect_study_pages_exhausts_all_pages():
+    fetch_page, fetched = _pages(3, 2)
+    result = await collect_study_pages(fetch_page, max_studies=100)
+    assert [s["nctId"] for s in result["studies"]] == ["NCT00", "NCT01", "NCT10", "NCT11", "NCT20", "NCT21"]
+    assert result["pages"] == 3 and not result["truncated"]
+    assert fetched == [None, "1", "2"]
+
+
+@pytest.mark.anyio
+async def test_collect_study_pages_stops_on_page_boundary_with_resume_token():
+    fetch_page, _ = _pages(5, 2)
+    result = await collect_study_pages(fetch_page, max_studies=4)
+    assert len(result["studies"]) == 4
+    assert result["truncated"] and result["nextPageToken"] == "2"
+
+
+@pytest.mark.anyio
+async def test_collect_study_pages_byte_budget_mid_page_has_no_resume_token():
+    fetch_page, _ = _pages(5, 2)
+    result = await collect_study_pages(fetch_page, max_bytes=40)
+    assert len(result["studies"]) == 2
+    assert result["truncated"] and "nextPageToken" not in result
+
+
+@pytest.mark.anyio
+async def test_search_all_studies_repeats_query_params_on_every_page():
+    urls: List[httpx.URL] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        urls.append(request.url)
+        n = int(request.url.params.get("pageToken") or 0)
+        body: Dict[str, Any] = {"studies": [{"nctId": f"NCT{n}"}]}
+        if n < 2:
+            body["nextPageToken"] = str(n + 1)
+        return httpx.Response(200, json=body)
+
+    client = httpx.AsyncClient(base_url="https://api.test", transport=httpx.MockTransport(handler))
+    app = FastMCPOpenAPI(openapi_spec=load_openapi_spec(CT_SPEC), client=client, name="ct")
+    await register_tools(app)
+    async with Client(app) as mcp:
+        structured = (await mcp.call_tool("search_all_studies", {"query.cond": "asthma"})).structured_content
+    assert [s["nctId"] for s in structured["studies"]] == ["NCT0", "NCT1", "NCT2"]
+    assert [u.params.get("pageToken") for u in urls] == [None, "1", "2"]
+    assert all(u.params["query.cond"] == "asthma" and u.params["format"] == "json" for u in urls)
+
+
+def _study(nct_id: str) -> Dict[str, Any]:
+    return {"protocolSection": {"identificationModule": {"nctId": nct_id}}}
+
+
+def test_merge_ranked_studies_keeps_best_rank_and_dedups():
+    pages = [
+        [_study("NCT1"), _study("NCT2"), _study("NCT3")],
+        [_study("NCT3"), _study("NCT4")],
+        [_study("NCT2"), _study("NCT5")],
+    ]
+    merged = merge_ranked_studies(pages, max_studies=4)
+    # Best rank first, then found by more queries, then first appearance
+    assert [r["nctId"] for r in merged["ranking"]] == ["NCT2", "NCT3", "NCT1", "NCT4"]
+    assert merged["ranking"][0] == {"nctId": "NCT2", "bestRank": 1, "queries": [0, 2]}
+    assert merged["uniqueStudies"] == 5 and merged["truncated"]
+    assert merged["studies"][1] == _study("NCT3")
+
+
+@pytest.mark.anyio
+async def test_multi_search_studies_runs_variants_concurrently():
+    urls: List[httpx.URL] = []
+    in_flight = [0, 0]
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        urls.append(request.url)
+        in_flight[0] += 1
+        in_flight[1] = max(in_flight)
+        await anyio.sleep(0.01)
+        in_flight[0] -= 1
+        cond = request.url.params["query.cond"]
+        if cond == "broken":
+            return httpx.Response(400, text="bad query")
+        ids = {"asthma": ["NCT1", "NCT2"], "wheezing": ["NCT2", "NCT3"]}[cond]
+        return httpx.Response(200, json={"studies": [_study(i) for i in ids]})
+
+    client = httpx.AsyncClient(base_url="https://api.test", transport=httpx.MockTransport(handler))
+    app = FastMCPOpenAPI(openapi_spec=load_openapi_spec(CT_SPEC), client=client, name="ct")
+    await register_tools(app)
+    async with Client(app) as mcp:
+        result = await mcp.call_tool(
+            "multi_search_studies",
+            {"conditions": ["asthma", "wheezing", "broken"], "locations": ["Boston"], "fields": "BriefTitle"},
+        )
+    structured = result.structured_content
+    assert [r["nctId"] for r in structured["ranking"]] == ["NCT2", "NCT1", "NCT3"]
+    assert structured["ranking"][0]["queries"] == [0, 1]
+    assert "error" in structured["queries"][2] and structured["queries"][0]["returned"] == 2
+    assert in_flight[1] == 3
+    assert all(u.params["query.locn"] == "Boston" and u.params["fields"] == "BriefTitle,NCTId" for u in urls)
@@ -0,0 +1,165 @@
+import asyncio
+import time
+from typing import Any, Callable, Coroutine, Dict, List
+
+import httpx
+import pytest
+from fastmcp import Client, FastMCP
+from fastmcp.exceptions import ToolError
+from mcp.types import CallToolRequestParams
+
+from irmcp import deadline as deadline_module
+from irmcp.deadline import (
+    DeadlineExceeded,
+    _requested_budget,
+    deadline_scope,
+    register_deadlines,
+    remaining,
+)
+from irmcp.scheduler import SchedulerConfig, SchedulingTransport
+from irmcp.server import create_http_client
+
+FAST = SchedulerConfig(max_retries=3, retry_base_delay=0.001, retry_max_delay=10.0)
+
+Handler = Callable[[httpx.Request], Coroutine[Any, Any, httpx.Response]]
+
+
+def _client(handler: Handler, config: SchedulerConfig = FAST) -> httpx.AsyncClient:
+    transport = SchedulingTransport(httpx.MockTransport(handler), config)
+    return httpx.AsyncClient(base_url="https://api.test", transport=transport, timeout=30.0)
+
+
+@pytest.mark.anyio
+async def test_attempt_timeouts_are_clamped_to_the_budget():
+    seen: List[Dict[str, Any]] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.extensions["timeout"])
+        return httpx.Response(200)
+
+    async with _client(handler) as client:
+        await client.get("/a")
+        async with deadline_scope(2.0):
+            await client.get("/b")
+
+    assert seen[0]["read"] == 30.0
+    assert 0 < seen[1]["read"] <= 2.0 and seen[1]["connect"] <= 2.0
+    assert remaining() is None
+
+
+@pytest.mark.anyio
+async def test_expired_budget_cancels_the_upstream_call():
+    cancelled = asyncio.Event()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return httpx.Response(200)
+
+    transport = SchedulingTransport(httpx.MockTransport(handler), FAST)
+    async with httpx.AsyncClient(base_url="https://api.test", transport=transport) as client:
+        start = time.monotonic()
+        with pytest.raises(DeadlineExceeded, match="0.05s deadline"):
+            async with deadline_scope(0.05, "Tool slow"):
+                await client.get("/slow")
+    assert time.monotonic() - start < 1
+    assert cancelled.is_set()
+    assert transport.upstream("api.test").concurrency.in_flight == 0
+
+
+@pytest.mark.anyio
+async def test_no_retry_or_rate_limit_wait_beyond_the_budget():
+    calls: List[str] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        return httpx.Response(503, headers={"Retry-After": "5"})
+
+    async with _client(handler) as client:
+        async with deadline_scope(1.0):
+            response = await client.get("/busy")
+    assert response.status_code == 503 and calls == ["/busy"]
+
+    slow = SchedulerConfig(rate=0.1, burst=1, max_retries=0)
+    async with _client(handler, slow) as client:
+        await client.get("/first")
+        with pytest.raises(DeadlineExceeded, match="Rate limit wait"):
+            async with deadline_scope(1.0):
+                await client.get("/second")
+
+
+def _server_client(handler: Handler) -> httpx.AsyncClient:
+    return create_http_client(
+        "https://api.test", "test/1.0", 30.0, scheduler=FAST, instrument=lambda _: httpx.MockTransport(handler)
+    )
+
+
+@pytest.mark.anyio
+async def test_budget_reaches_the_scheduler_through_singleflight(monkeypatch):
+    monkeypatch.setenv("API_SINGLEFLIGHT", "1")
+    seen: List[Dict[str, Any]] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.extensions["timeout"])
+        return httpx.Response(503, headers={"Retry-After": "5"})
+
+    async with _server_client(handler) as client:
+        start = time.monotonic()
+        async with deadline_scope(1.0):
+            response = await client.get("/busy")
+    assert response.status_code == 503 and time.monotonic() - start < 0.5
+    assert len(seen) == 1 and seen[0]["read"] <= 1.0 and seen[0]["connect"] <= 1.0
+
+
+@pytest.mark.anyio
+async def test_shared_request_runs_under_the_latest_caller_deadline(monkeypatch):
+    monkeypatch.setenv("API_SINGLEFLIGHT", "1")
+    seen: List[float] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.extensions["timeout"]["read"])
+        if len(seen) == 1:
+            return httpx.Response(503, headers={"Retry-After": "1"})
+        return httpx.Response(200)
+
+    async def get(client: httpx.AsyncClient, budget: float) -> httpx.Response:
+        async with deadline_scope(budget):
+            return await client.get("/shared")
+
+    async with _server_client(handler) as client:
+        short, long = await asyncio.gather(get(client, 0.5), get(client, 5.0), return_exceptions=True)
+    # The short caller gives up; the shared request keeps the long caller's budget and retries
+    assert isinstance(short, DeadlineExceeded)
+    assert isinstance(long, httpx.Response) and long.status_code == 200
+    assert len(seen) == 2 and 1.0 < seen[0] <= 5.0 and seen[1] <= 4.0
+
+
+@pytest.mark.anyio
+async def test_tool_budget_from_configuration_and_request_meta(monkeypatch):
+    app = FastMCP(name="deadline-test")
+
+    @app.tool
+    async def slow() -> str:
+        await asyncio.sleep(5)
+        return "done"
+
+    @app.tool
+    async def budget() -> float:
+        return remaining() or 0.0
+
+    register_deadlines(app, {"slow": 0.05})
+
+    async with Client(app) as client:
+        with pytest.raises(ToolError, match="Tool slow did not finish within its 0.05s deadline"):
+            await client.call_tool("slow")
+        left = (await client.call_tool("budget")).data
+    assert deadline_module.DEFAULT_DEADLINE is not None
+    assert 0 < left <= deadline_module.DEFAULT_DEADLINE
+
+    monkeypatch.setattr(deadline_module, "MAX_DEADLINE", 60.0)
+    params = CallToolRequestParams.model_validate({"name": "slow", "_meta": {"timeoutSeconds": 600}})
+    assert _requested_budget(params) == 60.0
+    assert _requested_budget(CallToolRequestParams(name="slow")) is None
@@ -0,0 +1,39 @@
+from irmcp.docs import split_markdown_sections
+from servers.ct.essie_guide import get_essie_guide, parse_essie_guide
+from servers.pubchem.pug_prompts import naming_rule_sections
+
+
+def test_bundled_guide_has_expected_sections_and_indexes():
+    guide = get_essie_guide()
+    assert list(guide.sections) == [
+        "bnf", "operators", "data_fields", "search_areas", "examples", "api_parameters"
+    ]
+    assert "RECRUITING" in (guide.lookup("OverallStatus") or "")
+    assert "query.cond" in (guide.lookup("AREA[ConditionSearch]") or "")
+    assert "<Query>" in (guide.lookup("BNF") or "")
+    assert guide.lookup("NotAField") is None
+
+
+def test_parse_guide_maps_headings_and_fields():
+    text = (
+        "# Title\n\nintro\n\n"
+        "## Study Data Fields (Structure)\n\n"
+        "* Phase (enumeration) – Trial phase. Values: PHASE1, PHASE2.\n"
+        "### Sub heading stays in section\n"
+        "## Something Else\n\nbody\n"
+    )
+    guide = parse_essie_guide(text)
+    assert list(guide.sections) == ["data_fields", "something-else"]
+    assert "Sub heading" in guide.sections["data_fields"].text
+    assert guide.lookup("phase") == "Phase (enumeration) – Trial phase. Values: PHASE1, PHASE2."
+
+
+def test_split_markdown_sections_ignores_preamble():
+    sections = split_markdown_sections("# T\npre\n## A b\nx\n## C\ny\n")
+    assert [(s.slug, s.text) for s in sections] == [("a-b", "## A b\nx\n"), ("c", "## C\ny\n")]
+
+
+def test_naming_rules_indexed_once():
+    sections = naming_rule_sections()
+    assert "104-inversion-of-names" in sections
+    assert naming_rule_sections() is sections
@@ -0,0 +1,131 @@
+from typing import Any, Dict
+
+import pytest
+from fastmcp import Client, FastMCP
+from fastmcp.exceptions import ToolError
+from fastmcp.tools import Tool
+from fastmcp.tools.tool_transform import ArgTransform
+
+from servers.ct.ct_metadata import FieldIndex
+from servers.ct.essie_parser import (
+    Area,
+    Bool,
+    EssieError,
+    EssieValidationMiddleware,
+    Range,
+    Term,
+    Vocabulary,
+    check_arguments,
+    check_query,
+    parse,
+)
+
+VOCABULARY = Vocabulary(
+    {"condition": "Condition", "minimumage": "MinimumAge", "startdate": "StartDate", "conditionsearch": "ConditionSearch"}
+)
+
+
+def test_parse_follows_precedence_and_implicit_and():
+    node = parse('heart attack OR AREA[MinimumAge]RANGE[18 years, MAX] NOT "lung cancer"')
+    assert isinstance(node, Bool) and node.op == "OR"
+    left, right = node.children
+    assert left == Bool("AND", [Term("heart", False, 0), Term("attack", False, 6)], 0)
+    assert isinstance(right, Bool) and right.op == "AND"
+    area = right.children[0]
+    assert isinstance(area, Area) and isinstance(area.child, Range) and area.child.high == "MAX"
+
+
+@pytest.mark.parametrize(
+    "query, message, position",
+    [
+        ("(cancer OR stroke", "unclosed '('", 0),
+        ("cancer)", "unmatched ')'", 6),
+        ("cancer AND", "AND has nothing after it", 7),
+        ('AREA[Condition]"heart attack', "unterminated quote", 15),
+        ("AREA[Condition cancer", "missing ']'", 0),
+        ("SEARCH[Location] AREA[LocationCity]Boston", "parenthesized", 0),
+        ("RANGE[1, 2]", "must follow AREA", 0),
+        ("AREA[MinimumAge]RANGE[18]", "two bounds", 16),
+        ("", "empty expression", 0),
+    ],
+)
+def test_syntax_errors_point_at_the_problem(query, message, position):
+    with pytest.raises(EssieError) as info:
+        parse(query)
+    assert message in info.value.message and info.value.position == position
+
+
+def test_unambiguous_fixes_are_spliced_into_the_original_text():
+    checked = check_query("AREA[minimumage]RANGE[66,max] AND  heart attack", VOCABULARY)
+    assert checked.text == "AREA[MinimumAge]RANGE[66 years, MAX] AND  heart attack"
+    assert len(checked.fixes) == 2
+    assert check_query("SEARCH[location](EXPANSION[none]Boston)").text == "SEARCH[Location](EXPANSION[None]Boston)"
+    assert check_query("heart attack", VOCABULARY).fixes == []
+
+
+@pytest.mark.parametrize(
+    "query, message",
+    [
+        ("AREA[Conditon]cancer", "did you mean Condition"),
+        ("AREA[InventedField]x", "unknown field"),
+        ("AREA[MinimumAge]RANGE[eighteen, MAX]", "needs a unit"),
+        ("AREA[StartDate]RANGE[last year, MAX]", "must be YYYY"),
+        ("COVERAGE[Exact]cancer", "must be one of"),
+    ],
+)
+def test_invalid_names_and_values_are_rejected(query, message):
+    with pytest.raises(EssieError, match=message):
+        check_query(query, VOCABULARY)
+
+
+def test_lenient_vocabulary_and_field_index():
+    lenient = Vocabulary(dict(VOCABULARY.names), strict=False)
+    assert check_query("AREA[InventedField]x", lenient).text == "AREA[InventedField]x"
+    index = FieldIndex.from_documents(
+        {
+            "/studies/metadata": [{"name": "conditions", "piece": "Condition", "type": "text[]"}],
+            "/studies/search-areas": [{"name": "Study", "areas": [{"name": "BasicSearch"}]}],
+        }
+    )
+    strict = Vocabulary.from_field_index(index)
+    assert check_query("AREA[basicsearch]x AND AREA[condition]y", strict).text == "AREA[BasicSearch]x AND AREA[Condition]y"
+
+
+def test_check_arguments_only_touches_essie_params():
+    args, fixes = check_arguments(
+        {"query.cond": "AREA[condition]asthma", "filter.advanced": "", "fields": "NCTId(", "pageSize": 10}, VOCABULARY
+    )
+    assert args == {"query.cond": "AREA[Condition]asthma", "filter.advanced": "", "fields": "NCTId(", "pageSize": 10}
+    assert fixes == ["query.cond: condition -> Condition"]
+    with pytest.raises(ValueError, match="in postFilter.advanced"):
+        check_arguments({"postFilter.advanced": "(x"})
+
+
+@pytest.mark.anyio
+async def test_middleware_rejects_before_the_call_and_forwards_fixes():
+    seen = []
+
+    def studies(query_cond: str = "", filter_advanced: str = "") -> Dict[str, Any]:
+        seen.append((query_cond, filter_advanced))
+        return {"ok": True}
+
+    app = FastMCP("test")
+    app.add_tool(
+        Tool.from_tool(
+            Tool.from_function(studies),
+            name="search_studies",
+            transform_args={
+                "query_cond": ArgTransform(name="query.cond"),
+                "filter_advanced": ArgTransform(name="filter.advanced"),
+            },
+        )
+    )
+    app.add_middleware(EssieValidationMiddleware(lambda: VOCABULARY))
+
+    async with Client(app) as client:
+        await client.call_tool(
+            "search_studies", {"query.cond": "asthma", "filter.advanced": "AREA[MinimumAge]RANGE[66, MAX]"}
+        )
+        with pytest.raises(ToolError, match="Nothing was sent"):
+            await client.call_tool("search_studies", {"query.cond": "(asthma"})
+    assert seen == [("asthma", "AREA[MinimumAge]RANGE[66 years, MAX]")]
@@ -0,0 +1,60 @@
+import asyncio
+from typing import List
+
+import httpx
+import pytest
+
+from servers.gateway import GatewayASGI, Message, create_gateway, discover_server_factories
+
+
+def test_discovers_server_factories():
+    factories = discover_server_factories()
+    assert {"ct_server", "pug_rest_server"} <= factories.keys()
+
+
+@pytest.mark.anyio
+async def test_gateway_mounts_servers_under_their_names():
+    gateway = await create_gateway(["ct_server", "pug_rest_server"])
+    tools = await gateway.get_tools()
+    assert "clinical-trials_search_studies" in tools
+    assert "pubchem_get_search_hits" in tools
+
+
+@pytest.mark.anyio
+async def test_gateway_rejects_unknown_servers():
+    with pytest.raises(ValueError, match="Unknown servers"):
+        await create_gateway(["nope_server"])
+
+
+@pytest.mark.anyio
+async def test_gateway_asgi_builds_on_startup_and_serves_mcp(monkeypatch):
+    monkeypatch.setenv("GATEWAY_SERVERS", "ct_server")
+    app = GatewayASGI(path="/mcp", stateless=True)
+    inbox: "asyncio.Queue[Message]" = asyncio.Queue()
+    sent: List[Message] = []
+    started = asyncio.Event()
+
+    async def send(message: Message) -> None:
+        sent.append(message)
+        if message["type"] == "lifespan.startup.complete":
+            started.set()
+
+    await inbox.put({"type": "lifespan.startup"})
+    lifespan = asyncio.create_task(app({"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}}, inbox.get, send))
+    await asyncio.wait_for(started.wait(), 30)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://gw") as client:
+        response = await client.post(
+            "/mcp",
+            json={"jsonrpc": "2.0", "id": 1, "method": "tools/list", "params": {}},
+            headers={"Accept": "application/json, text/event-stream"},
+        )
+        metrics = await client.get("/metrics")
+    assert response.status_code == 200
+    assert "clinical-trials_search_studies" in response.text
+    assert metrics.status_code == 200
+    assert "# TYPE irmcp_tool_duration_seconds histogram" in metrics.text
+
+    await inbox.put({"type": "lifespan.shutdown"})
+    await asyncio.wait_for(lifespan, 10)
+    assert [m["type"] for m in sent] == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
@@ -0,0 +1,40 @@
+import json
+from typing import AsyncIterator
+
+import pytest
+
+from irmcp.jsonstream import iter_json_members
+
+
+async def _chunks(data: bytes, size: int) -> AsyncIterator[bytes]:
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("size", [1, 7, 4096])
+async def test_array_elements_are_decoded_across_chunk_boundaries(size):
+    studies = [{"id": "NCT1", "title": "Trial é", "n": 12345}, {"id": "NCT2", "tags": []}]
+    data = json.dumps({"totalCount": 12345, "studies": studies, "nextPageToken": "abc"}, indent=1).encode()
+    members = [m async for m in iter_json_members(_chunks(data, size), ("studies",))]
+    assert members == [
+        (("totalCount",), 12345),
+        (("studies",), studies[0]),
+        (("studies",), studies[1]),
+        (("nextPageToken",), "abc"),
+    ]
+    assert [m async for m in iter_json_members(_chunks(b'{"studies": []}', 3), ("studies",))] == []
+    with pytest.raises(ValueError):
+        [m async for m in iter_json_members(_chunks(b'{"studies": [{"a": 1}', size), ("studies",))]
+
+
+@pytest.mark.anyio
+async def test_nested_path_is_descended():
+    record = {"Record": {"RecordTitle": "Aspirin", "Section": [{"TOCHeading": "A"}, {"TOCHeading": "B"}]}, "x": 1}
+    members = [m async for m in iter_json_members(_chunks(json.dumps(record).encode(), 5), ("Record", "Section"))]
+    assert members == [
+        (("Record", "RecordTitle"), "Aspirin"),
+        (("Record", "Section"), {"TOCHeading": "A"}),
+        (("Record", "Section"), {"TOCHeading": "B"}),
+        (("x",), 1),
+    ]
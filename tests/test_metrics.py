@@ -0,0 +1,105 @@
+import time
+import urllib.request
+
+import httpx
+import pytest
+from fastmcp import Client, FastMCP
+
+from irmcp.metrics import (
+    UPSTREAM_BYTES,
+    UPSTREAM_RESPONSES,
+    UPSTREAM_SECONDS,
+    MetricsRegistry,
+    MetricsTransport,
+    OperationIndex,
+    SamplingProfiler,
+    start_metrics_server,
+)
+from irmcp.server import register_metrics
+
+SPEC = {
+    "paths": {
+        "/studies": {"get": {"operationId": "listStudies"}},
+        "/studies/{nctId}": {"get": {"operationId": "fetchStudy"}},
+        "/studies/metadata": {"get": {"operationId": "studiesMetadata"}},
+        "/version": {"get": {}},
+    }
+}
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    calls = registry.counter("calls_total", "Calls", ("tool",))
+    calls.inc('a"b')
+    latency = registry.histogram("latency_seconds", "Latency", ("tool",), buckets=(0.1, 1.0))
+    latency.observe(0.05, "x")
+    latency.observe(0.5, "x")
+    registry.add_collector("ratio", "gauge", "Ratio", lambda: [("ratio", {"server": "s"}, 0.25)])
+    text = registry.render()
+    assert '# TYPE calls_total counter\ncalls_total{tool="a\\"b"} 1\n' in text
+    assert 'latency_seconds_bucket{tool="x",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{tool="x",le="+Inf"} 2' in text
+    assert 'latency_seconds_count{tool="x"} 2' in text
+    assert 'ratio{server="s"} 0.25' in text
+
+
+def test_operation_index_prefers_literal_paths():
+    ops = OperationIndex(SPEC)
+    assert ops("GET", "/api/v2/studies/metadata") == "studiesMetadata"
+    assert ops("GET", "/api/v2/studies/NCT01234567") == "fetchStudy"
+    assert ops("GET", "/api/v2/studies") == "listStudies"
+    assert ops("GET", "/api/v2/version") == "GET /version"
+    assert ops("POST", "/api/v2/studies") == "other"
+
+
+@pytest.mark.anyio
+async def test_transport_records_status_size_and_latency():
+    async def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(404 if request.url.path.endswith("NCT0") else 200, content=b"x" * 100)
+
+    transport = MetricsTransport(httpx.MockTransport(handler), "test-transport", OperationIndex(SPEC))
+    async with httpx.AsyncClient(transport=transport, base_url="http://api") as client:
+        await client.get("/studies/NCT1")
+        await client.get("/studies/NCT0")
+    assert UPSTREAM_RESPONSES.value("test-transport", "fetchStudy", "200") == 1
+    assert UPSTREAM_RESPONSES.value("test-transport", "fetchStudy", "404") == 1
+    assert UPSTREAM_SECONDS.count("test-transport", "fetchStudy") == 2
+    assert UPSTREAM_BYTES.count("test-transport", "fetchStudy") == 2
+
+
+@pytest.mark.anyio
+async def test_register_metrics_records_tools_and_serves_resource():
+    app = FastMCP(name="metrics-test")
+
+    @app.tool
+    def echo(text: str) -> str:
+        return text
+
+    register_metrics(app)
+
+    async with Client(app) as client:
+        await client.call_tool("echo", {"text": "hi"})
+        contents = await client.read_resource("metrics://prometheus")
+    text = contents[0].text
+    assert 'irmcp_tool_calls_total{server="metrics-test",tool="echo",outcome="ok"} 1' in text
+    assert 'irmcp_tool_duration_seconds_count{server="metrics-test",tool="echo"} 1' in text
+
+
+def test_exporter_and_profiler():
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    deadline = time.monotonic() + 5
+    while profiler.samples < 5 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    registry = MetricsRegistry()
+    registry.counter("up", "Up").inc()
+    server = start_metrics_server(0, registry=registry, profiler=profiler)
+    try:
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(base + "/metrics") as response:
+            assert b"up 1" in response.read()
+        with urllib.request.urlopen(base + "/profile") as response:
+            assert b"test_exporter_and_profiler" in response.read()
+    finally:
+        server.shutdown()
+        profiler.stop()
@@ -0,0 +1,49 @@
+import os
+
+import yaml
+
+from irmcp.server import load_openapi_spec, openapi_spec_key
+
+SPEC = """
+openapi: 3.1.0
+info: {title: T, version: "1.0.0"}
+paths:
+  /echo:
+    get:
+      operationId: echo
+      responses: {"200": {description: ok}}
+"""
+
+
+def test_compiled_spec_is_reused_until_yaml_changes(tmp_path, monkeypatch):
+    spec_path = tmp_path / "spec.yaml"
+    spec_path.write_text(SPEC)
+    cache_dir = str(tmp_path / "compiled")
+
+    first = load_openapi_spec(str(spec_path), cache_dir=cache_dir)
+    artifact = os.path.join(cache_dir, f"spec.{openapi_spec_key(spec_path.read_bytes())}.json")
+    assert os.path.exists(artifact)
+
+    # Warm path must not touch the YAML parser
+    def fail(*args, **kwargs):
+        raise AssertionError("YAML parsed on warm path")
+
+    with monkeypatch.context() as m:
+        m.setattr(yaml, "safe_load", fail)
+        assert load_openapi_spec(str(spec_path), cache_dir=cache_dir) == first
+
+    # Changed YAML -> new key, stale artifact replaced
+    spec_path.write_text(SPEC.replace("echo", "ping"))
+    second = load_openapi_spec(str(spec_path), cache_dir=cache_dir)
+    assert "/ping" in second["paths"]
+    assert os.listdir(cache_dir) == [f"spec.{openapi_spec_key(spec_path.read_bytes())}.json"]
+
+
+def test_compiled_spec_disabled_by_empty_env(tmp_path, monkeypatch):
+    spec_path = tmp_path / "spec.yaml"
+    spec_path.write_text(SPEC)
+    monkeypatch.setenv("OPENAPI_CACHE_DIR", "")
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+
+    assert "/echo" in load_openapi_spec(str(spec_path))["paths"]
+    assert not (tmp_path / "home").exists()
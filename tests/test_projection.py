@@ -0,0 +1,108 @@
+import json
+from typing import Any, Dict
+
+import pytest
+from fastmcp import Client, FastMCP
+
+from irmcp.projection import (
+    ProjectionRule,
+    TextStore,
+    build_trie,
+    drop_empty,
+    exclude,
+    load_projection_rules,
+    parse_path,
+    project,
+    register_slimming,
+)
+
+STUDIES: Dict[str, Any] = {
+    "studies": [
+        {"protocolSection": {"identificationModule": {"nctId": "NCT1", "briefTitle": "A"}, "descriptionModule": {"briefSummary": "x" * 50}}},
+        {"protocolSection": {"identificationModule": {"nctId": "NCT2", "briefTitle": None}, "conditionsModule": {"keywords": []}}},
+    ],
+    "nextPageToken": "abc",
+}
+
+
+def test_parse_path_handles_root_wildcards_and_indexes():
+    assert parse_path("$.studies[*].protocolSection") == ["studies", "*", "protocolSection"]
+    assert parse_path("a.b[2].*") == ["a", "b", 2, "*"]
+    with pytest.raises(ValueError):
+        parse_path("$")
+
+
+def test_project_keeps_selected_paths_and_maps_over_lists():
+    trie = build_trie(["studies.protocolSection.identificationModule.nctId", "nextPageToken"])
+    assert project(STUDIES, trie) == {
+        "studies": [
+            {"protocolSection": {"identificationModule": {"nctId": "NCT1"}}},
+            {"protocolSection": {"identificationModule": {"nctId": "NCT2"}}},
+        ],
+        "nextPageToken": "abc",
+    }
+    assert project(STUDIES, build_trie(["studies[1].protocolSection.identificationModule.nctId"])) == {
+        "studies": [{"protocolSection": {"identificationModule": {"nctId": "NCT2"}}}]
+    }
+
+
+def test_exclude_and_drop_empty():
+    slim = exclude(STUDIES, build_trie(["studies[*].protocolSection.descriptionModule"]))
+    assert "descriptionModule" not in json.dumps(slim)
+    cleaned = drop_empty({"studies": [], "x": {"y": None, "z": [{}]}, "n": 0}, keep=frozenset({"studies"}))
+    assert cleaned == {"studies": [], "n": 0}
+
+
+def test_truncation_keeps_continuation_in_store():
+    store = TextStore()
+    slim = ProjectionRule(max_text=10).apply(STUDIES, store)
+    summary = slim["studies"][0]["protocolSection"]["descriptionModule"]["briefSummary"]
+    assert summary.startswith("x" * 10) and "truncated 40 chars" in summary
+    handle = summary.split('handle="')[1].split('"')[0]
+    rest = store.read(handle, offset=10, length=30)
+    assert rest["text"] == "x" * 30 and rest["next_offset"] == 40
+
+
+def test_load_projection_rules_overrides_and_disables(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"a": {"max_text": 5}, "b": None}))
+    rules = load_projection_rules({"a": ProjectionRule(), "b": ProjectionRule()}, str(path))
+    assert list(rules) == ["a"] and rules["a"].max_text == 5
+
+
+@pytest.mark.anyio
+async def test_middleware_slims_results_and_serves_truncated_text():
+    app = FastMCP("test")
+
+    @app.tool
+    def studies() -> Dict[str, Any]:
+        return STUDIES
+
+    middleware = register_slimming(app, {"studies": ProjectionRule(max_text=10)})
+
+    async with Client(app) as client:
+        result = await client.call_tool("studies")
+        slim = result.structured_content
+        summary = slim["studies"][0]["protocolSection"]["descriptionModule"]["briefSummary"]
+        handle = summary.split('handle="')[1].split('"')[0]
+        rest = (await client.call_tool("read_truncated", {"handle": handle, "offset": 10})).structured_content
+    assert "conditionsModule" not in slim["studies"][1]["protocolSection"]
+    assert rest["text"] == "x" * 40
+    assert middleware.slim_bytes < middleware.raw_bytes
+
+
+@pytest.mark.anyio
+async def test_middleware_applies_inside_mounted_server():
+    child = FastMCP("child")
+
+    @child.tool
+    def studies() -> Dict[str, Any]:
+        return STUDIES
+
+    register_slimming(child, {"studies": ProjectionRule(max_text=10)})
+    parent = FastMCP("parent")
+    parent.mount(child, prefix="child")
+
+    async with Client(parent) as client:
+        slim = (await client.call_tool("child_studies")).structured_content
+    assert "truncated" in slim["studies"][0]["protocolSection"]["descriptionModule"]["briefSummary"]
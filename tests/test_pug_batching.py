@@ -0,0 +1,171 @@
+import asyncio
+from typing import Any, Callable, Coroutine, List, Tuple
+from urllib.parse import parse_qs
+
+import httpx
+import pytest
+
+from irmcp.scheduler import SchedulerConfig, SchedulingTransport
+from servers.pubchem.pug_batching import (
+    CidBatchingTransport,
+    CidChunkingTransport,
+    merge_records,
+    split_records,
+)
+
+Handler = Callable[[httpx.Request], Coroutine[Any, Any, httpx.Response]]
+
+
+def _property_handler(calls: List[str], fail_on: str = "") -> Handler:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        cids = request.url.path.split("/")[3].split(",")
+        if fail_on and fail_on in cids:
+            return httpx.Response(400, json={"Fault": {"Code": "PUGREST.BadRequest"}})
+        props = [{"CID": int(c), "MolecularWeight": f"{c}.0"} for c in cids if c != "404"]
+        if not props:
+            return httpx.Response(404, json={"Fault": {"Code": "PUGREST.NotFound"}})
+        return httpx.Response(200, json={"PropertyTable": {"Properties": props}})
+
+    return handler
+
+
+@pytest.mark.anyio
+async def test_concurrent_lookups_share_one_upstream_request():
+    calls: List[str] = []
+    transport = CidBatchingTransport(httpx.MockTransport(_property_handler(calls)), window=0.01)
+    async with httpx.AsyncClient(base_url="https://api.test", transport=transport) as client:
+        responses = await asyncio.gather(
+            client.get("/compound/cid/2244/property/MolecularWeight/JSON"),
+            client.get("/compound/cid/5793,2244/property/MolecularWeight/JSON"),
+            client.get("/compound/cid/404/property/MolecularWeight/JSON"),
+        )
+
+    assert calls == ["/compound/cid/2244,5793,404/property/MolecularWeight/JSON"]
+    assert [p["CID"] for p in responses[0].json()["PropertyTable"]["Properties"]] == [2244]
+    assert [p["CID"] for p in responses[1].json()["PropertyTable"]["Properties"]] == [5793, 2244]
+    assert responses[2].status_code == 404
+
+
+@pytest.mark.anyio
+async def test_batch_error_falls_back_to_individual_requests():
+    calls: List[str] = []
+    transport = CidBatchingTransport(httpx.MockTransport(_property_handler(calls, fail_on="1")), window=0.01)
+    async with httpx.AsyncClient(base_url="https://api.test", transport=transport) as client:
+        bad, good = await asyncio.gather(
+            client.get("/compound/cid/1/property/MolecularWeight/JSON"),
+            client.get("/compound/cid/2/property/MolecularWeight/JSON"),
+        )
+
+    assert bad.status_code == 400 and good.status_code == 200
+    assert len(calls) == 3
+
+
+@pytest.mark.anyio
+async def test_unparseable_batch_response_falls_back_to_individual_requests():
+    calls: List[str] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        return httpx.Response(200, text="<html>maintenance</html>")
+
+    transport = CidBatchingTransport(httpx.MockTransport(handler), window=0.01)
+    async with httpx.AsyncClient(base_url="https://api.test", transport=transport) as client:
+        responses = await asyncio.wait_for(
+            asyncio.gather(
+                client.get("/compound/cid/1/property/MolecularWeight/JSON"),
+                client.get("/compound/cid/2/property/MolecularWeight/JSON"),
+            ),
+            1,
+        )
+
+    assert [r.text for r in responses] == ["<html>maintenance</html>"] * 2
+    assert len(calls) == 3
+
+
+@pytest.mark.anyio
+async def test_max_batch_size_and_different_properties_split_batches():
+    calls: List[str] = []
+    transport = CidBatchingTransport(httpx.MockTransport(_property_handler(calls)), window=0.01, max_batch_size=2)
+    async with httpx.AsyncClient(base_url="https://api.test", transport=transport) as client:
+        await asyncio.gather(
+            client.get("/compound/cid/1/property/MolecularWeight/JSON"),
+            client.get("/compound/cid/2/property/MolecularWeight/JSON"),
+            client.get("/compound/cid/3/property/MolecularWeight/JSON"),
+            client.get("/compound/cid/4/property/XLogP/JSON"),
+        )
+
+    assert sorted(calls) == [
+        "/compound/cid/1,2/property/MolecularWeight/JSON",
+        "/compound/cid/3/property/MolecularWeight/JSON",
+        "/compound/cid/4/property/XLogP/JSON",
+    ]
+
+
+def test_split_records_synonyms():
+    payload = {"InformationList": {"Information": [{"CID": 1, "Synonym": ["a"]}, {"CID": 2, "Synonym": ["b"]}]}}
+    assert split_records(payload, [2]) == {"InformationList": {"Information": [{"CID": 2, "Synonym": ["b"]}]}}
+    assert split_records(payload, [3]) is None
+
+
+def _post_handler(calls: List[Tuple[str, List[str]]], fail_first: int = 0) -> Handler:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        cids = parse_qs(request.content.decode())["cid"][0].split(",")
+        calls.append((request.method + " " + request.url.path, cids))
+        if len(calls) <= fail_first:
+            return httpx.Response(503)
+        props = [{"CID": int(c), "MolecularWeight": f"{c}.0"} for c in cids if int(c) < 9000]
+        if not props:
+            return httpx.Response(404, json={"Fault": {"Code": "PUGREST.NotFound"}})
+        return httpx.Response(200, json={"PropertyTable": {"Properties": props}})
+
+    return handler
+
+
+@pytest.mark.anyio
+async def test_long_cid_list_is_posted_in_chunks_and_merged_in_order():
+    calls: List[Tuple[str, List[str]]] = []
+    transport = CidChunkingTransport(httpx.MockTransport(_post_handler(calls)), chunk_size=1000)
+    cids = list(range(2500, 0, -1)) + [9001, 9002]
+    async with httpx.AsyncClient(base_url="https://api.test", transport=transport) as client:
+        response = await client.get(f"/compound/cid/{','.join(map(str, cids))}/property/MolecularWeight/JSON")
+
+    assert response.status_code == 200
+    assert [p["CID"] for p in response.json()["PropertyTable"]["Properties"]] == cids[:-2]
+    assert {call for call, _ in calls} == {"POST /compound/cid/property/MolecularWeight/JSON"}
+    assert sorted(len(chunk) for _, chunk in calls) == [502, 1000, 1000]
+
+
+@pytest.mark.anyio
+async def test_short_lists_pass_through_and_long_urls_use_one_post():
+    calls: List[str] = []
+    transport = CidChunkingTransport(httpx.MockTransport(_property_handler(calls)), max_url_length=100)
+    async with httpx.AsyncClient(base_url="https://api.test", transport=transport) as client:
+        await client.get("/compound/cid/2244/property/MolecularWeight/JSON")
+    assert calls == ["/compound/cid/2244/property/MolecularWeight/JSON"]
+
+    posts: List[Tuple[str, List[str]]] = []
+    transport = CidChunkingTransport(httpx.MockTransport(_post_handler(posts)), max_url_length=100)
+    async with httpx.AsyncClient(base_url="https://api.test", transport=transport) as client:
+        response = await client.get(f"/compound/cid/{','.join(map(str, range(1, 40)))}/property/XLogP/JSON")
+    assert response.status_code == 200 and len(posts) == 1
+
+
+@pytest.mark.anyio
+async def test_chunk_posts_are_retried_by_the_scheduler():
+    calls: List[Tuple[str, List[str]]] = []
+    config = SchedulerConfig(max_retries=2, retry_base_delay=0.001, retry_max_delay=0.01)
+    scheduler = SchedulingTransport(httpx.MockTransport(_post_handler(calls, fail_first=1)), config)
+    transport = CidChunkingTransport(scheduler, chunk_size=2)
+    async with httpx.AsyncClient(base_url="https://api.test", transport=transport) as client:
+        response = await client.get("/compound/cid/1,2,3/property/MolecularWeight/JSON")
+
+    assert response.status_code == 200
+    assert [p["CID"] for p in response.json()["PropertyTable"]["Properties"]] == [1, 2, 3]
+    assert scheduler.retries == 1
+
+
+def test_merge_records_identifier_lists():
+    merged = merge_records([{"IdentifierList": {"CID": [3, 1]}}, {"IdentifierList": {"CID": [2]}}])
+    assert merged == {"IdentifierList": {"CID": [3, 1, 2]}}
+    assert merge_records([{"Fault": {}}]) is None
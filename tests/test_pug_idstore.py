@@ -0,0 +1,84 @@
+import gzip
+from typing import Any, Callable, Coroutine, List
+
+import httpx
+import pytest
+
+from servers.pubchem.pug_idstore import (
+    IdentifierStore,
+    IdentifierTransport,
+    iter_cid_dump,
+    normalize_identifier,
+)
+
+
+def _handler(calls: List[str]) -> Callable[[httpx.Request], Coroutine[Any, Any, httpx.Response]]:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        calls.append(path)
+        if "/name/unobtainium/" in path:
+            return httpx.Response(404, json={"Fault": {"Code": "PUGREST.NotFound", "Message": "No CID found"}})
+        if path.startswith("/compound/cid/"):
+            cids = path.split("/")[3].split(",")
+            return httpx.Response(200, json={"PC_Compounds": [{"id": {"id": {"cid": int(c)}}} for c in cids]})
+        if path.endswith("/cids/JSON"):
+            return httpx.Response(200, json={"IdentifierList": {"CID": [2244]}})
+        if path.startswith("/standardize/"):
+            return httpx.Response(200, json={"PC_Compounds": [{"id": {"id": {"cid": 702}}}]})
+        return httpx.Response(200, json={"PC_Compounds": [{"id": {"id": {"cid": 2244}}}]})
+
+    return handler
+
+
+def test_store_normalizes_and_expires_misses(tmp_path):
+    now = [1000.0]
+    store = IdentifierStore(str(tmp_path / "ids.sqlite"), negative_ttl=60, clock=lambda: now[0])
+    store.put("name", "Acetylsalicylic  Acid", [2244])
+    store.put("inchikey", "bsynrymutxbxsq-uhfffaoysa-n", [2244])
+    store.put("name", "unobtainium", [])
+    assert normalize_identifier("name", " ASPIRIN\t") == "aspirin"
+    assert store.get("name", "acetylsalicylic acid") == [2244]
+    assert store.get("inchikey", "BSYNRYMUTXBXSQ-UHFFFAOYSA-N") == [2244]
+    assert store.get("name", "unobtainium") == []
+    now[0] += 61
+    assert store.get("name", "unobtainium") is None
+    assert store.get("smiles", "CCO") is None
+
+
+def test_preload_accumulates_cids_from_dumps(tmp_path):
+    dump = tmp_path / "CID-Synonym-filtered.gz"
+    with gzip.open(dump, "wt", encoding="utf-8") as f:
+        f.write("2244\tAspirin\n2244\tAcetylsalicylic acid\n1983\tParacetamol\n5000\tAspirin\nbad line\n")
+    store = IdentifierStore(str(tmp_path / "ids.sqlite"))
+    store.put("name", "paracetamol", [])
+    assert store.preload("name", iter_cid_dump(str(dump))) == 4
+    store.preload("name", [(2244, "aspirin")])
+    assert store.get("name", "aspirin") == [2244, 5000]
+    assert store.get("name", "PARACETAMOL") == [1983]
+
+
+@pytest.mark.anyio
+async def test_transport_learns_and_answers_repeat_resolutions(tmp_path):
+    calls: List[str] = []
+    store = IdentifierStore(str(tmp_path / "ids.sqlite"))
+    transport = IdentifierTransport(httpx.MockTransport(_handler(calls)), store)
+    async with httpx.AsyncClient(base_url="https://api.test", transport=transport) as client:
+        await client.get("/compound/name/Aspirin/JSON")
+        await client.get("/standardize/smiles/CCO/JSON")
+        missing = await client.get("/compound/name/unobtainium/cids/JSON")
+        calls.clear()
+
+        cids = await client.get("/compound/name/aspirin/cids/JSON")
+        txt = await client.get("/compound/smiles/CCO/cids/TXT")
+        record = await client.get("/compound/name/ASPIRIN/JSON", params={"record_type": "3d"})
+        again = await client.get("/compound/name/unobtainium/JSON")
+        await client.get("/compound/name/aspirin/cids/JSON", params={"name_type": "word"})
+
+    assert missing.status_code == 404
+    assert cids.json() == {"IdentifierList": {"CID": [2244]}}
+    assert cids.headers["x-irmcp-source"] == "identifier-store"
+    assert txt.text == "702\n"
+    assert record.json()["PC_Compounds"][0]["id"]["id"]["cid"] == 2244
+    assert again.status_code == 404 and again.headers["x-irmcp-source"] == "identifier-store"
+    # Only the rewritten record fetch and the name_type query went upstream
+    assert calls == ["/compound/cid/2244/JSON", "/compound/name/aspirin/cids/JSON"]
@@ -0,0 +1,110 @@
+import os
+from array import array
+from typing import Any, Callable, Coroutine, List, Tuple
+
+import httpx
+import pytest
+from fastmcp import Client
+from fastmcp.experimental.server.openapi import FastMCPOpenAPI
+
+from irmcp.deadline import register_deadlines
+from irmcp.server import load_openapi_spec
+from servers.pubchem import pug_listkey
+from servers.pubchem.pug_listkey import (
+    HitStore,
+    ListKeyHits,
+    fetch_listkey_page,
+    register_listkey_tools,
+)
+
+PUG_SPEC = os.path.join(os.path.dirname(__file__), "..", "src", "servers", "pubchem", "pug_rest_openapi.yaml")
+HITS = list(range(1, 26))
+
+
+def _listkey_handler(calls: List[httpx.URL], waiting: int = 1) -> Callable[[httpx.Request], Coroutine[Any, Any, httpx.Response]]:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url)
+        if "/fastsubstructure/" in request.url.path:
+            return httpx.Response(202, json={"Waiting": {"ListKey": "123", "Message": "queued"}})
+        if len(calls) <= waiting:
+            return httpx.Response(202, json={"Waiting": {"ListKey": "123"}})
+        start = int(request.url.params["listkey_start"])
+        count = int(request.url.params["listkey_count"])
+        return httpx.Response(200, json={"IdentifierList": {"CID": HITS[start:start + count], "Size": len(HITS)}})
+
+    return handler
+
+
+def _app(calls: List[httpx.URL]) -> Tuple[FastMCPOpenAPI, httpx.AsyncClient]:
+    client = httpx.AsyncClient(base_url="https://api.test", transport=httpx.MockTransport(_listkey_handler(calls, 0)))
+    return FastMCPOpenAPI(openapi_spec=load_openapi_spec(PUG_SPEC), client=client, name="pubchem"), client
+
+
+def test_hit_store_pages_and_evicts():
+    store = HitStore(max_hits=10, max_lists=3)
+    first = store.put(array("I", range(8)))
+    page = store.page(first, 0, 5)
+    assert page["CID"] == [0, 1, 2, 3, 4] and page["total"] == 8 and page["next_start"] == 5
+    assert "next_start" not in store.page(first, 5, 5)
+
+    store.put(array("I", range(5)))
+    with pytest.raises(ValueError, match="expired"):
+        store.page(first)
+
+    keys = [store.put(ListKeyHits(str(n), 1_000_000)) for n in range(3)]
+    assert len(store) == 3 and store.current_hits == 0
+    assert store.get(keys[0]) == ListKeyHits("0", 1_000_000)
+    with pytest.raises(ValueError, match="get_search_hits tool"):
+        store.page(keys[0])
+
+
+@pytest.mark.anyio
+async def test_fetch_listkey_page_polls_then_fetches_only_that_page(monkeypatch):
+    monkeypatch.setattr(pug_listkey, "POLL_INITIAL_DELAY", 0.001)
+    calls: List[httpx.URL] = []
+    transport = httpx.MockTransport(_listkey_handler(calls, 2))
+    async with httpx.AsyncClient(base_url="https://api.test", transport=transport) as client:
+        cids, total = await fetch_listkey_page(client, "123", start=10, count=10)
+    assert cids == HITS[10:20] and total == 25
+    assert [(u.params["listkey_start"], u.params["listkey_count"]) for u in calls] == [("10", "10")] * 3
+
+
+@pytest.mark.anyio
+async def test_fetch_listkey_page_times_out():
+    async def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(202, json={"Waiting": {"ListKey": "123"}})
+
+    async with httpx.AsyncClient(base_url="https://api.test", transport=httpx.MockTransport(handler)) as client:
+        with pytest.raises(ValueError, match="still running"):
+            await fetch_listkey_page(client, "123", timeout=0.1)
+
+
+@pytest.mark.anyio
+async def test_search_tool_keeps_listkey_and_fetches_pages_on_demand(monkeypatch):
+    monkeypatch.setattr(pug_listkey, "POLL_INITIAL_DELAY", 0.001)
+    calls: List[httpx.URL] = []
+    app, client = _app(calls)
+    await register_listkey_tools(app, client)
+    async with Client(app) as mcp:
+        first = (await mcp.call_tool("Substructure_search_by_SMILES", {"smiles": "c1ccccc1", "count": 10})).data
+        second = (
+            await mcp.call_tool("get_search_hits", {"handle": first["handle"], "start": first["next_start"], "count": 20})
+        ).data
+
+    assert first["CID"] == HITS[:10] and first["total"] == 25
+    assert second["CID"] == HITS[10:] and "next_start" not in second
+    # One search request, then one ListKey request per page read
+    assert calls[0].path.endswith("/cids/JSON")
+    assert [(u.params["listkey_start"], u.params["listkey_count"]) for u in calls[1:]] == [("0", "10"), ("10", "20")]
+
+
+@pytest.mark.anyio
+async def test_search_sends_remaining_budget_as_max_seconds(monkeypatch):
+    monkeypatch.setattr(pug_listkey, "POLL_INITIAL_DELAY", 0.001)
+    calls: List[httpx.URL] = []
+    app, client = _app(calls)
+    await register_listkey_tools(app, client)
+    register_deadlines(app, {"Substructure_search_by_SMILES": 30})
+    async with Client(app) as mcp:
+        await mcp.call_tool("Substructure_search_by_SMILES", {"smiles": "c1ccccc1"})
+    assert 25 <= int(calls[0].params["MaxSeconds"]) <= 28
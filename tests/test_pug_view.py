@@ -0,0 +1,71 @@
+import json
+from typing import Any, AsyncIterator, Dict, List
+
+import httpx
+import pytest
+
+from irmcp.cache import MemoryCache, ResponseCache
+from servers.gateway import discover_server_factories
+from servers.pubchem.pug_view_sections import compound_sections, find_sections
+
+TOXICITY = {"TOCHeading": "Toxicity Summary", "Information": [{"Value": {"StringWithMarkup": [{"String": "LD50"}]}}]}
+MELTING = {"TOCHeading": "Melting Point", "Information": [{"Value": {"Number": [135]}}]}
+RECORD: Dict[str, Any] = {
+    "Record": {
+        "RecordType": "CID",
+        "RecordNumber": 2244,
+        "Section": [
+            {"TOCHeading": "Chemical and Physical Properties", "Section": [
+                {"TOCHeading": "Experimental Properties", "Section": [MELTING]},
+            ]},
+            {"TOCHeading": "Toxicity", "Section": [{"TOCHeading": "Toxicological Information", "Section": [TOXICITY]}]},
+        ],
+        "Reference": [{"ReferenceNumber": 1}],
+    }
+}
+
+
+async def _chunks(data: bytes) -> AsyncIterator[bytes]:
+    for i in range(0, len(data), 50):
+        yield data[i:i + 50]
+
+
+def test_find_sections_reports_parents_and_stops_at_matches():
+    found = list(find_sections(RECORD["Record"]["Section"], {"melting point", "toxicity"}))
+    assert [(key, section["Path"]) for key, section in found] == [
+        ("melting point", ["Chemical and Physical Properties", "Experimental Properties"]),
+        ("toxicity", []),
+    ]
+
+
+@pytest.mark.anyio
+async def test_sections_by_heading_fall_back_to_streamed_record_and_are_cached():
+    requests: List[httpx.URL] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url)
+        heading = request.url.params.get("heading")
+        if heading == "Melting Point":
+            return httpx.Response(200, json={"Record": {"Section": [{
+                "TOCHeading": "Chemical and Physical Properties", "Section": [
+                    {"TOCHeading": "Experimental Properties", "Section": [MELTING]}]}]}})
+        if heading == "Toxicity Summary":
+            return httpx.Response(400, json={"Fault": {"Code": "PUGVIEW.BadRequest", "Message": "Invalid heading"}})
+        if heading == "Odor":
+            return httpx.Response(404, json={"Fault": {"Code": "PUGVIEW.NotFound", "Message": "No data"}})
+        return httpx.Response(200, content=_chunks(json.dumps(RECORD).encode()))
+
+    cache = ResponseCache(memory=MemoryCache(1 << 20))
+    client = httpx.AsyncClient(base_url="https://pug.test", transport=httpx.MockTransport(handler))
+
+    first = await compound_sections(client, 2244, ["Melting Point", "Toxicity  Summary", "Odor"], cache)
+    requests.clear()
+    again = await compound_sections(client, 2244, ["melting point", "Odor"], cache)
+    assert first["sections"]["Melting Point"][0]["Information"] == MELTING["Information"]
+    assert first["sections"]["Toxicity Summary"][0]["Path"] == ["Toxicity", "Toxicological Information"]
+    assert first["notFound"] == ["Odor"] and first["fullRecordRead"]
+    assert requests == [] and again["sections"]["melting point"] == first["sections"]["Melting Point"]
+
+
+def test_gateway_discovers_the_pug_view_server():
+    assert "pug_view_server" in discover_server_factories()
@@ -0,0 +1,144 @@
+import asyncio
+from typing import Any, Callable, Coroutine, List
+
+import httpx
+import pytest
+
+from irmcp.scheduler import (
+    AdaptiveConcurrency,
+    SchedulerConfig,
+    SchedulingTransport,
+    TokenBucket,
+    backoff_delay,
+    parse_retry_after,
+)
+
+FAST = SchedulerConfig(max_retries=2, retry_base_delay=0.001, retry_max_delay=0.01)
+
+
+def _flaky_handler(
+    calls: List[str], failures: int, status: int = 503, retry_after: str = ""
+) -> Callable[[httpx.Request], Coroutine[Any, Any, httpx.Response]]:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.method)
+        if len(calls) <= failures:
+            headers = {"Retry-After": retry_after} if retry_after else {}
+            return httpx.Response(status, headers=headers)
+        return httpx.Response(200, json={"ok": True})
+
+    return handler
+
+
+@pytest.mark.anyio
+async def test_retries_throttled_get_until_success():
+    calls: List[str] = []
+    transport = SchedulingTransport(httpx.MockTransport(_flaky_handler(calls, 2, status=429)), FAST)
+    async with httpx.AsyncClient(base_url="https://api.test", transport=transport) as client:
+        response = await client.get("/x")
+    assert response.status_code == 200
+    assert len(calls) == 3 and transport.retries == 2
+
+
+@pytest.mark.anyio
+async def test_gives_up_after_max_retries_and_skips_post():
+    calls: List[str] = []
+    transport = SchedulingTransport(httpx.MockTransport(_flaky_handler(calls, 10)), FAST)
+    async with httpx.AsyncClient(base_url="https://api.test", transport=transport) as client:
+        assert (await client.get("/x")).status_code == 503
+        assert len(calls) == 3
+        assert (await client.post("/x")).status_code == 503
+        assert len(calls) == 4
+
+
+@pytest.mark.anyio
+async def test_retry_after_overrides_shorter_backoff(monkeypatch):
+    sleeps: List[float] = []
+
+    async def fake_sleep(delay: float) -> None:
+        sleeps.append(delay)
+
+    monkeypatch.setattr("irmcp.scheduler.asyncio.sleep", fake_sleep)
+    calls: List[str] = []
+    config = SchedulerConfig(max_retries=1, retry_base_delay=0.001, retry_max_delay=5.0)
+    transport = SchedulingTransport(httpx.MockTransport(_flaky_handler(calls, 1, retry_after="2")), config)
+    async with httpx.AsyncClient(base_url="https://api.test", transport=transport) as client:
+        assert (await client.get("/x")).status_code == 200
+    assert sleeps == [2.0]
+
+
+@pytest.mark.anyio
+async def test_transport_errors_are_retried_then_raised():
+    attempts = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal attempts
+        attempts += 1
+        raise httpx.ConnectError("boom", request=request)
+
+    transport = SchedulingTransport(httpx.MockTransport(handler), FAST)
+    async with httpx.AsyncClient(base_url="https://api.test", transport=transport) as client:
+        with pytest.raises(httpx.ConnectError):
+            await client.get("/x")
+    assert attempts == 3
+
+
+@pytest.mark.anyio
+async def test_token_bucket_paces_after_burst(monkeypatch):
+    now = [0.0]
+    sleeps: List[float] = []
+
+    async def fake_sleep(delay: float) -> None:
+        sleeps.append(delay)
+        now[0] += delay
+
+    monkeypatch.setattr("irmcp.scheduler.asyncio.sleep", fake_sleep)
+    bucket = TokenBucket(rate=5.0, burst=2, clock=lambda: now[0])
+    for _ in range(4):
+        await bucket.acquire()
+    assert sleeps == pytest.approx([0.2, 0.2])
+
+
+@pytest.mark.anyio
+async def test_adaptive_concurrency_shrinks_on_errors_and_grows_on_success():
+    limiter = AdaptiveConcurrency(minimum=1, maximum=4, latency_target=1.0)
+    await limiter.acquire()
+    limiter.release(0.1, ok=False)
+    assert limiter.limit == 2
+    await limiter.acquire()
+    limiter.release(2.0, ok=True)
+    assert limiter.limit == 1
+
+    await limiter.acquire()
+    blocked = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    assert not blocked.done()
+    limiter.release(0.1, ok=True)
+    await blocked
+    assert limiter.limit == 2 and limiter.in_flight == 1
+
+
+
+@pytest.mark.anyio
+async def test_woken_waiter_cancelled_before_running_passes_its_slot_on():
+    limiter = AdaptiveConcurrency(minimum=1, maximum=1, latency_target=10.0)
+    await limiter.acquire()
+    b = asyncio.ensure_future(limiter.acquire())
+    c = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+
+    limiter.release(0.1, ok=True)
+    b.cancel()
+    await asyncio.wait_for(c, 1)
+    assert b.cancelled() and limiter.in_flight == 1 and not limiter._waiters
+
+def test_parse_retry_after_seconds_and_http_date():
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:10 GMT", now=1445412480.0) == 10.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_backoff_delay_is_capped():
+    config = SchedulerConfig(retry_base_delay=1.0, retry_max_delay=3.0)
+    assert all(0 <= backoff_delay(n, config) <= 3.0 for n in range(10))
+    assert backoff_delay(0, config, retry_after=60) == 3.0
@@ -1,7 +1,18 @@
+import asyncio
+import importlib.util
+from typing import Any, List
+
 import httpx
 from fastmcp.experimental.server.openapi import FastMCPOpenAPI
 
-from irmcp.server import setup_httpx_logging
+import irmcp.server as server_module
+from irmcp.server import (
+    ManagedClient,
+    create_http_client,
+    http2_enabled,
+    run_server,
+    setup_httpx_logging,
+)
 
 
 def test_create_server__minimal_openapi():
@@ -27,3 +38,46 @@ def test_create_server__minimal_openapi():
     # Quick lifecycle: start/stop HTTP app coroutine (does not start a server)
     # Not running run_http_async to avoid event loop conflicts in test env
     assert callable(getattr(server, "http_app", None))
+
+
+def test_managed_clients_are_prewarmed_and_closed_on_the_serving_loop(monkeypatch):
+    monkeypatch.setenv("API_HTTP2", "0")
+    heads: List[httpx.Request] = []
+    loops: List[Any] = []
+    created: List[httpx.AsyncClient] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        heads.append(request)
+        return httpx.Response(405)
+
+    class App:
+        async def run_async(self) -> None:
+            loops.append(asyncio.get_running_loop())
+            await asyncio.sleep(0.01)
+
+    async def factory() -> App:
+        loops.append(asyncio.get_running_loop())
+        client = create_http_client("https://api.test/v2", "test/1.0", 5.0)
+        created.append(client)
+        return App()
+
+    # Route the pre-warm HEADs to a mock pool instead of the network
+    real_prewarm = server_module.prewarm_clients
+
+    async def prewarm(clients: List[ManagedClient]) -> None:
+        assert [m.connections for m in clients] == [2]
+        mocked = [ManagedClient(m.client, httpx.MockTransport(handler), m.connections) for m in clients]
+        await real_prewarm(mocked)
+
+    monkeypatch.setattr(server_module, "prewarm_clients", prewarm)
+    run_server(factory)
+    assert loops[0] is loops[1]
+    assert created[0].is_closed
+    assert [(r.method, str(r.url)) for r in heads] == [("HEAD", "https://api.test/v2/")] * 2
+
+
+def test_http2_is_optional(monkeypatch):
+    monkeypatch.setenv("API_HTTP2", "0")
+    assert not http2_enabled()
+    monkeypatch.setenv("API_HTTP2", "auto")
+    assert http2_enabled() == (importlib.util.find_spec("h2") is not None)
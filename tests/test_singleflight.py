@@ -0,0 +1,96 @@
+import asyncio
+from typing import List
+
+import httpx
+import pytest
+
+from irmcp.singleflight import SingleflightTransport
+
+
+def _transport(calls: List[str], release: asyncio.Event, cancelled: List[str]) -> SingleflightTransport:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(str(request.url))
+        try:
+            await release.wait()
+        except asyncio.CancelledError:
+            cancelled.append(str(request.url))
+            raise
+        return httpx.Response(200, json={"n": len(calls)})
+
+    return SingleflightTransport(httpx.MockTransport(handler))
+
+
+@pytest.mark.anyio
+async def test_identical_requests_share_one_upstream_call():
+    calls: List[str] = []
+    release = asyncio.Event()
+    transport = _transport(calls, release, [])
+    async with httpx.AsyncClient(base_url="https://api.test", transport=transport) as client:
+        pending = [
+            asyncio.create_task(client.get("/studies", params=[("a", "1"), ("b", "2")])),
+            asyncio.create_task(client.get("/studies", params=[("b", "2"), ("a", "1")])),
+            asyncio.create_task(client.get("/studies", params=[("a", "2")])),
+        ]
+        await asyncio.sleep(0.01)
+        release.set()
+        responses = await asyncio.gather(*pending)
+
+    assert len(calls) == 2
+    assert responses[0].json() == responses[1].json()
+    assert transport.shared == 1
+
+
+@pytest.mark.anyio
+async def test_cancelled_caller_does_not_abort_others():
+    calls: List[str] = []
+    cancelled: List[str] = []
+    release = asyncio.Event()
+    transport = _transport(calls, release, cancelled)
+    async with httpx.AsyncClient(base_url="https://api.test", transport=transport) as client:
+        leader = asyncio.create_task(client.get("/studies/NCT1"))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(client.get("/studies/NCT1"))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        await asyncio.sleep(0.01)
+        release.set()
+        response = await follower
+
+    assert response.status_code == 200 and len(calls) == 1 and not cancelled
+    assert leader.cancelled()
+
+
+@pytest.mark.anyio
+async def test_upstream_cancelled_when_every_caller_gives_up():
+    calls: List[str] = []
+    cancelled: List[str] = []
+    transport = _transport(calls, asyncio.Event(), cancelled)
+    async with httpx.AsyncClient(base_url="https://api.test", transport=transport) as client:
+        waiting = [asyncio.create_task(client.get("/studies/NCT1")) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for task in waiting:
+            task.cancel()
+        await asyncio.gather(*waiting, return_exceptions=True)
+        await asyncio.sleep(0.01)
+
+    assert cancelled == ["https://api.test/studies/NCT1"]
+
+
+@pytest.mark.anyio
+async def test_errors_are_shared_and_posts_are_not():
+    calls: List[str] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.method)
+        await asyncio.sleep(0.01)
+        if request.method == "GET":
+            raise httpx.ConnectError("down", request=request)
+        return httpx.Response(200)
+
+    transport = SingleflightTransport(httpx.MockTransport(handler))
+    async with httpx.AsyncClient(base_url="https://api.test", transport=transport) as client:
+        gets = await asyncio.gather(client.get("/x"), client.get("/x"), return_exceptions=True)
+        await asyncio.gather(client.post("/x"), client.post("/x"))
+
+    assert all(isinstance(r, httpx.ConnectError) for r in gets)
+    assert calls == ["GET", "POST", "POST"]